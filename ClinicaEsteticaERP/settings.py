@@ -72,6 +72,15 @@ DATABASES = {
     }
 }
 
+# Caché compartida por todos los procesos (servidor, workers de reportes y comandos):
+# las versiones de `core.versiones` deben verse desde todos para invalidar entradas.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/1'),
+    }
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -104,6 +113,8 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Archivos con datos personales (reportes exportados): fuera de MEDIA_ROOT, no se sirven por /media/
+ARCHIVOS_PRIVADOS_ROOT = os.path.join(BASE_DIR, 'privado')
 
 LOGIN_REDIRECT_URL = '/'
 
@@ -117,4 +128,11 @@ DATE_INPUT_FORMATS = ['%d/%m/%Y']
 
 SESSION_COOKIE_SECURE = False
 CSRF_COOKIE_SECURE = False
-SECURE_BROWSER_XSS_FILTER = True
\ No newline at end of file
+SECURE_BROWSER_XSS_FILTER = True
+# Reglas de descuento del motor de precios (ver servicios/precios.py). Ejemplos:
+#   {'tipo': 'promocion', 'nombre': 'Martes de color', 'porcentaje': 15, 'categorias': ['tinte'], 'dias_semana': [1]}
+#   {'tipo': 'paquete', 'nombre': 'Corte + Tinte', 'porcentaje': 10, 'categorias': ['corte', 'tinte']}
+#   {'tipo': 'categoria', 'nombre': 'Champús', 'monto': 500, 'categorias_producto': ['champu']}
+PRECIOS_REGLAS = [
+    {'tipo': 'cumpleanos', 'nombre': 'Descuento Cumpleaños', 'porcentaje': 20},
+]
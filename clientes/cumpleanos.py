@@ -0,0 +1,65 @@
+"""Búsquedas de cumpleaños sobre la columna indexada `Cliente.cumple_mmdd`.
+
+`fecha_nacimiento__month`/`__day` aplican MONTH()/DAY() a cada fila y no
+pueden usar índices. `cumple_mmdd` guarda el mismo dato como un entero
+MMDD (1 de marzo = 301), de modo que "hoy", "este mes" o "los próximos N
+días" son igualdades o rangos sobre una columna indexada.
+"""
+from datetime import timedelta
+
+from django.db.models import Case, F, Q, When
+from django.utils import timezone
+
+MAX_DIAS_PROXIMOS = 366
+
+
+def mmdd(fecha):
+    """Mes y día de `fecha` como entero MMDD, igual que `Cliente.cumple_mmdd`."""
+    return fecha.month * 100 + fecha.day
+
+
+def es_cumpleanos(fecha_nacimiento, fecha):
+    """Indica si `fecha` coincide con el cumpleaños (día y mes de `fecha_nacimiento`)."""
+    return bool(fecha_nacimiento) and mmdd(fecha) == mmdd(fecha_nacimiento)
+
+
+def cumpleanos_del_dia(clientes, fecha=None):
+    """Clientes de `clientes` que están de cumpleaños en `fecha` (hoy por defecto)."""
+    fecha = fecha or timezone.localdate()
+    return clientes.filter(cumple_mmdd=mmdd(fecha))
+
+
+def cumpleanos_del_mes(clientes, mes):
+    """Clientes de `clientes` que están de cumpleaños en el mes `mes` (1-12)."""
+    return clientes.filter(cumple_mmdd__gte=mes * 100 + 1, cumple_mmdd__lte=mes * 100 + 31)
+
+
+def filtro_proximos(dias, desde=None):
+    """Q para los cumpleaños de los `dias` días a partir de `desde`, inclusive.
+
+    Si el período cruza el fin de año (p. ej. 28/12 a 03/01) el rango MMDD se
+    parte en dos: desde `desde` hasta fin de año y desde el 1 de enero.
+    """
+    desde = desde or timezone.localdate()
+    if dias >= MAX_DIAS_PROXIMOS:
+        return Q()
+    hasta = desde + timedelta(days=dias - 1)
+    inicio, fin = mmdd(desde), mmdd(hasta)
+    if hasta.year == desde.year:
+        return Q(cumple_mmdd__gte=inicio, cumple_mmdd__lte=fin)
+    return Q(cumple_mmdd__gte=inicio) | Q(cumple_mmdd__lte=fin)
+
+
+def cumpleanos_proximos(clientes, dias, desde=None):
+    """Clientes que están de cumpleaños en los próximos `dias` días, en orden de llegada.
+
+    Los cumpleaños posteriores al cruce de año se ordenan después de los de
+    diciembre, y el 29 de febrero queda entre el 28/02 y el 01/03.
+    """
+    desde = desde or timezone.localdate()
+    return clientes.filter(filtro_proximos(dias, desde)).annotate(
+        orden_cumple=Case(
+            When(cumple_mmdd__gte=mmdd(desde), then=F('cumple_mmdd')),
+            default=F('cumple_mmdd') + 1300,
+        )
+    ).order_by('orden_cumple', 'nombre', 'apellido')
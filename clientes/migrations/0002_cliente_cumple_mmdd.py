@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:51
+
+import django.db.models.expressions
+import django.db.models.functions.datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cliente',
+            name='cumple_mmdd',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.functions.datetime.ExtractMonth('fecha_nacimiento'), '*', models.Value(100)), '+', django.db.models.functions.datetime.ExtractDay('fecha_nacimiento')), output_field=models.PositiveSmallIntegerField()),
+        ),
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['cumple_mmdd', 'estado'], name='cli_cumple_mmdd_idx'),
+        ),
+    ]
@@ -1,7 +1,11 @@
 from django.db import models
+from django.db.models.functions import ExtractDay, ExtractMonth
 from django.core.validators import MinLengthValidator
 from django.utils import timezone
 
+from .cumpleanos import es_cumpleanos
+
+
 class Cliente(models.Model):
     ESTADO_CHOICES = [
         ('activo', 'Activo'),
@@ -19,6 +23,12 @@ class Cliente(models.Model):
     email = models.EmailField(blank=True, null=True)
     telefono = models.CharField(max_length=15, blank=True, null=True)
     fecha_nacimiento = models.DateField()
+    # Mes y día del cumpleaños como MMDD (1 de marzo = 301), indexado para las búsquedas de cumpleaños
+    cumple_mmdd = models.GeneratedField(
+        expression=ExtractMonth('fecha_nacimiento') * 100 + ExtractDay('fecha_nacimiento'),
+        output_field=models.PositiveSmallIntegerField(),
+        db_persist=True,
+    )
     direccion = models.TextField(blank=True, null=True)
     estado = models.CharField(
         max_length=10, 
@@ -32,14 +42,16 @@ class Cliente(models.Model):
         verbose_name = "Cliente"
         verbose_name_plural = "Clientes"
         ordering = ['nombre', 'apellido']
+        indexes = [
+            models.Index(fields=['cumple_mmdd', 'estado'], name='cli_cumple_mmdd_idx'),
+        ]
     
     def __str__(self):
         return f"{self.nombre} {self.apellido} ({self.rut})"
     
     @property
     def es_cumpleanos_hoy(self):
-        hoy = timezone.now().date()
-        return hoy.month == self.fecha_nacimiento.month and hoy.day == self.fecha_nacimiento.day
+        return es_cumpleanos(self.fecha_nacimiento, timezone.localdate())
     
     @property
     def nombre_completo(self):
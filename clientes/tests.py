@@ -1,3 +1,53 @@
+from datetime import date
+
 from django.test import TestCase
 
-# Create your tests here.
+from .cumpleanos import cumpleanos_del_dia, cumpleanos_del_mes, cumpleanos_proximos, mmdd
+from .models import Cliente
+
+
+class CumpleanosTest(TestCase):
+    """Búsquedas de cumpleaños sobre la columna indexada `cumple_mmdd`."""
+
+    @classmethod
+    def setUpTestData(cls):
+        nacimientos = {
+            'Ana': date(1990, 12, 30),
+            'Beto': date(1985, 1, 2),
+            'Carla': date(2000, 1, 10),
+            'Diego': date(1992, 2, 29),
+            'Elena': date(1970, 3, 1),
+        }
+        for i, (nombre, fecha) in enumerate(nacimientos.items()):
+            Cliente.objects.create(
+                rut=f'1111111{i}-1', nombre=nombre, apellido='Prueba', fecha_nacimiento=fecha,
+            )
+
+    def nombres(self, clientes):
+        return [cliente.nombre for cliente in clientes]
+
+    def test_columna_mmdd_se_mantiene_al_guardar(self):
+        cliente = Cliente.objects.get(nombre='Ana')
+        self.assertEqual(cliente.cumple_mmdd, 1230)
+        cliente.fecha_nacimiento = date(1990, 7, 4)
+        cliente.save()
+        cliente.refresh_from_db()
+        self.assertEqual(cliente.cumple_mmdd, mmdd(date(1990, 7, 4)))
+
+    def test_del_dia_y_del_mes(self):
+        todos = Cliente.objects.all()
+        self.assertEqual(self.nombres(cumpleanos_del_dia(todos, date(2031, 1, 2))), ['Beto'])
+        self.assertEqual(self.nombres(cumpleanos_del_mes(todos, 1)), ['Beto', 'Carla'])
+        self.assertEqual(self.nombres(cumpleanos_del_mes(todos, 2)), ['Diego'])
+
+    def test_proximos_cruza_el_fin_de_anio_en_orden(self):
+        proximos = cumpleanos_proximos(Cliente.objects.all(), 7, desde=date(2030, 12, 28))
+        self.assertEqual(self.nombres(proximos), ['Ana', 'Beto'])
+
+    def test_proximos_incluye_29_de_febrero(self):
+        proximos = cumpleanos_proximos(Cliente.objects.all(), 2, desde=date(2031, 2, 28))
+        self.assertEqual(self.nombres(proximos), ['Diego', 'Elena'])
+
+    def test_consulta_usa_el_indice(self):
+        plan = cumpleanos_del_dia(Cliente.objects.filter(estado='activo'), date(2031, 1, 2)).explain()
+        self.assertIn('cli_cumple_mmdd_idx', plan)
@@ -8,6 +8,7 @@ from .forms import ClienteForm, BuscarClienteForm
 from usuarios.helpers import registrar_accion, is_admin_user, is_estilista_user
 from django.utils.http import urlencode
 from django.contrib.auth.decorators import user_passes_test
+from core.paginacion import paginar
 
 @login_required
 def lista_clientes(request):
@@ -19,8 +20,11 @@ def lista_clientes(request):
     else:
         clientes = Cliente.objects.filter(estado='activo')
     
+    # Sin COUNT: la tabla de clientes es la más grande del sistema
+    pagina = paginar(request, clientes)
     context = {
-        'clientes': clientes,
+        'clientes': pagina,
+        'pagina': pagina,
     }
     return render(request, 'clientes/listaCliente.html', context)
 
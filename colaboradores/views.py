@@ -2,11 +2,12 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required, user_passes_test
 from usuarios.helpers import is_admin_user, has_any_role
-from django.db.models import Q
+from django.db.models import Count, Q
 from .models import Colaborador
 from .forms import ColaboradorForm, BuscarColaboradorForm
 from usuarios.helpers import registrar_accion
 from django.contrib.auth.decorators import user_passes_test
+from core.paginacion import paginar
 
 @login_required
 def lista_colaboradores(request):
@@ -22,8 +23,17 @@ def lista_colaboradores(request):
         else:
             colaboradores = Colaborador.objects.none()
 
+    pagina = paginar(request, colaboradores)
+    resumen = colaboradores.aggregate(
+        total=Count('id'),
+        activos=Count('id', filter=Q(estado='activo')),
+        estilistas=Count('id', filter=Q(cargo='estilista')),
+        recepcionistas=Count('id', filter=Q(cargo='recepcionista')),
+    )
     context = {
-        'colaboradores': colaboradores,
+        'colaboradores': pagina,
+        'pagina': pagina,
+        'resumen': resumen,
     }
     return render(request, 'colaboradores/listaColaboradores.html', context)
 
@@ -0,0 +1,30 @@
+"""Almacenamiento de archivos privados.
+
+Los archivos que pueden contener datos personales (por ejemplo, los CSV de
+reportes con RUT, email y teléfono de clientes) se guardan en
+`ARCHIVOS_PRIVADOS_ROOT`, fuera de `MEDIA_ROOT`, para que no queden
+accesibles por `/media/`. Sólo se entregan a través de vistas que
+comprueban los permisos del usuario (ver `reportes.views.descargar_reporte`).
+"""
+import os
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class AlmacenamientoPrivado(FileSystemStorage):
+    """`FileSystemStorage` en `ARCHIVOS_PRIVADOS_ROOT`, sin URL pública."""
+
+    @property
+    def base_location(self):
+        # Se lee en cada uso para respetar `override_settings` en las pruebas
+        return settings.ARCHIVOS_PRIVADOS_ROOT
+
+    @property
+    def location(self):
+        return os.path.abspath(self.base_location)
+
+    def url(self, name):
+        raise ValueError('Los archivos privados no tienen URL pública; se descargan desde su vista.')
@@ -0,0 +1,278 @@
+"""Mantenimiento incremental de los contadores del dashboard.
+
+Cada modelo seguido declara qué campos influyen en los KPIs y qué aporte
+hace una fila a cada contador. Al guardar o eliminar una fila se aplica la
+diferencia entre el aporte anterior y el nuevo, de modo que el dashboard
+lee unas pocas filas de `ContadorDashboard` en lugar de recorrer las tablas.
+
+Los cambios de stock hechos con UPDATE directo llegan por la señal
+`inventario.signals.stock_actualizado`, las inserciones en bloque por
+`movimientos_registrados` y `servicios.signals.citas_registradas`, y los
+movimientos archivados por `movimientos_eliminados`. Otras operaciones masivas
+(`QuerySet.update`, `bulk_create`) no disparan señales; si algún proceso las
+usa, los contadores pueden desviarse y se corrigen con
+`python manage.py reconstruir_contadores`.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Q, Sum
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from inventario.signals import (
+    en_eliminacion_en_bloque, movimientos_eliminados, movimientos_registrados, stock_actualizado,
+)
+from servicios.signals import citas_registradas
+from .eventos import registrar_evento
+from .models import ContadorDashboard
+
+CLAVE_INICIALIZADO = '_inicializado'
+
+
+def _dia(valor):
+    """Fecha local (según TIME_ZONE) de un datetime."""
+    if timezone.is_aware(valor):
+        valor = timezone.localtime(valor)
+    return valor.date()
+
+
+def clave_citas_dia(fecha):
+    return f'citas:dia:{fecha.isoformat()}'
+
+
+def clave_movimientos_dia(tipo, fecha):
+    return f'movimientos:{tipo}:{fecha.isoformat()}'
+
+
+def _aportes_cliente(datos):
+    return {f"clientes:{datos['estado']}": 1}
+
+
+def _aportes_producto(datos):
+    if datos['estado'] != 'activo':
+        return {}
+    stock_actual = datos['stock_actual'] or 0
+    aportes = {
+        'productos:activos': 1,
+        f"productos:categoria:{datos['categoria']}": 1,
+        'productos:valor': Decimal(str(datos['precio_costo'] or 0)) * stock_actual,
+    }
+    if stock_actual <= (datos['stock_minimo'] or 0):
+        aportes['productos:bajo_stock'] = 1
+    return aportes
+
+
+def _aportes_cita(datos):
+    return {
+        f"citas:estado:{datos['estado']}": 1,
+        clave_citas_dia(_dia(datos['fecha_cita'])): 1,
+    }
+
+
+def _aportes_movimiento(datos):
+    return {clave_movimientos_dia(datos['tipo_movimiento'], _dia(datos['fecha_movimiento'])): 1}
+
+
+# Modelo seguido -> (campos que influyen en los KPIs, función de aportes)
+SEGUIMIENTO = {
+    'clientes.Cliente': (('estado',), _aportes_cliente),
+    'inventario.Producto': (
+        ('estado', 'categoria', 'stock_actual', 'stock_minimo', 'precio_costo'),
+        _aportes_producto,
+    ),
+    'servicios.Cita': (('estado', 'fecha_cita'), _aportes_cita),
+    'inventario.MovimientoInventario': (('tipo_movimiento', 'fecha_movimiento'), _aportes_movimiento),
+}
+
+
+def aplicar_deltas(deltas):
+    """Suma cada delta a su contador, creando el contador si no existe."""
+    ahora = timezone.now()
+    for clave, delta in deltas.items():
+        if not delta:
+            continue
+        actualizados = ContadorDashboard.objects.filter(clave=clave).update(
+            valor=F('valor') + delta, fecha_actualizacion=ahora
+        )
+        if not actualizados:
+            _, creado = ContadorDashboard.objects.get_or_create(clave=clave, defaults={'valor': delta})
+            if not creado:
+                ContadorDashboard.objects.filter(clave=clave).update(
+                    valor=F('valor') + delta, fecha_actualizacion=ahora
+                )
+
+
+def _diferencia(anteriores, nuevos):
+    claves = set(anteriores) | set(nuevos)
+    return {c: nuevos.get(c, 0) - anteriores.get(c, 0) for c in claves}
+
+
+def kpis_afectados(deltas):
+    """Traduce los deltas de contadores a los KPIs que muestra el dashboard."""
+    mapa = {
+        'clientes:activo': 'total_clientes',
+        'productos:activos': 'total_productos',
+        'productos:bajo_stock': 'productos_bajo_stock',
+        'productos:valor': 'valor_inventario',
+        'citas:estado:programada': 'citas_pendientes',
+        clave_citas_dia(timezone.localdate()): 'citas_hoy',
+    }
+    return {mapa[clave]: delta for clave, delta in deltas.items() if clave in mapa and delta}
+
+
+def _emitir_evento(etiqueta, instance, creado, deltas):
+    """Publica en el feed los cambios que el dashboard muestra en vivo."""
+    if etiqueta == 'clientes.Cliente' and creado:
+        tipo, datos = 'nuevo_cliente', {'cliente': instance.nombre_completo}
+    elif etiqueta == 'servicios.Cita' and creado:
+        tipo, datos = 'nueva_cita', {'cita': instance.pk, 'fecha_cita': instance.fecha_cita}
+    elif etiqueta == 'inventario.Producto' and deltas.get('productos:bajo_stock', 0) > 0:
+        tipo, datos = 'stock_bajo_minimo', {
+            'producto': instance.nombre,
+            'stock_actual': instance.stock_actual,
+            'stock_minimo': instance.stock_minimo,
+        }
+    else:
+        return
+    datos['kpis'] = kpis_afectados(deltas)
+    registrar_evento(tipo, datos)
+
+
+def _guardar_estado_previo(sender, instance, raw=False, **kwargs):
+    instance._dashboard_previo = None
+    if raw or instance.pk is None:
+        return
+    campos, _ = SEGUIMIENTO[sender._meta.label]
+    instance._dashboard_previo = sender._base_manager.filter(pk=instance.pk).values(*campos).first()
+
+
+def _actualizar_tras_guardar(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    campos, aportes = SEGUIMIENTO[sender._meta.label]
+    previo = getattr(instance, '_dashboard_previo', None)
+    actual = {c: getattr(instance, c) for c in campos}
+    deltas = _diferencia(aportes(previo) if previo else {}, aportes(actual))
+    aplicar_deltas(deltas)
+    _emitir_evento(sender._meta.label, instance, created, deltas)
+    instance._dashboard_previo = None
+
+
+def _actualizar_tras_eliminar(sender, instance, **kwargs):
+    if sender._meta.label == 'inventario.MovimientoInventario' and en_eliminacion_en_bloque():
+        return  # Se descuenta por lote con `movimientos_eliminados`
+    campos, aportes = SEGUIMIENTO[sender._meta.label]
+    actual = {c: getattr(instance, c) for c in campos}
+    aplicar_deltas(_diferencia(aportes(actual), {}))
+
+
+def _actualizar_tras_ajuste_stock(sender, cambios, **kwargs):
+    """Aplica los cambios de stock hechos con UPDATE directo (ver `inventario.stock`)."""
+    totales = {}
+    for cambio in cambios:
+        anterior = dict(cambio, stock_actual=cambio['stock_anterior'])
+        deltas = _diferencia(_aportes_producto(anterior), _aportes_producto(cambio))
+        if deltas.get('productos:bajo_stock', 0) > 0:
+            registrar_evento('stock_bajo_minimo', {
+                'producto': cambio['nombre'],
+                'stock_actual': cambio['stock_actual'],
+                'stock_minimo': cambio['stock_minimo'],
+                'kpis': kpis_afectados(deltas),
+            })
+        for clave, delta in deltas.items():
+            totales[clave] = totales.get(clave, 0) + delta
+    aplicar_deltas(totales)
+
+
+def _actualizar_tras_registro_masivo(sender, movimientos, **kwargs):
+    """Cuenta los movimientos insertados con `bulk_create` (ver `inventario.stock`)."""
+    totales = {}
+    for movimiento in movimientos:
+        clave = clave_movimientos_dia(movimiento.tipo_movimiento, _dia(movimiento.fecha_movimiento))
+        totales[clave] = totales.get(clave, 0) + 1
+    aplicar_deltas(totales)
+
+
+def _actualizar_tras_eliminacion_masiva(sender, movimientos, **kwargs):
+    """Descuenta los movimientos archivados (ver `inventario.archivo`), una vez por lote."""
+    totales = {}
+    for movimiento in movimientos:
+        clave = clave_movimientos_dia(movimiento['tipo_movimiento'], _dia(movimiento['fecha_movimiento']))
+        totales[clave] = totales.get(clave, 0) - 1
+    aplicar_deltas(totales)
+
+
+def _actualizar_tras_registro_citas(sender, citas, **kwargs):
+    """Cuenta las citas insertadas con `bulk_create` (ver `servicios.registro`)."""
+    totales = {}
+    for cita in citas:
+        deltas = _aportes_cita({'estado': cita.estado, 'fecha_cita': cita.fecha_cita})
+        _emitir_evento('servicios.Cita', cita, True, deltas)
+        for clave, delta in deltas.items():
+            totales[clave] = totales.get(clave, 0) + delta
+    aplicar_deltas(totales)
+
+
+stock_actualizado.connect(_actualizar_tras_ajuste_stock, dispatch_uid='dashboard_stock_actualizado')
+movimientos_registrados.connect(_actualizar_tras_registro_masivo, dispatch_uid='dashboard_movimientos_registrados')
+movimientos_eliminados.connect(_actualizar_tras_eliminacion_masiva, dispatch_uid='dashboard_movimientos_eliminados')
+citas_registradas.connect(_actualizar_tras_registro_citas, dispatch_uid='dashboard_citas_registradas')
+
+for _etiqueta in SEGUIMIENTO:
+    pre_save.connect(_guardar_estado_previo, sender=_etiqueta, dispatch_uid=f'dashboard_pre_save_{_etiqueta}')
+    post_save.connect(_actualizar_tras_guardar, sender=_etiqueta, dispatch_uid=f'dashboard_post_save_{_etiqueta}')
+    post_delete.connect(_actualizar_tras_eliminar, sender=_etiqueta, dispatch_uid=f'dashboard_post_delete_{_etiqueta}')
+
+
+def calcular_contadores():
+    """Recalcula desde cero el valor de todos los contadores."""
+    from clientes.models import Cliente
+    from inventario.models import Producto, MovimientoInventario
+    from servicios.models import Cita
+
+    valores = {}
+    for fila in Cliente.objects.order_by().values('estado').annotate(total=Count('id')):
+        valores[f"clientes:{fila['estado']}"] = fila['total']
+
+    activos = Producto.objects.filter(estado='activo')
+    datos = activos.aggregate(
+        activos=Count('id'),
+        bajo_stock=Count('id', filter=Q(bajo_minimo=True)),
+        valor=Sum(F('precio_costo') * F('stock_actual'),
+                  output_field=DecimalField(max_digits=16, decimal_places=2)),
+    )
+    valores['productos:activos'] = datos['activos']
+    valores['productos:bajo_stock'] = datos['bajo_stock']
+    valores['productos:valor'] = datos['valor'] or Decimal('0')
+    for fila in activos.order_by().values('categoria').annotate(total=Count('id')):
+        valores[f"productos:categoria:{fila['categoria']}"] = fila['total']
+
+    for fila in Cita.objects.order_by().values('estado').annotate(total=Count('id')):
+        valores[f"citas:estado:{fila['estado']}"] = fila['total']
+    citas_por_dia = Cita.objects.order_by().annotate(dia=TruncDate('fecha_cita')).values('dia').annotate(
+        total=Count('id')
+    )
+    for fila in citas_por_dia:
+        valores[clave_citas_dia(fila['dia'])] = fila['total']
+
+    movimientos_por_dia = MovimientoInventario.objects.order_by().annotate(
+        dia=TruncDate('fecha_movimiento')
+    ).values('tipo_movimiento', 'dia').annotate(total=Count('id'))
+    for fila in movimientos_por_dia:
+        valores[clave_movimientos_dia(fila['tipo_movimiento'], fila['dia'])] = fila['total']
+
+    return valores
+
+
+def reconstruir_contadores():
+    """Reemplaza todos los contadores por sus valores recalculados."""
+    valores = calcular_contadores()
+    valores[CLAVE_INICIALIZADO] = 1
+    with transaction.atomic():
+        ContadorDashboard.objects.all().delete()
+        ContadorDashboard.objects.bulk_create(
+            [ContadorDashboard(clave=clave, valor=valor) for clave, valor in valores.items()]
+        )
+    return valores
@@ -0,0 +1,76 @@
+"""Feed de cambios del dashboard y su difusión por server-sent events.
+
+Los cambios relevantes se guardan en `EventoDashboard` al confirmarse la
+transacción. Cada proceso ASGI tiene un único `DifusorEventos` que consulta
+el feed por `id` (una consulta indexada cada pocos segundos, sin importar
+cuántos navegadores estén conectados) y reparte los eventos nuevos a las
+colas de cada conexión.
+"""
+import asyncio
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from .models import EventoDashboard
+
+# Segundos entre cada consulta al feed
+INTERVALO_SONDEO = 2
+# Máximo de eventos pendientes que se reenvían a un cliente que se reconecta
+MAX_EVENTOS_PENDIENTES = 200
+
+
+def registrar_evento(tipo, datos):
+    """Agrega un evento al feed cuando la transacción actual se confirme."""
+    transaction.on_commit(lambda: EventoDashboard.objects.create(tipo=tipo, datos=datos))
+
+
+def ultimo_id_evento():
+    ultimo = EventoDashboard.objects.order_by('-id').values_list('id', flat=True).first()
+    return ultimo or 0
+
+
+def formatear_evento(evento):
+    """Serializa un evento en el formato de server-sent events."""
+    datos = json.dumps(evento.datos, cls=DjangoJSONEncoder)
+    return f'id: {evento.id}\nevent: {evento.tipo}\ndata: {datos}\n\n'
+
+
+async def eventos_desde(ultimo_id, limite=MAX_EVENTOS_PENDIENTES):
+    consulta = EventoDashboard.objects.filter(id__gt=ultimo_id).order_by('id')[:limite]
+    return [evento async for evento in consulta]
+
+
+class DifusorEventos:
+    """Reparte los eventos nuevos del feed a todas las conexiones abiertas."""
+
+    def __init__(self, intervalo=INTERVALO_SONDEO):
+        self.intervalo = intervalo
+        self._colas = set()
+        self._tarea = None
+        self._ultimo_id = None
+
+    def suscribir(self):
+        cola = asyncio.Queue()
+        self._colas.add(cola)
+        if self._tarea is None or self._tarea.done():
+            self._tarea = asyncio.ensure_future(self._sondear())
+        return cola
+
+    def cancelar(self, cola):
+        self._colas.discard(cola)
+
+    async def _sondear(self):
+        if self._ultimo_id is None:
+            ultimo = await EventoDashboard.objects.order_by('-id').values_list('id', flat=True).afirst()
+            self._ultimo_id = ultimo or 0
+        while self._colas:
+            eventos = await eventos_desde(self._ultimo_id)
+            for evento in eventos:
+                self._ultimo_id = evento.id
+                for cola in list(self._colas):
+                    cola.put_nowait(evento)
+            await asyncio.sleep(self.intervalo)
+
+
+difusor = DifusorEventos()
@@ -0,0 +1,20 @@
+"""Días locales expresados como rangos de instantes.
+
+Filtrar con `fecha_cita__date=dia` obliga a la base a aplicar DATE() (y la
+conversión de zona horaria) a cada fila, así que no puede usar los índices
+sobre la columna. `fecha_cita__gte=desde, fecha_cita__lt=hasta` es un rango
+sobre la columna y sí los usa.
+"""
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+
+def inicio_del_dia(fecha):
+    """Primer instante (con zona horaria) del día local `fecha`."""
+    return timezone.make_aware(datetime.combine(fecha, time.min))
+
+
+def rango_dia_local(fecha, dias=1):
+    """Instantes [desde, hasta) que cubren `dias` días locales a partir de `fecha`."""
+    return inicio_del_dia(fecha), inicio_del_dia(fecha + timedelta(days=dias))
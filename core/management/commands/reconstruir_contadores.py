@@ -0,0 +1,46 @@
+from dataclasses import asdict
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.contadores import reconstruir_contadores
+from core.models import EventoDashboard
+from core.metricas import calcular_metricas_dashboard, leer_metricas_dashboard
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye desde cero los contadores del dashboard para corregir desviaciones.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verificar',
+            action='store_true',
+            help='Solo compara los contadores con los valores reales, sin modificarlos.',
+        )
+        parser.add_argument(
+            '--dias-eventos',
+            type=int,
+            default=7,
+            help='Elimina los eventos del dashboard más antiguos que esta cantidad de días (por defecto 7).',
+        )
+
+    def handle(self, *args, **options):
+        if options['verificar']:
+            leidas = asdict(leer_metricas_dashboard())
+            calculadas = asdict(calcular_metricas_dashboard())
+            diferencias = {k: (leidas[k], v) for k, v in calculadas.items() if leidas[k] != v}
+            if not diferencias:
+                self.stdout.write(self.style.SUCCESS('Los contadores coinciden con los datos.'))
+                return
+            for indicador, (contador, real) in diferencias.items():
+                self.stdout.write(self.style.WARNING(f'{indicador}: contador={contador} real={real}'))
+            return
+
+        valores = reconstruir_contadores()
+        self.stdout.write(self.style.SUCCESS(f'Se reconstruyeron {len(valores)} contadores.'))
+
+        limite = timezone.now() - timedelta(days=options['dias_eventos'])
+        eliminados, _ = EventoDashboard.objects.filter(fecha__lt=limite).delete()
+        if eliminados:
+            self.stdout.write(f'Se eliminaron {eliminados} eventos antiguos del dashboard.')
@@ -0,0 +1,187 @@
+"""Indicadores (KPIs) del dashboard principal.
+
+`leer_metricas_dashboard` arma los KPIs a partir de los contadores
+incrementales de `core.contadores` (lectura de unas pocas filas).
+`calcular_metricas_dashboard` los calcula directamente sobre las tablas,
+agrupando los indicadores de cada tabla en una sola consulta con agregados
+condicionales (`Count(filter=...)`); se usa para verificar los contadores.
+"""
+from dataclasses import dataclass, field
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Count, DecimalField, F, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from clientes.models import Cliente
+from colaboradores.models import Colaborador
+from inventario.models import Producto, MovimientoInventario
+from proveedores.models import Proveedor
+from servicios.models import Cita
+from .fechas import inicio_del_dia, rango_dia_local
+from .contadores import CLAVE_INICIALIZADO, clave_citas_dia, clave_movimientos_dia, reconstruir_contadores
+from .models import ContadorDashboard
+
+# Días que cubre el gráfico de movimientos de inventario (incluye hoy)
+DIAS_MOVIMIENTOS = 7
+
+
+@dataclass
+class MetricasDashboard:
+    """Resultado con todos los indicadores que muestra el dashboard."""
+    total_clientes: int = 0
+    clientes_activos: int = 0
+    clientes_inactivos: int = 0
+    total_productos: int = 0
+    productos_bajo_stock: int = 0
+    total_colaboradores: int = 0
+    total_proveedores: int = 0
+    citas_hoy: int = 0
+    citas_pendientes: int = 0
+    valor_inventario: Decimal = Decimal('0')
+    categorias: list = field(default_factory=list)
+    cantidades_productos: list = field(default_factory=list)
+    entradas: int = 0
+    salidas: int = 0
+    ajustes: int = 0
+    citas_por_estado: list = field(default_factory=list)
+
+
+def _metricas_clientes(metricas):
+    datos = Cliente.objects.aggregate(
+        activos=Count('id', filter=Q(estado='activo')),
+        inactivos=Count('id', filter=Q(estado='inactivo')),
+    )
+    metricas.clientes_activos = datos['activos']
+    metricas.clientes_inactivos = datos['inactivos']
+    metricas.total_clientes = datos['activos']
+
+
+def _metricas_productos(metricas):
+    activos = Q(estado='activo')
+    datos = Producto.objects.aggregate(
+        total=Count('id', filter=activos),
+        bajo_stock=Count('id', filter=activos & Q(bajo_minimo=True)),
+        valor=Coalesce(
+            Sum(F('precio_costo') * F('stock_actual'), filter=activos,
+                output_field=DecimalField(max_digits=16, decimal_places=2)),
+            Decimal('0'),
+            output_field=DecimalField(max_digits=16, decimal_places=2),
+        ),
+    )
+    metricas.total_productos = datos['total']
+    metricas.productos_bajo_stock = datos['bajo_stock']
+    metricas.valor_inventario = datos['valor']
+
+    # Productos por categoría (ordenados alfabéticamente por clave)
+    por_categoria = Producto.objects.filter(activos).values('categoria').annotate(
+        total=Count('id')
+    ).order_by('categoria')
+    categoria_dict = dict(Producto.CATEGORIA_CHOICES)
+    metricas.categorias = [categoria_dict.get(p['categoria'], p['categoria']) for p in por_categoria]
+    metricas.cantidades_productos = [p['total'] for p in por_categoria]
+
+
+def _metricas_citas(metricas):
+    desde, hasta = rango_dia_local(timezone.localdate())
+    agregados = {
+        'hoy': Count('id', filter=Q(fecha_cita__gte=desde, fecha_cita__lt=hasta)),
+    }
+    for estado, _ in Cita.ESTADO_CHOICES:
+        agregados[estado] = Count('id', filter=Q(estado=estado))
+    datos = Cita.objects.aggregate(**agregados)
+
+    metricas.citas_hoy = datos['hoy']
+    metricas.citas_pendientes = datos['programada']
+    metricas.citas_por_estado = [
+        {'estado': estado, 'total': datos[estado]}
+        for estado, _ in Cita.ESTADO_CHOICES if datos[estado]
+    ]
+
+
+def _metricas_movimientos(metricas):
+    primer_dia = timezone.localdate() - timedelta(days=DIAS_MOVIMIENTOS - 1)
+    desde = inicio_del_dia(primer_dia)
+    datos = MovimientoInventario.objects.filter(
+        fecha_movimiento__gte=desde
+    ).aggregate(
+        entradas=Count('id', filter=Q(tipo_movimiento='entrada')),
+        salidas=Count('id', filter=Q(tipo_movimiento='salida')),
+        ajustes=Count('id', filter=Q(tipo_movimiento='ajuste')),
+    )
+    metricas.entradas = datos['entradas']
+    metricas.salidas = datos['salidas']
+    metricas.ajustes = datos['ajustes']
+
+
+def calcular_metricas_dashboard():
+    """Calcula todos los KPIs del dashboard con consultas agregadas.
+
+    Devuelve una instancia de `MetricasDashboard`.
+    """
+    metricas = MetricasDashboard()
+    _metricas_clientes(metricas)
+    _metricas_productos(metricas)
+    _metricas_citas(metricas)
+    _metricas_movimientos(metricas)
+    metricas.total_colaboradores = Colaborador.objects.filter(estado='activo').count()
+    metricas.total_proveedores = Proveedor.objects.filter(estado='activo').count()
+    return metricas
+
+
+def leer_metricas_dashboard():
+    """Arma los KPIs del dashboard leyendo los contadores precalculados.
+
+    Si los contadores nunca se inicializaron, se reconstruyen en el momento.
+    """
+    hoy = timezone.localdate()
+    dias = [hoy - timedelta(days=n) for n in range(DIAS_MOVIMIENTOS)]
+    tipos_movimiento = [tipo for tipo, _ in MovimientoInventario.TIPO_MOVIMIENTO_CHOICES]
+
+    claves = [CLAVE_INICIALIZADO, 'clientes:activo', 'clientes:inactivo', 'productos:activos',
+              'productos:bajo_stock', 'productos:valor', clave_citas_dia(hoy)]
+    claves += [f'productos:categoria:{categoria}' for categoria, _ in Producto.CATEGORIA_CHOICES]
+    claves += [f'citas:estado:{estado}' for estado, _ in Cita.ESTADO_CHOICES]
+    claves += [clave_movimientos_dia(tipo, dia) for tipo in tipos_movimiento for dia in dias]
+
+    valores = dict(ContadorDashboard.objects.filter(clave__in=claves).values_list('clave', 'valor'))
+    if CLAVE_INICIALIZADO not in valores:
+        valores = reconstruir_contadores()
+
+    def entero(clave):
+        return int(valores.get(clave, 0))
+
+    metricas = MetricasDashboard(
+        total_clientes=entero('clientes:activo'),
+        clientes_activos=entero('clientes:activo'),
+        clientes_inactivos=entero('clientes:inactivo'),
+        total_productos=entero('productos:activos'),
+        productos_bajo_stock=entero('productos:bajo_stock'),
+        citas_hoy=entero(clave_citas_dia(hoy)),
+        citas_pendientes=entero('citas:estado:programada'),
+        valor_inventario=Decimal(valores.get('productos:valor', 0)),
+    )
+
+    categoria_dict = dict(Producto.CATEGORIA_CHOICES)
+    for categoria in sorted(categoria_dict):
+        total = entero(f'productos:categoria:{categoria}')
+        if total:
+            metricas.categorias.append(categoria_dict[categoria])
+            metricas.cantidades_productos.append(total)
+
+    metricas.citas_por_estado = [
+        {'estado': estado, 'total': entero(f'citas:estado:{estado}')}
+        for estado, _ in Cita.ESTADO_CHOICES if entero(f'citas:estado:{estado}')
+    ]
+
+    totales_movimientos = {
+        tipo: sum(entero(clave_movimientos_dia(tipo, dia)) for dia in dias) for tipo in tipos_movimiento
+    }
+    metricas.entradas = totales_movimientos['entrada']
+    metricas.salidas = totales_movimientos['salida']
+    metricas.ajustes = totales_movimientos['ajuste']
+
+    metricas.total_colaboradores = Colaborador.objects.filter(estado='activo').count()
+    metricas.total_proveedores = Proveedor.objects.filter(estado='activo').count()
+    return metricas
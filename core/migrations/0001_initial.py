@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContadorDashboard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(max_length=80, unique=True)),
+                ('valor', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Contador del Dashboard',
+                'verbose_name_plural': 'Contadores del Dashboard',
+                'ordering': ['clave'],
+            },
+        ),
+    ]
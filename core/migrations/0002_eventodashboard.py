@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:25
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoDashboard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('nueva_cita', 'Nueva cita'), ('nuevo_cliente', 'Nuevo cliente'), ('stock_bajo_minimo', 'Stock bajo el mínimo')], max_length=30)),
+                ('datos', models.JSONField(blank=True, default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('fecha', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Evento del Dashboard',
+                'verbose_name_plural': 'Eventos del Dashboard',
+                'ordering': ['id'],
+            },
+        ),
+    ]
@@ -1,3 +1,47 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 
-# Create your models here.
+
+class ContadorDashboard(models.Model):
+    """Contador precalculado de un KPI del dashboard.
+
+    Los valores se mantienen de forma incremental desde `core.contadores`
+    (señales de Cliente, Producto, Cita y MovimientoInventario) y se pueden
+    reconstruir con `python manage.py reconstruir_contadores`.
+    """
+    clave = models.CharField(max_length=80, unique=True)
+    valor = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Contador del Dashboard"
+        verbose_name_plural = "Contadores del Dashboard"
+        ordering = ['clave']
+
+    def __str__(self):
+        return f"{self.clave} = {self.valor}"
+
+
+class EventoDashboard(models.Model):
+    """Registro liviano de cambios que se envían en vivo al dashboard.
+
+    Funciona como un feed ordenado por `id`: los clientes conectados por
+    server-sent events reciben los eventos con `id` mayor al último visto.
+    """
+    TIPO_EVENTO_CHOICES = [
+        ('nueva_cita', 'Nueva cita'),
+        ('nuevo_cliente', 'Nuevo cliente'),
+        ('stock_bajo_minimo', 'Stock bajo el mínimo'),
+    ]
+
+    tipo = models.CharField(max_length=30, choices=TIPO_EVENTO_CHOICES)
+    datos = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    fecha = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Evento del Dashboard"
+        verbose_name_plural = "Eventos del Dashboard"
+        ordering = ['id']
+
+    def __str__(self):
+        return f"#{self.id} {self.get_tipo_display()}"
@@ -0,0 +1,177 @@
+"""Paginación por clave (keyset) para los listados.
+
+En lugar de `OFFSET`, cada página pide las filas que siguen a la última de
+la página anterior según el orden del listado (`WHERE (nombre, id) > (...)`),
+por lo que el costo de una página no crece con la profundidad. El cursor
+que viaja en la URL contiene los valores de orden de esa fila.
+
+El orden se toma del queryset o de `Meta.ordering` del modelo y siempre se
+completa con la clave primaria para que sea total. Los campos de orden no
+deben admitir NULL.
+
+`lotes_por_clave` usa la misma técnica para recorrer consultas completas
+(exportaciones) sin depender de que el driver lea el resultado por partes.
+"""
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+
+from django.db.models import Q
+
+POR_PAGINA = 25
+
+
+def _campos_orden(queryset, orden):
+    """Lista de (campo, descendente) con la clave primaria al final."""
+    orden = orden or queryset.query.order_by or queryset.model._meta.ordering
+    campos = []
+    for campo in orden:
+        if not isinstance(campo, str):
+            raise ValueError('La paginación por clave solo admite ordenar por nombres de campo.')
+        campos.append((campo.lstrip('-'), campo.startswith('-')))
+    nombre_pk = queryset.model._meta.pk.name
+    if not any(campo in ('pk', nombre_pk) for campo, _ in campos):
+        # Desempate con la misma dirección que el último campo (aprovecha el mismo índice)
+        campos.append(('pk', campos[-1][1] if campos else False))
+    return campos
+
+
+def _valor(objeto, campo):
+    for parte in campo.split('__'):
+        objeto = getattr(objeto, parte)
+    return objeto
+
+
+def _serializar(valor):
+    # isoformat completo: DjangoJSONEncoder recorta los microsegundos y el cursor dejaría de ser exacto
+    if hasattr(valor, 'isoformat'):
+        return valor.isoformat()
+    return str(valor)
+
+
+def _codificar(valores):
+    datos = json.dumps(valores, default=_serializar, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(datos).decode().rstrip('=')
+
+
+def _decodificar(cursor, cantidad):
+    try:
+        valores = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError):
+        return None
+    if not isinstance(valores, list) or len(valores) != cantidad:
+        return None
+    return valores
+
+
+def _condicion(campos, valores, hacia_atras):
+    """Filas posteriores (o anteriores) a `valores` en el orden de `campos`."""
+    condicion = Q()
+    iguales = {}
+    for (campo, descendente), valor in zip(campos, valores):
+        comparacion = 'gt' if descendente == hacia_atras else 'lt'
+        condicion |= Q(**iguales, **{f'{campo}__{comparacion}': valor})
+        iguales[campo] = valor
+    return condicion
+
+
+@dataclass
+class PaginaKeyset:
+    """Una página de un listado y los enlaces a sus vecinas."""
+    objetos: list
+    url_primera: str = None
+    url_anterior: str = None
+    url_siguiente: str = None
+    total: int = None
+
+    def __iter__(self):
+        return iter(self.objetos)
+
+    def __len__(self):
+        return len(self.objetos)
+
+    @property
+    def tiene_otras_paginas(self):
+        return bool(self.url_anterior or self.url_siguiente)
+
+
+def _url(request, parametro=None, cursor=None):
+    """URL de la página actual con el cursor indicado (sin cursor: primera página)."""
+    parametros = request.GET.copy()
+    parametros.pop('antes', None)
+    parametros.pop('despues', None)
+    if parametro:
+        parametros[parametro] = cursor
+    return f'{request.path}?{parametros.urlencode()}' if parametros else request.path
+
+
+def paginar(request, queryset, orden=None, por_pagina=POR_PAGINA, contar=False):
+    """Devuelve la `PaginaKeyset` pedida en `request` (parámetros `despues`/`antes`).
+
+    No se hace `COUNT` salvo que se pida `contar=True`; para saber si hay
+    página siguiente se lee una fila de más.
+    """
+    campos = _campos_orden(queryset, orden)
+
+    def ordenar(hacia_atras):
+        return queryset.order_by(*[
+            f"{'-' if descendente != hacia_atras else ''}{campo}" for campo, descendente in campos
+        ])
+
+    def clave(objeto):
+        return _codificar([_valor(objeto, campo) for campo, _ in campos])
+
+    total = queryset.count() if contar else None
+    despues = _decodificar(request.GET.get('despues', ''), len(campos))
+    antes = _decodificar(request.GET.get('antes', ''), len(campos)) if despues is None else None
+
+    if antes is not None:
+        filas = list(ordenar(True).filter(_condicion(campos, antes, True))[:por_pagina + 1])
+        if len(filas) > por_pagina:
+            objetos = filas[:por_pagina][::-1]
+            return PaginaKeyset(
+                objetos,
+                url_primera=_url(request),
+                url_anterior=_url(request, 'antes', clave(objetos[0])),
+                url_siguiente=_url(request, 'despues', clave(objetos[-1])),
+                total=total,
+            )
+        # Se llegó al principio: se muestra la primera página completa
+        despues = None
+
+    filas = ordenar(False)
+    if despues is not None:
+        filas = filas.filter(_condicion(campos, despues, False))
+    filas = list(filas[:por_pagina + 1])
+    objetos = filas[:por_pagina]
+    return PaginaKeyset(
+        objetos,
+        url_primera=_url(request) if despues is not None else None,
+        url_anterior=_url(request, 'antes', clave(objetos[0])) if despues is not None and objetos else None,
+        url_siguiente=_url(request, 'despues', clave(objetos[-1])) if len(filas) > por_pagina else None,
+        total=total,
+    )
+
+
+def lotes_por_clave(queryset, campos, tamano):
+    """Filas de `queryset` como tuplas de `values_list(*campos)`, en listas de hasta `tamano`.
+
+    Cada lote es una consulta propia que sigue a la última fila del anterior,
+    así que en memoria sólo hay un lote a la vez aunque el driver (p. ej.
+    pymysql) cargue completo el resultado de cada consulta.
+    """
+    orden = _campos_orden(queryset, None)
+    consulta = queryset.order_by(*[
+        f"{'-' if descendente else ''}{campo}" for campo, descendente in orden
+    ]).values_list(*campos, *[campo for campo, _ in orden])
+    cantidad = len(campos)
+    ultima = None
+    while True:
+        pagina = consulta if ultima is None else consulta.filter(_condicion(orden, ultima, False))
+        filas = list(pagina[:tamano])
+        if filas:
+            yield [fila[:cantidad] for fila in filas]
+        if len(filas) < tamano:
+            return
+        ultima = filas[-1][cantidad:]
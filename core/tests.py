@@ -1,3 +1,58 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
 
-# Create your tests here.
+from .models import ContadorDashboard
+from .paginacion import paginar
+from .versiones import invalidar, version
+
+
+class PaginacionKeysetTest(TestCase):
+
+    def setUp(self):
+        # Valores repetidos para que el desempate por clave primaria importe
+        ContadorDashboard.objects.bulk_create(
+            [ContadorDashboard(clave=f'c{i:02d}', valor=i % 4) for i in range(23)]
+        )
+        self.factory = RequestFactory()
+
+    def recorrer(self, url, direccion):
+        vistos = []
+        while url:
+            pagina = paginar(self.factory.get(url), ContadorDashboard.objects.all(), orden=['-valor'], por_pagina=5)
+            objetos = [c.pk for c in pagina]
+            vistos = vistos + objetos if direccion == 'siguiente' else objetos + vistos
+            url = pagina.url_siguiente if direccion == 'siguiente' else pagina.url_anterior
+            ultima = pagina
+        return vistos, ultima
+
+    def test_recorre_todas_las_filas_en_ambas_direcciones(self):
+        esperado = list(ContadorDashboard.objects.order_by('-valor', '-pk').values_list('pk', flat=True))
+
+        hacia_adelante, ultima = self.recorrer('/contadores/', 'siguiente')
+        self.assertEqual(hacia_adelante, esperado)
+        self.assertIsNone(ultima.total)
+
+        hacia_atras, primera = self.recorrer(ultima.url_anterior, 'anterior')
+        self.assertEqual(hacia_atras, esperado[:len(hacia_atras)])
+        self.assertEqual(len(primera), 5)
+
+    def test_cursor_invalido_muestra_la_primera_pagina(self):
+        pagina = paginar(self.factory.get('/contadores/', {'despues': 'no-es-un-cursor'}),
+                         ContadorDashboard.objects.all(), por_pagina=5, contar=True)
+        self.assertEqual([c.clave for c in pagina], ['c00', 'c01', 'c02', 'c03', 'c04'])
+        self.assertEqual(pagina.total, 23)
+        self.assertIsNone(pagina.url_anterior)
+
+
+class VersionesTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_la_version_sube_al_confirmar_la_transaccion(self):
+        inicial = version('prueba')
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidar('prueba')
+            # Un lector concurrente antes del commit guardaría bajo la versión anterior
+            self.assertEqual(version('prueba'), inicial)
+        self.assertEqual(version('prueba'), inicial + 1)
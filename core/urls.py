@@ -3,4 +3,6 @@ from . import views
 
 urlpatterns = [
     path('', views.index, name='index'),
-]
\ No newline at end of file
+    path('dashboard/datos/<str:widget>/', views.dashboard_datos, name='dashboard_datos'),
+    path('dashboard/eventos/', views.dashboard_eventos, name='dashboard_eventos'),
+]
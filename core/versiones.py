@@ -0,0 +1,44 @@
+"""Versiones de datos para invalidar entradas de caché.
+
+Las entradas que dependen de ciertos datos incluyen en su clave la versión
+actual (`version('inventario')`). Cuando los datos cambian se llama a
+`invalidar('inventario')`: la versión sube y las entradas anteriores dejan
+de leerse (expiran solas), sin tener que conocer ni borrar cada clave.
+
+La versión sube al confirmarse la transacción en curso: si subiera antes,
+un lector concurrente podría calcular con los datos previos al commit y
+guardarlos bajo la versión nueva.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+def _clave(nombre):
+    return f'version:{nombre}'
+
+
+def version(nombre):
+    """Versión actual de los datos `nombre`."""
+    valor = cache.get(_clave(nombre))
+    if valor is None:
+        # Arranca en un valor que no repite versiones anteriores si la clave fue desalojada
+        cache.add(_clave(nombre), time.time_ns(), None)
+        valor = cache.get(_clave(nombre))
+    return valor
+
+
+def _subir(nombre):
+    try:
+        cache.incr(_clave(nombre))
+    except ValueError:
+        cache.add(_clave(nombre), time.time_ns(), None)
+
+
+def invalidar(nombre):
+    """Descarta todas las entradas de caché que dependen de los datos `nombre`.
+
+    Fuera de una transacción la versión sube en el acto; dentro, al confirmarse.
+    """
+    transaction.on_commit(lambda: _subir(nombre))
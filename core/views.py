@@ -1,99 +1,157 @@
+from django.contrib.auth.decorators import login_required
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect
-from django.db.models import Count, Sum, F
-from django.utils import timezone
-from datetime import timedelta
-from clientes.models import Cliente
-from inventario.models import Producto, MovimientoInventario
-from servicios.models import Servicio, Cita
-from colaboradores.models import Colaborador
-from proveedores.models import Proveedor
+from django.utils.cache import get_conditional_response, patch_cache_control
+from inventario.models import Producto
+from .eventos import difusor, eventos_desde, formatear_evento, ultimo_id_evento, MAX_EVENTOS_PENDIENTES
+from .metricas import leer_metricas_dashboard
+import asyncio
+import hashlib
 import json
 
+# Segundos sin eventos tras los cuales se envía un comentario para mantener viva la conexión
+SSE_KEEPALIVE = 15
+
+
 def index(request):
     # Redirigir a login si el usuario no está autenticado
     if not request.user.is_authenticated:
         return redirect('/usuarios/')
-    
-    # KPIs principales
-    total_clientes = Cliente.objects.filter(estado='activo').count()
-    total_productos = Producto.objects.filter(estado='activo').count()
-    total_colaboradores = Colaborador.objects.filter(estado='activo').count()
-    total_proveedores = Proveedor.objects.filter(estado='activo').count()
-    
-    # Stock bajo mínimo
-    productos_bajo_stock = Producto.objects.filter(
-        stock_actual__lte=F('stock_minimo'),
-        estado='activo'
-    ).count()
-    
-    # Citas de hoy y pendientes
-    hoy = timezone.now().date()
-    citas_hoy = Cita.objects.filter(fecha_cita__date=hoy).count()
-    citas_pendientes = Cita.objects.filter(estado='programada').count()
-    
-    # Valor total del inventario
-    productos_activos = Producto.objects.filter(estado='activo')
-    valor_inventario = sum(p.precio_costo * p.stock_actual for p in productos_activos)
-    
-    # Datos para gráfico de productos por categoría (ordenados alfabéticamente)
-    productos_por_categoria = Producto.objects.filter(estado='activo').values('categoria').annotate(
-        total=Count('id')
-    ).order_by('categoria')
-    
-    # Obtener nombres legibles de las categorías
-    categoria_dict = dict(Producto.CATEGORIA_CHOICES)
-    categorias = [categoria_dict.get(p['categoria'], p['categoria']) for p in productos_por_categoria]
-    cantidades_productos = [p['total'] for p in productos_por_categoria]
-    
-    # Datos para gráfico de clientes activos vs inactivos
-    clientes_activos = Cliente.objects.filter(estado='activo').count()
-    clientes_inactivos = Cliente.objects.filter(estado='inactivo').count()
-    
-    # Datos para gráfico de movimientos de inventario (últimos 7 días)
-    fecha_hace_7_dias = timezone.now() - timedelta(days=7)
-    movimientos_recientes = MovimientoInventario.objects.filter(
-        fecha_movimiento__gte=fecha_hace_7_dias
-    ).values('tipo_movimiento').annotate(
-        total=Count('id')
-    )
-    
-    movimientos_dict = {m['tipo_movimiento']: m['total'] for m in movimientos_recientes}
-    
+
+    # La página se entrega sin datos; cada widget se carga desde `dashboard_datos`
+    return render(request, 'core/dashboard.html')
+
+
+def _datos_kpis():
+    metricas = leer_metricas_dashboard()
+    return {
+        'total_clientes': metricas.total_clientes,
+        'total_productos': metricas.total_productos,
+        'total_colaboradores': metricas.total_colaboradores,
+        'total_proveedores': metricas.total_proveedores,
+        'productos_bajo_stock': metricas.productos_bajo_stock,
+        'citas_hoy': metricas.citas_hoy,
+        'citas_pendientes': metricas.citas_pendientes,
+        'valor_inventario': metricas.valor_inventario,
+        'citas_por_estado': metricas.citas_por_estado,
+        # Último evento ya reflejado en estos datos (ver `dashboard_eventos`)
+        'ultimo_evento': ultimo_id_evento(),
+    }
+
+
+def _datos_categorias():
+    metricas = leer_metricas_dashboard()
+    return {'categorias': metricas.categorias, 'cantidades': metricas.cantidades_productos}
+
+
+def _datos_clientes():
+    metricas = leer_metricas_dashboard()
+    return {'activos': metricas.clientes_activos, 'inactivos': metricas.clientes_inactivos}
+
+
+def _datos_movimientos():
+    metricas = leer_metricas_dashboard()
+    return {'entradas': metricas.entradas, 'salidas': metricas.salidas, 'ajustes': metricas.ajustes}
+
+
+def _datos_criticos():
     # Productos con menor stock (top 5)
-    productos_criticos = Producto.objects.filter(estado='activo').order_by('stock_actual')[:5]
-    
-    # Citas por estado
-    citas_por_estado = Cita.objects.values('estado').annotate(
-        total=Count('id')
-    )
-    
-    context = {
-        # KPIs
-        'total_clientes': total_clientes,
-        'total_productos': total_productos,
-        'total_colaboradores': total_colaboradores,
-        'total_proveedores': total_proveedores,
-        'productos_bajo_stock': productos_bajo_stock,
-        'citas_hoy': citas_hoy,
-        'citas_pendientes': citas_pendientes,
-        'valor_inventario': valor_inventario,
-        
-        # Datos para gráficos (convertir a JSON)
-        'categorias_json': json.dumps(categorias),
-        'cantidades_productos_json': json.dumps(cantidades_productos),
-        'clientes_activos': clientes_activos,
-        'clientes_inactivos': clientes_inactivos,
-        
-        # Movimientos
-        'entradas': movimientos_dict.get('entrada', 0),
-        'salidas': movimientos_dict.get('salida', 0),
-        'ajustes': movimientos_dict.get('ajuste', 0),
-        
-        # Productos críticos
-        'productos_criticos': productos_criticos,
-        
-        # Citas por estado
-        'citas_por_estado': citas_por_estado,
+    productos = Producto.objects.filter(estado='activo').order_by('stock_actual')[:5]
+    return {
+        'productos': [
+            {
+                'nombre': p.nombre,
+                'categoria': p.get_categoria_display(),
+                'stock_actual': p.stock_actual,
+                'stock_minimo': p.stock_minimo,
+            }
+            for p in productos
+        ]
     }
-    
-    return render(request, 'core/dashboard.html', context)
\ No newline at end of file
+
+
+# Widget -> (función que arma los datos, segundos de caché)
+WIDGETS_DASHBOARD = {
+    'kpis': (_datos_kpis, 30),
+    'categorias': (_datos_categorias, 300),
+    'clientes': (_datos_clientes, 300),
+    'movimientos': (_datos_movimientos, 120),
+    'criticos': (_datos_criticos, 60),
+}
+
+
+@login_required
+def dashboard_datos(request, widget):
+    """Devuelve en JSON los datos de un widget del dashboard.
+
+    Cada widget se guarda en caché con su propio TTL y se entrega con
+    `Cache-Control` y `ETag`, respondiendo 304 si el navegador ya lo tiene.
+    """
+    if widget not in WIDGETS_DASHBOARD:
+        raise Http404('Widget no encontrado')
+    construir, ttl = WIDGETS_DASHBOARD[widget]
+
+    cuerpo = cache.get_or_set(
+        f'dashboard:widget:{widget}',
+        lambda: json.dumps(construir(), cls=DjangoJSONEncoder),
+        ttl,
+    )
+    etag = '"%s"' % hashlib.md5(cuerpo.encode('utf-8')).hexdigest()
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(cuerpo, content_type='application/json')
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, max_age=ttl)
+    return response
+
+
+def _ultimo_evento_visto(request):
+    """Id del último evento que tiene el navegador (reconexión o carga inicial)."""
+    valor = request.headers.get('Last-Event-ID') or request.GET.get('desde')
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+@login_required
+async def dashboard_eventos(request):
+    """Flujo de server-sent events con los cambios de KPIs del dashboard.
+
+    Requiere un servidor ASGI (por ejemplo `uvicorn ClinicaEsteticaERP.asgi:application`);
+    bajo WSGI el flujo no se puede mantener abierto.
+    """
+    ultimo_visto = _ultimo_evento_visto(request)
+
+    async def flujo():
+        cola = difusor.suscribir()
+        try:
+            yield 'retry: 5000\n\n'
+            ultimo_enviado = ultimo_visto or 0
+            if ultimo_visto is not None:
+                pendientes = await eventos_desde(ultimo_visto)
+                if len(pendientes) >= MAX_EVENTOS_PENDIENTES:
+                    # Demasiados cambios: es más barato volver a cargar los KPIs
+                    yield 'event: recargar\ndata: {}\n\n'
+                for evento in pendientes:
+                    ultimo_enviado = evento.id
+                    yield formatear_evento(evento)
+            while True:
+                try:
+                    evento = await asyncio.wait_for(cola.get(), timeout=SSE_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ': keepalive\n\n'
+                    continue
+                if evento.id > ultimo_enviado:
+                    ultimo_enviado = evento.id
+                    yield formatear_evento(evento)
+        finally:
+            difusor.cancelar(cola)
+
+    response = StreamingHttpResponse(flujo(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
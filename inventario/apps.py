@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class InventarioConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'inventario'
+
+    def ready(self):
+        # Invalidar la valorización en caché ante cambios de stock o precio
+        from . import valoracion  # noqa: F401
+        # Mantener el índice de búsqueda de productos al guardarlos
+        from . import busqueda  # noqa: F401
@@ -0,0 +1,178 @@
+"""Archivo de movimientos antiguos y consultas que combinan ambas fuentes.
+
+Los movimientos anteriores a la ventana de retención se trasladan a
+`MovimientoInventarioArchivado` y se acumulan por mes, producto y tipo en
+`ResumenMensualMovimiento`. El corte siempre cae en el primer día de un mes,
+así que cada mes queda completo en una sola de las dos fuentes.
+
+Las consultas de este módulo leen los meses completos del resumen, los
+tramos parciales de la tabla archivada y el resto de los movimientos
+vigentes, siempre por rangos de fecha y hora que pueden usar los índices.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, DateField, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from core.fechas import inicio_del_dia, rango_dia_local
+
+from .historial import generar_snapshots
+from .models import MovimientoInventario, MovimientoInventarioArchivado, ResumenMensualMovimiento
+from .signals import eliminacion_en_bloque, movimientos_eliminados
+
+CAMPOS_MOVIMIENTO = ('id', 'producto_id', 'tipo_movimiento', 'cantidad', 'motivo', 'usuario_id', 'fecha_movimiento')
+# Mínimo de meses a conservar: el pronóstico de consumo lee los últimos 90 días
+MESES_RETENCION_MINIMO = 4
+
+
+def rango_fechas(fecha_inicio, fecha_fin):
+    """Instantes [desde, hasta) que cubren los días `fecha_inicio` a `fecha_fin` inclusive."""
+    return rango_dia_local(fecha_inicio, (fecha_fin - fecha_inicio).days + 1)
+
+
+def _sumar_meses(fecha, meses):
+    total = fecha.year * 12 + fecha.month - 1 + meses
+    return fecha.replace(year=total // 12, month=total % 12 + 1, day=1)
+
+
+def fecha_corte(meses_retencion, hoy=None):
+    """Primer día del mes más antiguo que se conserva en la tabla de movimientos."""
+    hoy = hoy or timezone.localdate()
+    return _sumar_meses(hoy.replace(day=1), -meses_retencion)
+
+
+def archivar_lote(corte, tamano_lote):
+    """Archiva hasta `tamano_lote` movimientos anteriores a `corte` en una transacción.
+
+    Devuelve la cantidad de movimientos archivados (0 cuando no quedan).
+    """
+    limite = inicio_del_dia(corte)
+    with transaction.atomic():
+        filas = list(
+            MovimientoInventario.objects.filter(fecha_movimiento__lt=limite)
+            .order_by('fecha_movimiento', 'id')
+            .select_for_update()
+            .values(*CAMPOS_MOVIMIENTO)[:tamano_lote]
+        )
+        if not filas:
+            return 0
+
+        ids = [fila['id'] for fila in filas]
+        MovimientoInventarioArchivado.objects.bulk_create(
+            [MovimientoInventarioArchivado(**fila) for fila in filas], ignore_conflicts=True
+        )
+
+        # Acumular en el resumen mensual (sumando a lo que ya hubiera del mismo mes)
+        totales = {}
+        for fila in MovimientoInventario.objects.filter(id__in=ids).order_by().annotate(
+            mes=TruncMonth('fecha_movimiento', output_field=DateField())
+        ).values('mes', 'producto_id', 'tipo_movimiento').annotate(cantidad=Sum('cantidad'), movimientos=Count('id')):
+            totales[(fila['mes'], fila['producto_id'], fila['tipo_movimiento'])] = fila
+        existentes = {
+            (r.mes, r.producto_id, r.tipo_movimiento): r
+            for r in ResumenMensualMovimiento.objects.filter(
+                mes__in={clave[0] for clave in totales},
+                producto_id__in={clave[1] for clave in totales},
+            ).select_for_update()
+        }
+        nuevos = []
+        actualizados = []
+        for clave, fila in totales.items():
+            resumen = existentes.get(clave)
+            if resumen is None:
+                nuevos.append(ResumenMensualMovimiento(
+                    mes=clave[0], producto_id=clave[1], tipo_movimiento=clave[2],
+                    cantidad=fila['cantidad'], movimientos=fila['movimientos'],
+                ))
+            else:
+                resumen.cantidad += fila['cantidad']
+                resumen.movimientos += fila['movimientos']
+                actualizados.append(resumen)
+        ResumenMensualMovimiento.objects.bulk_create(nuevos)
+        ResumenMensualMovimiento.objects.bulk_update(actualizados, ['cantidad', 'movimientos'])
+
+        # Los contadores del dashboard se ajustan una vez por lote con
+        # `movimientos_eliminados`, no con un post_delete por movimiento
+        with eliminacion_en_bloque():
+            MovimientoInventario.objects.filter(id__in=ids).delete()
+        movimientos_eliminados.send(sender=MovimientoInventario, movimientos=filas)
+    return len(filas)
+
+
+def archivar_movimientos(meses_retencion, tamano_lote=2000):
+    """Archiva todos los movimientos anteriores a la ventana de retención.
+
+    Antes de mover nada se guarda el snapshot de stock del día previo al
+    corte, para que `inventario.historial` no tenga que recorrer el archivo.
+    Devuelve `(fecha de corte, movimientos archivados)`.
+    """
+    if meses_retencion < MESES_RETENCION_MINIMO:
+        raise ValueError(f'Se deben conservar al menos {MESES_RETENCION_MINIMO} meses de movimientos.')
+    corte = fecha_corte(meses_retencion)
+    generar_snapshots(corte - timedelta(days=1))
+    total = 0
+    while True:
+        archivados = archivar_lote(corte, tamano_lote)
+        if not archivados:
+            return corte, total
+        total += archivados
+
+
+def _tramos(fecha_inicio, fecha_fin):
+    """Divide [fecha_inicio, fecha_fin] en meses completos y tramos sueltos."""
+    primer_mes = fecha_inicio if fecha_inicio.day == 1 else _sumar_meses(fecha_inicio, 1)
+    fin_meses = _sumar_meses(fecha_fin, 1) if (fecha_fin + timedelta(days=1)).day == 1 else fecha_fin.replace(day=1)
+    if primer_mes >= fin_meses:
+        return [], [(fecha_inicio, fecha_fin)]
+    meses = []
+    mes = primer_mes
+    while mes < fin_meses:
+        meses.append(mes)
+        mes = _sumar_meses(mes, 1)
+    sueltos = []
+    if fecha_inicio < primer_mes:
+        sueltos.append((fecha_inicio, primer_mes - timedelta(days=1)))
+    if fin_meses <= fecha_fin:
+        sueltos.append((fin_meses, fecha_fin))
+    return meses, sueltos
+
+
+def cantidades_por_producto(tipo_movimiento, fecha_inicio, fecha_fin, productos=None):
+    """Unidades por producto de un tipo de movimiento entre dos fechas (inclusive).
+
+    Combina movimientos vigentes, archivados y resúmenes mensuales. Con
+    `productos` (ids) sólo se leen esos productos. Devuelve un diccionario
+    `producto_id -> cantidad`.
+    """
+    desde, hasta = rango_fechas(fecha_inicio, fecha_fin)
+    totales = {}
+    filtro = {'tipo_movimiento': tipo_movimiento}
+    if productos is not None:
+        filtro['producto_id__in'] = list(productos)
+
+    def acumular(filas):
+        for producto_id, cantidad in filas:
+            totales[producto_id] = totales.get(producto_id, 0) + (cantidad or 0)
+
+    def por_producto(queryset):
+        return queryset.order_by().values('producto_id').annotate(total=Sum('cantidad')).values_list(
+            'producto_id', 'total'
+        )
+
+    acumular(por_producto(MovimientoInventario.objects.filter(
+        fecha_movimiento__gte=desde, fecha_movimiento__lt=hasta, **filtro,
+    )))
+
+    meses, sueltos = _tramos(fecha_inicio, fecha_fin)
+    if meses:
+        acumular(por_producto(ResumenMensualMovimiento.objects.filter(
+            mes__gte=meses[0], mes__lte=meses[-1], **filtro,
+        )))
+    for inicio, fin in sueltos:
+        desde_tramo, hasta_tramo = rango_fechas(inicio, fin)
+        acumular(por_producto(MovimientoInventarioArchivado.objects.filter(
+            fecha_movimiento__gte=desde_tramo, fecha_movimiento__lt=hasta_tramo, **filtro,
+        )))
+    return totales
@@ -0,0 +1,128 @@
+"""Índice de búsqueda de productos.
+
+Por cada producto se guardan en `TerminoBusquedaProducto` las palabras
+normalizadas (minúsculas y sin tildes) de su nombre y categoría, y los
+trigramas de las palabras del nombre. Las búsquedas por prefijo son rangos
+sobre el índice (`termino >= 'cha' AND termino < 'cha\\uffff'`) y las
+aproximadas cuentan los trigramas en común, así que ninguna recorre la
+tabla de productos. El índice se actualiza al guardar cada producto.
+"""
+import re
+import unicodedata
+
+from django.db import transaction
+from django.db.models import Count, Q
+from django.db.models.signals import post_save
+
+from .models import Producto, TerminoBusquedaProducto
+
+LIMITE_RESULTADOS = 50
+# Fracción mínima de trigramas de la búsqueda que debe tener un producto para considerarlo
+SIMILITUD_MINIMA = 0.4
+# Peso de una palabra completa / prefijo frente a la similitud por trigramas
+PESO_PALABRA = 2.0
+PESO_PREFIJO = 1.5
+
+
+def normalizar(texto):
+    """Minúsculas, sin tildes y sin signos: 'Champú Suave' -> 'champu suave'."""
+    texto = unicodedata.normalize('NFKD', texto or '')
+    texto = ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+    return re.sub(r'[^a-z0-9]+', ' ', texto).strip()
+
+
+def palabras(texto):
+    return [p[:50] for p in dict.fromkeys(normalizar(texto).split())]
+
+
+def trigramas(lista_palabras):
+    """Trigramas de cada palabra, con relleno al inicio y al final (como pg_trgm)."""
+    resultado = []
+    for palabra in lista_palabras:
+        relleno = f'  {palabra} '
+        resultado.extend(relleno[i:i + 3] for i in range(len(relleno) - 2))
+    return list(dict.fromkeys(resultado))
+
+
+def terminos_producto(nombre, categoria):
+    """Filas (campo, tipo, termino) del índice para un producto."""
+    palabras_nombre = palabras(nombre)
+    etiqueta = dict(Producto.CATEGORIA_CHOICES).get(categoria, '')
+    terminos = [('nombre', 'palabra', p) for p in palabras_nombre]
+    terminos += [('nombre', 'trigrama', t) for t in trigramas(palabras_nombre)]
+    terminos += [('categoria', 'palabra', p) for p in palabras(f'{categoria} {etiqueta}')]
+    return terminos
+
+
+def indexar_productos(productos):
+    """Reemplaza las entradas del índice de los productos indicados."""
+    productos = list(productos)
+    with transaction.atomic():
+        TerminoBusquedaProducto.objects.filter(producto__in=productos).delete()
+        TerminoBusquedaProducto.objects.bulk_create([
+            TerminoBusquedaProducto(producto=producto, campo=campo, tipo=tipo, termino=termino)
+            for producto in productos
+            for campo, tipo, termino in terminos_producto(producto.nombre, producto.categoria)
+        ], batch_size=1000)
+
+
+def _puntajes(texto, campo):
+    busqueda = palabras(texto)
+    if not busqueda:
+        return {}
+    terminos = TerminoBusquedaProducto.objects.filter(campo=campo)
+    puntajes = {}
+
+    # Palabras completas o prefijos: un rango del índice por palabra buscada
+    rangos = Q()
+    for palabra in busqueda:
+        rangos |= Q(termino__gte=palabra, termino__lt=palabra + '\uffff')
+    mejores = {}
+    for producto_id, termino in terminos.filter(rangos, tipo='palabra').values_list('producto_id', 'termino'):
+        for palabra in busqueda:
+            if termino.startswith(palabra):
+                peso = PESO_PALABRA if termino == palabra else PESO_PREFIJO
+                clave = (producto_id, palabra)
+                mejores[clave] = max(mejores.get(clave, 0), peso)
+    for (producto_id, _), peso in mejores.items():
+        puntajes[producto_id] = puntajes.get(producto_id, 0) + peso / len(busqueda)
+
+    # Coincidencia aproximada: trigramas en común con la búsqueda
+    if campo == 'nombre':
+        buscados = trigramas(busqueda)
+        en_comun = terminos.filter(tipo='trigrama', termino__in=buscados).values('producto_id').annotate(
+            total=Count('id')
+        ).values_list('producto_id', 'total')
+        for producto_id, total in en_comun:
+            similitud = total / len(buscados)
+            if similitud >= SIMILITUD_MINIMA or producto_id in puntajes:
+                puntajes[producto_id] = puntajes.get(producto_id, 0) + similitud
+    return puntajes
+
+
+def buscar_productos(texto, campo='nombre', limite=LIMITE_RESULTADOS, productos=None):
+    """Productos que coinciden con `texto`, del más al menos relevante.
+
+    `campo` es 'nombre' (prefijos y aproximada) o 'categoria' (prefijos).
+    `productos` permite restringir el resultado (por ejemplo, sólo activos).
+    """
+    puntajes = _puntajes(texto, campo)
+    if not puntajes:
+        return []
+    if productos is None:
+        productos = Producto.objects.all()
+    # Se piden algunos candidatos de más por si el filtro de `productos` descarta parte
+    candidatos = sorted(puntajes, key=lambda pk: (-puntajes[pk], pk))[:limite * 2]
+    encontrados = productos.in_bulk(candidatos)
+    resultado = [encontrados[pk] for pk in candidatos if pk in encontrados][:limite]
+    for producto in resultado:
+        producto.relevancia = round(puntajes[producto.pk], 2)
+    return resultado
+
+
+def _indexar_producto(sender, instance, raw=False, **kwargs):
+    if not raw:
+        indexar_productos([instance])
+
+
+post_save.connect(_indexar_producto, sender=Producto, dispatch_uid='busqueda_producto_guardado')
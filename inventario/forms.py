@@ -1,6 +1,9 @@
 from django import forms
 from django.core.exceptions import ValidationError
+from django.db.models import Q
 from .models import Producto, MovimientoInventario
+import csv
+import io
 
 class ProductoForm(forms.ModelForm):
     
@@ -119,4 +122,127 @@ class BuscarProductoForm(forms.Form):
             'placeholder': 'Ingrese término de búsqueda...',
             'class': 'form-control'
         })
-    )
\ No newline at end of file
+    )
+
+class LineaIngresoStockForm(forms.Form):
+    """Una línea del ingreso masivo de stock (producto y cantidad)."""
+    producto = forms.TypedChoiceField(
+        coerce=int,
+        required=False,
+        empty_value=None,
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    cantidad = forms.IntegerField(
+        min_value=1,
+        required=False,
+        widget=forms.NumberInput(attrs={
+            'class': 'form-control',
+            'placeholder': 'Cantidad',
+            'min': '1'
+        })
+    )
+
+    def __init__(self, *args, productos=(), **kwargs):
+        # `productos`: opciones (id, nombre) calculadas una sola vez para todo el formset
+        super().__init__(*args, **kwargs)
+        self.fields['producto'].choices = [('', '---------')] + list(productos)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        producto = cleaned_data.get('producto')
+        cantidad = cleaned_data.get('cantidad')
+        if bool(producto) != bool(cantidad) and not self.errors:
+            raise ValidationError('Indique el producto y la cantidad de la línea.')
+        return cleaned_data
+
+
+class BaseIngresoStockFormSet(forms.BaseFormSet):
+
+    def lineas(self):
+        """Lista de (producto_id, cantidad) de las líneas completadas."""
+        return [
+            (form.cleaned_data['producto'], form.cleaned_data['cantidad'])
+            for form in self.forms
+            if form.cleaned_data.get('producto')
+        ]
+
+
+IngresoStockFormSet = forms.formset_factory(
+    LineaIngresoStockForm, formset=BaseIngresoStockFormSet, extra=10
+)
+
+
+class IngresoMasivoStockForm(forms.Form):
+    motivo = forms.CharField(
+        max_length=200,
+        widget=forms.TextInput(attrs={
+            'class': 'form-control',
+            'placeholder': 'Ej: Factura 1234 - Proveedor'
+        })
+    )
+    archivo_csv = forms.FileField(
+        required=False,
+        label='Archivo CSV',
+        help_text='Columnas "producto" (id o nombre exacto) y "cantidad", separadas por coma o punto y coma.',
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv'})
+    )
+
+    def clean_archivo_csv(self):
+        """Valida todas las líneas del CSV y devuelve una lista de (producto_id, cantidad)."""
+        archivo = self.cleaned_data.get('archivo_csv')
+        if not archivo:
+            return []
+
+        try:
+            contenido = archivo.read().decode('utf-8-sig')
+        except UnicodeDecodeError:
+            raise ValidationError('El archivo debe estar codificado en UTF-8.')
+        try:
+            dialecto = csv.Sniffer().sniff(contenido.splitlines()[0] if contenido else '', delimiters=',;')
+        except csv.Error:
+            dialecto = csv.excel
+        lector = csv.DictReader(io.StringIO(contenido), dialect=dialecto)
+        columnas = {(c or '').strip().lower() for c in (lector.fieldnames or [])}
+        if not {'producto', 'cantidad'} <= columnas:
+            raise ValidationError('El archivo debe tener las columnas "producto" y "cantidad".')
+
+        filas = []
+        errores = []
+        for numero, fila in enumerate(lector, start=2):
+            fila = {(k or '').strip().lower(): (v or '').strip() for k, v in fila.items()}
+            if not fila.get('producto') and not fila.get('cantidad'):
+                continue
+            try:
+                cantidad = int(fila.get('cantidad', ''))
+            except ValueError:
+                cantidad = 0
+            if cantidad < 1:
+                errores.append((numero, 'la cantidad debe ser un entero mayor a 0.'))
+                continue
+            filas.append((numero, fila['producto'], cantidad))
+
+        # Resolver todos los productos referenciados con una sola consulta
+        ids = {int(ref) for _, ref, _ in filas if ref.isdigit()}
+        nombres = {ref for _, ref, _ in filas if not ref.isdigit()}
+        por_id = {}
+        por_nombre = {}
+        for pk, nombre in Producto.objects.filter(
+            Q(pk__in=ids) | Q(nombre__in=nombres), estado='activo'
+        ).values_list('id', 'nombre'):
+            por_id[pk] = pk
+            por_nombre[nombre.lower()] = pk
+
+        lineas = []
+        for numero, referencia, cantidad in filas:
+            if referencia.isdigit():
+                producto_id = por_id.get(int(referencia))
+            else:
+                producto_id = por_nombre.get(referencia.lower())
+            if producto_id is None:
+                errores.append((numero, f'no existe un producto activo "{referencia}".'))
+                continue
+            lineas.append((producto_id, cantidad))
+
+        if errores:
+            raise ValidationError([f'Línea {numero}: {error}' for numero, error in sorted(errores)])
+        return lineas
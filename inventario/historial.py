@@ -0,0 +1,126 @@
+"""Stock de los productos en fechas pasadas.
+
+El stock al cierre de un día se obtiene partiendo del snapshot más cercano
+anterior (`SnapshotStock`) y sumando sólo los movimientos posteriores a él.
+Si el producto no tiene snapshots previos se parte del stock actual y se
+descuentan los movimientos posteriores a la fecha. En ambos casos la suma
+recorre un rango del índice `(producto, fecha_movimiento)` en lugar de toda
+la tabla de movimientos. Los movimientos archivados (ver `inventario.archivo`)
+se suman igual desde su propia tabla.
+"""
+from datetime import date, timedelta
+
+from django.db.models import OuterRef, Subquery, Sum
+from django.utils import timezone
+
+from core.fechas import inicio_del_dia
+
+from .models import Producto, MovimientoInventario, MovimientoInventarioArchivado, SnapshotStock
+from .stock import expresion_delta_movimiento
+
+
+def fin_del_dia(fecha):
+    """Primer instante (con zona horaria) posterior al día `fecha`."""
+    return inicio_del_dia(fecha + timedelta(days=1))
+
+
+def _sumar_movimientos(productos_ids, desde, hasta=None):
+    """Variación de stock por producto entre `desde` (incluido) y `hasta` (excluido)."""
+    deltas = {}
+    for modelo in (MovimientoInventario, MovimientoInventarioArchivado):
+        movimientos = modelo.objects.filter(fecha_movimiento__gte=desde)
+        if productos_ids is not None:
+            movimientos = movimientos.filter(producto_id__in=productos_ids)
+        if hasta is not None:
+            movimientos = movimientos.filter(fecha_movimiento__lt=hasta)
+        filas = movimientos.order_by().values('producto_id').annotate(delta=Sum(expresion_delta_movimiento()))
+        for fila in filas:
+            deltas[fila['producto_id']] = deltas.get(fila['producto_id'], 0) + (fila['delta'] or 0)
+    return deltas
+
+
+def stock_actual_en_fecha(fecha, productos=None):
+    """Stock al cierre de `fecha` calculado hacia atrás desde el stock actual.
+
+    No usa snapshots: es la fuente con la que se generan. Devuelve un
+    diccionario `producto_id -> stock` con los productos que ya existían.
+    """
+    fin = fin_del_dia(fecha)
+    consulta = Producto.objects.filter(fecha_creacion__lt=fin)
+    ids = None
+    if productos is not None:
+        ids = [getattr(p, 'pk', p) for p in productos]
+        consulta = consulta.filter(pk__in=ids)
+    posteriores = _sumar_movimientos(ids, fin)
+    return {
+        pk: stock - posteriores.get(pk, 0)
+        for pk, stock in consulta.values_list('id', 'stock_actual')
+    }
+
+
+def stock_en_fecha_productos(fecha, productos=None):
+    """Stock al cierre de `fecha` de varios productos (todos si `productos` es None).
+
+    `productos` puede contener instancias o ids. Devuelve un diccionario
+    `producto_id -> stock`; los productos creados después de la fecha no se
+    incluyen.
+    """
+    if fecha >= timezone.localdate():
+        return stock_actual_en_fecha(fecha, productos)
+
+    fin = fin_del_dia(fecha)
+    consulta = Producto.objects.filter(fecha_creacion__lt=fin)
+    if productos is not None:
+        consulta = consulta.filter(pk__in=[getattr(p, 'pk', p) for p in productos])
+    snapshot = SnapshotStock.objects.filter(producto=OuterRef('pk'), fecha__lte=fecha).order_by('-fecha')
+    filas = consulta.annotate(
+        fecha_snapshot=Subquery(snapshot.values('fecha')[:1]),
+        stock_snapshot=Subquery(snapshot.values('stock')[:1]),
+    ).values_list('id', 'fecha_snapshot', 'stock_snapshot')
+
+    resultado = {}
+    sin_snapshot = []
+    por_fecha_snapshot = {}
+    for pk, fecha_snapshot, stock_snapshot in filas:
+        if fecha_snapshot is None:
+            sin_snapshot.append(pk)
+        else:
+            resultado[pk] = stock_snapshot
+            por_fecha_snapshot.setdefault(fecha_snapshot, []).append(pk)
+
+    # Normalmente todos los snapshots son del mismo día: una consulta por fecha distinta
+    for fecha_snapshot, ids in por_fecha_snapshot.items():
+        if fecha_snapshot == fecha:
+            continue
+        for pk, delta in _sumar_movimientos(ids, fin_del_dia(fecha_snapshot), fin).items():
+            resultado[pk] += delta
+
+    if sin_snapshot:
+        resultado.update(stock_actual_en_fecha(fecha, sin_snapshot))
+    return resultado
+
+
+def stock_en_fecha(producto, fecha):
+    """Stock de un producto al cierre de `fecha` (0 si aún no existía)."""
+    pk = getattr(producto, 'pk', producto)
+    return stock_en_fecha_productos(fecha, [pk]).get(pk, 0)
+
+
+def ultimo_dia_mes_anterior(hoy=None):
+    hoy = hoy or timezone.localdate()
+    return hoy.replace(day=1) - timedelta(days=1)
+
+
+def generar_snapshots(fecha):
+    """Guarda (o reemplaza) el snapshot de todos los productos al cierre de `fecha`."""
+    if not isinstance(fecha, date) or fecha >= timezone.localdate():
+        raise ValueError('Solo se generan snapshots de días ya cerrados.')
+    stocks = stock_actual_en_fecha(fecha)
+    SnapshotStock.objects.bulk_create(
+        [SnapshotStock(producto_id=pk, fecha=fecha, stock=stock) for pk, stock in stocks.items()],
+        update_conflicts=True,
+        unique_fields=['producto', 'fecha'],
+        update_fields=['stock', 'fecha_creacion'],
+        batch_size=500,
+    )
+    return len(stocks)
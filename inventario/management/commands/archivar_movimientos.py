@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inventario.archivo import archivar_movimientos
+
+
+class Command(BaseCommand):
+    help = ('Traslada los movimientos de inventario anteriores a la ventana de retención a la tabla '
+            'de archivo y los acumula en el resumen mensual por producto.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--meses',
+            type=int,
+            default=12,
+            help='Meses completos de movimientos que se conservan, además del mes en curso (por defecto 12).',
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=2000,
+            help='Movimientos archivados por transacción (por defecto 2000).',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            corte, total = archivar_movimientos(options['meses'], options['lote'])
+        except ValueError as error:
+            raise CommandError(str(error))
+        self.stdout.write(self.style.SUCCESS(
+            f'Se archivaron {total} movimientos anteriores al {corte:%d/%m/%Y}.'
+        ))
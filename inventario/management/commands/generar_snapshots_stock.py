@@ -0,0 +1,31 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventario.historial import generar_snapshots, ultimo_dia_mes_anterior
+
+
+class Command(BaseCommand):
+    help = ('Guarda el stock de todos los productos al cierre de un día. '
+            'Programarlo una vez al mes (o con la frecuencia deseada) con --fecha.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fecha',
+            help='Día a registrar en formato AAAA-MM-DD (por defecto, el último día del mes anterior).',
+        )
+
+    def handle(self, *args, **options):
+        if options['fecha']:
+            try:
+                fecha = date.fromisoformat(options['fecha'])
+            except ValueError:
+                raise CommandError('La fecha debe tener el formato AAAA-MM-DD.')
+        else:
+            fecha = ultimo_dia_mes_anterior()
+
+        try:
+            total = generar_snapshots(fecha)
+        except ValueError as error:
+            raise CommandError(str(error))
+        self.stdout.write(self.style.SUCCESS(f'Se guardó el stock de {total} productos al {fecha:%d/%m/%Y}.'))
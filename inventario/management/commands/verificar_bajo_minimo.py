@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F, Q
+
+from inventario.models import Producto
+
+
+class Command(BaseCommand):
+    help = 'Verifica que la columna bajo_minimo de los productos coincida con stock_actual <= stock_minimo.'
+
+    def handle(self, *args, **options):
+        inconsistentes = Producto.objects.filter(
+            Q(bajo_minimo=True, stock_actual__gt=F('stock_minimo')) |
+            Q(bajo_minimo=False, stock_actual__lte=F('stock_minimo'))
+        ).values_list('id', 'nombre', 'stock_actual', 'stock_minimo', 'bajo_minimo')
+
+        total = 0
+        for pk, nombre, stock_actual, stock_minimo, bajo_minimo in inconsistentes:
+            total += 1
+            self.stdout.write(self.style.WARNING(
+                f'{nombre} (id {pk}): bajo_minimo={bajo_minimo} con stock {stock_actual} y mínimo {stock_minimo}'
+            ))
+        if total:
+            raise CommandError(f'{total} productos tienen la marca bajo_minimo desactualizada.')
+        self.stdout.write(self.style.SUCCESS('La marca bajo_minimo coincide con el stock de todos los productos.'))
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SnapshotStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('stock', models.IntegerField()),
+                ('fecha_creacion', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Snapshot de Stock',
+                'verbose_name_plural': 'Snapshots de Stock',
+                'ordering': ['-fecha'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='movimientoinventario',
+            index=models.Index(fields=['producto', 'fecha_movimiento'], name='inv_mov_producto_fecha_idx'),
+        ),
+        migrations.AddField(
+            model_name='snapshotstock',
+            name='producto',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='inventario.producto'),
+        ),
+        migrations.AddConstraint(
+            model_name='snapshotstock',
+            constraint=models.UniqueConstraint(fields=('producto', 'fecha'), name='inv_snapshot_producto_fecha_uniq'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0002_snapshotstock_movimiento_indice'),
+        ('proveedores', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='bajo_minimo',
+            field=models.GeneratedField(db_persist=True, expression=models.ExpressionWrapper(models.Q(('stock_actual__lte', models.F('stock_minimo'))), output_field=models.BooleanField()), output_field=models.BooleanField()),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['bajo_minimo', 'estado'], name='inv_prod_bajo_minimo_idx'),
+        ),
+    ]
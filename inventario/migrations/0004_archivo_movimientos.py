@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:38
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0003_producto_bajo_minimo'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovimientoInventarioArchivado',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('tipo_movimiento', models.CharField(choices=[('entrada', 'Entrada'), ('salida', 'Salida'), ('ajuste', 'Ajuste')], max_length=10)),
+                ('cantidad', models.IntegerField()),
+                ('motivo', models.CharField(max_length=200)),
+                ('fecha_movimiento', models.DateTimeField()),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='inventario.producto')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Movimiento de Inventario Archivado',
+                'verbose_name_plural': 'Movimientos de Inventario Archivados',
+                'ordering': ['-fecha_movimiento'],
+                'indexes': [models.Index(fields=['producto', 'fecha_movimiento'], name='inv_arch_producto_fecha_idx'), models.Index(fields=['fecha_movimiento'], name='inv_arch_fecha_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenMensualMovimiento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField(help_text='Primer día del mes')),
+                ('tipo_movimiento', models.CharField(choices=[('entrada', 'Entrada'), ('salida', 'Salida'), ('ajuste', 'Ajuste')], max_length=10)),
+                ('cantidad', models.IntegerField(default=0)),
+                ('movimientos', models.IntegerField(default=0)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='inventario.producto')),
+            ],
+            options={
+                'verbose_name': 'Resumen Mensual de Movimientos',
+                'verbose_name_plural': 'Resúmenes Mensuales de Movimientos',
+                'ordering': ['-mes'],
+                'constraints': [models.UniqueConstraint(fields=('mes', 'producto', 'tipo_movimiento'), name='inv_resumen_mes_producto_tipo_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:39
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Copia de la normalización de `inventario.busqueda` al momento de crear el
+# índice, para que la migración no dependa de cambios posteriores del módulo.
+def _palabras(texto):
+    texto = unicodedata.normalize('NFKD', texto or '')
+    texto = ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+    return [p[:50] for p in dict.fromkeys(re.sub(r'[^a-z0-9]+', ' ', texto).strip().split())]
+
+
+def _trigramas(lista_palabras):
+    resultado = []
+    for palabra in lista_palabras:
+        relleno = f'  {palabra} '
+        resultado.extend(relleno[i:i + 3] for i in range(len(relleno) - 2))
+    return list(dict.fromkeys(resultado))
+
+
+def _terminos(nombre, categoria, etiquetas):
+    palabras_nombre = _palabras(nombre)
+    terminos = [('nombre', 'palabra', p) for p in palabras_nombre]
+    terminos += [('nombre', 'trigrama', t) for t in _trigramas(palabras_nombre)]
+    terminos += [('categoria', 'palabra', p) for p in _palabras(f'{categoria} {etiquetas.get(categoria, "")}')]
+    return terminos
+
+
+def indexar_productos(apps, schema_editor):
+    Producto = apps.get_model('inventario', 'Producto')
+    TerminoBusquedaProducto = apps.get_model('inventario', 'TerminoBusquedaProducto')
+    etiquetas = dict(Producto._meta.get_field('categoria').choices or ())
+    TerminoBusquedaProducto.objects.bulk_create([
+        TerminoBusquedaProducto(producto_id=producto_id, campo=campo, tipo=tipo, termino=termino)
+        for producto_id, nombre, categoria in Producto.objects.values_list('id', 'nombre', 'categoria').iterator()
+        for campo, tipo, termino in _terminos(nombre, categoria, etiquetas)
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0004_archivo_movimientos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TerminoBusquedaProducto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('campo', models.CharField(choices=[('nombre', 'Nombre'), ('categoria', 'Categoría')], max_length=10)),
+                ('tipo', models.CharField(choices=[('palabra', 'Palabra'), ('trigrama', 'Trigrama')], max_length=10)),
+                ('termino', models.CharField(max_length=50)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='terminos_busqueda', to='inventario.producto')),
+            ],
+            options={
+                'verbose_name': 'Término de Búsqueda de Producto',
+                'verbose_name_plural': 'Términos de Búsqueda de Productos',
+                'indexes': [models.Index(fields=['campo', 'tipo', 'termino'], name='inv_busqueda_termino_idx')],
+            },
+        ),
+        migrations.RunPython(indexar_productos, migrations.RunPython.noop),
+    ]
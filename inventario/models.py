@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import ExpressionWrapper, F, Q
 from django.core.validators import MinValueValidator
 from django.utils import timezone
 
@@ -29,11 +30,21 @@ class Producto(models.Model):
     estado = models.CharField(max_length=10, choices=ESTADO_CHOICES, default='activo')
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     fecha_actualizacion = models.DateTimeField(auto_now=True)
+    # Columna calculada por la base de datos: siempre coincide con stock_actual <= stock_minimo,
+    # incluso tras un UPDATE directo, y a diferencia de la comparación entre columnas se puede indexar
+    bajo_minimo = models.GeneratedField(
+        expression=ExpressionWrapper(Q(stock_actual__lte=F('stock_minimo')), output_field=models.BooleanField()),
+        output_field=models.BooleanField(),
+        db_persist=True,
+    )
     
     class Meta:
         verbose_name = "Producto"
         verbose_name_plural = "Productos"
         ordering = ['nombre']
+        indexes = [
+            models.Index(fields=['bajo_minimo', 'estado'], name='inv_prod_bajo_minimo_idx'),
+        ]
     
     def __str__(self):
         return f"{self.nombre} (Stock: {self.stock_actual})"
@@ -75,14 +86,121 @@ class MovimientoInventario(models.Model):
         verbose_name = "Movimiento de Inventario"
         verbose_name_plural = "Movimientos de Inventario"
         ordering = ['-fecha_movimiento']
+        indexes = [
+            # Suma de movimientos de un producto en un rango de fechas (ver `inventario.historial`)
+            models.Index(fields=['producto', 'fecha_movimiento'], name='inv_mov_producto_fecha_idx'),
+        ]
     
     def __str__(self):
         return f"{self.tipo_movimiento} - {self.producto.nombre} - {self.cantidad}"
     
     def save(self, *args, **kwargs):
-        if self.tipo_movimiento == 'entrada':
-            self.producto.stock_actual += self.cantidad
-        elif self.tipo_movimiento == 'salida':
-            self.producto.stock_actual -= self.cantidad
-        self.producto.save()
-        super().save(*args, **kwargs)
\ No newline at end of file
+        from .stock import ajustar_stock, delta_movimiento
+
+        with transaction.atomic():
+            # El stock se mueve sólo al registrar el movimiento, no al volver a guardarlo
+            if self._state.adding:
+                nuevo_stock = ajustar_stock({
+                    self.producto_id: delta_movimiento(self.tipo_movimiento, self.cantidad)
+                })
+                if self.producto_id in nuevo_stock and MovimientoInventario.producto.is_cached(self):
+                    self.producto.stock_actual = nuevo_stock[self.producto_id]
+            super().save(*args, **kwargs)
+
+class SnapshotStock(models.Model):
+    """Stock de un producto al cierre de un día (hora local).
+
+    Se generan periódicamente con `python manage.py generar_snapshots_stock`
+    y permiten conocer el stock en una fecha pasada sin recorrer todos los
+    movimientos (ver `inventario.historial`).
+    """
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='snapshots')
+    fecha = models.DateField()
+    stock = models.IntegerField()
+    fecha_creacion = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Snapshot de Stock"
+        verbose_name_plural = "Snapshots de Stock"
+        ordering = ['-fecha']
+        constraints = [
+            models.UniqueConstraint(fields=['producto', 'fecha'], name='inv_snapshot_producto_fecha_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.producto.nombre} - {self.fecha}: {self.stock}"
+
+
+class MovimientoInventarioArchivado(models.Model):
+    """Movimiento antiguo trasladado fuera de la tabla de movimientos vigentes.
+
+    Conserva el id y los datos originales; lo llena el comando
+    `archivar_movimientos`.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='+')
+    tipo_movimiento = models.CharField(max_length=10, choices=MovimientoInventario.TIPO_MOVIMIENTO_CHOICES)
+    cantidad = models.IntegerField()
+    motivo = models.CharField(max_length=200)
+    usuario = models.ForeignKey('auth.User', on_delete=models.CASCADE, related_name='+')
+    fecha_movimiento = models.DateTimeField()
+
+    class Meta:
+        verbose_name = "Movimiento de Inventario Archivado"
+        verbose_name_plural = "Movimientos de Inventario Archivados"
+        ordering = ['-fecha_movimiento']
+        indexes = [
+            models.Index(fields=['producto', 'fecha_movimiento'], name='inv_arch_producto_fecha_idx'),
+            models.Index(fields=['fecha_movimiento'], name='inv_arch_fecha_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.tipo_movimiento} - {self.producto_id} - {self.cantidad} (archivado)"
+
+
+class ResumenMensualMovimiento(models.Model):
+    """Total mensual por producto y tipo de los movimientos archivados."""
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='+')
+    mes = models.DateField(help_text='Primer día del mes')
+    tipo_movimiento = models.CharField(max_length=10, choices=MovimientoInventario.TIPO_MOVIMIENTO_CHOICES)
+    cantidad = models.IntegerField(default=0)
+    movimientos = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Resumen Mensual de Movimientos"
+        verbose_name_plural = "Resúmenes Mensuales de Movimientos"
+        ordering = ['-mes']
+        constraints = [
+            models.UniqueConstraint(fields=['mes', 'producto', 'tipo_movimiento'], name='inv_resumen_mes_producto_tipo_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.producto_id} - {self.mes:%m/%Y} - {self.tipo_movimiento}: {self.cantidad}"
+
+
+class TerminoBusquedaProducto(models.Model):
+    """Entrada del índice de búsqueda de productos (ver `inventario.busqueda`)."""
+    CAMPO_CHOICES = [
+        ('nombre', 'Nombre'),
+        ('categoria', 'Categoría'),
+    ]
+
+    TIPO_CHOICES = [
+        ('palabra', 'Palabra'),
+        ('trigrama', 'Trigrama'),
+    ]
+
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='terminos_busqueda')
+    campo = models.CharField(max_length=10, choices=CAMPO_CHOICES)
+    tipo = models.CharField(max_length=10, choices=TIPO_CHOICES)
+    termino = models.CharField(max_length=50)
+
+    class Meta:
+        verbose_name = "Término de Búsqueda de Producto"
+        verbose_name_plural = "Términos de Búsqueda de Productos"
+        indexes = [
+            models.Index(fields=['campo', 'tipo', 'termino'], name='inv_busqueda_termino_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.producto_id} - {self.campo}/{self.tipo}: {self.termino}"
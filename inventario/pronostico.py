@@ -0,0 +1,137 @@
+"""Pronóstico de quiebre de stock a partir del historial de consumo.
+
+Las salidas de los últimos `DIAS_HISTORIAL` días completos se leen con una
+sola consulta agrupada por producto y día, y se arma una matriz
+productos × días. La tasa de consumo diaria de todos los productos se obtiene
+en una sola operación con NumPy: un promedio móvil exponencial (EWMA) que da
+más peso a los días recientes.
+
+Las tasas sólo cambian de un día al siguiente, así que se guardan en caché
+por fecha; los días hasta el quiebre y la cantidad a pedir se calculan al
+momento con el stock actual de cada producto.
+"""
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from core.fechas import rango_dia_local
+
+from .models import MovimientoInventario
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - dependencia opcional
+    np = None
+
+# Días completos de historial que se consideran (no incluye hoy)
+DIAS_HISTORIAL = 90
+# Factor de suavizado del EWMA: mayor valor = más peso a los últimos días
+ALFA = 0.1
+# Días que tarda en llegar un pedido al proveedor
+DIAS_REPOSICION = 7
+# Días de consumo que debe cubrir un pedido
+DIAS_COBERTURA = 30
+# Más allá de este horizonte no se informa fecha de quiebre (consumo casi nulo)
+HORIZONTE_QUIEBRE = 365
+
+
+@dataclass
+class Pronostico:
+    """Proyección de consumo de un producto."""
+    tasa_diaria: float
+    dias_hasta_quiebre: float = None
+    fecha_quiebre: object = None
+    cantidad_sugerida: int = 0
+
+    @property
+    def pedir_ahora(self):
+        """El stock no alcanza a cubrir el tiempo de reposición."""
+        return self.dias_hasta_quiebre is not None and self.dias_hasta_quiebre <= DIAS_REPOSICION
+
+
+def pronostico_disponible():
+    return np is not None
+
+
+def _clave_cache(hoy):
+    return f'inventario:pronostico:tasas:{hoy.isoformat()}'
+
+
+def calcular_tasas_consumo(hoy=None):
+    """Tasa de consumo diaria (unidades/día) de cada producto con salidas.
+
+    Devuelve un diccionario `producto_id -> tasa`.
+    """
+    hoy = hoy or timezone.localdate()
+    inicio = hoy - timedelta(days=DIAS_HISTORIAL)
+    desde, hasta = rango_dia_local(inicio, DIAS_HISTORIAL)
+    salidas = MovimientoInventario.objects.filter(
+        tipo_movimiento='salida',
+        fecha_movimiento__gte=desde,
+        fecha_movimiento__lt=hasta,
+    ).order_by().annotate(dia=TruncDate('fecha_movimiento')).values('producto_id', 'dia').annotate(
+        total=Sum('cantidad')
+    ).values_list('producto_id', 'dia', 'total')
+
+    filas = list(salidas)
+    if not filas:
+        return {}
+
+    productos_ids, dias, totales = zip(*filas)
+    ids = np.unique(np.array(productos_ids))
+    fila = np.searchsorted(ids, productos_ids)
+    columna = np.array([(dia - inicio).days for dia in dias])
+
+    consumo = np.zeros((len(ids), DIAS_HISTORIAL))
+    np.add.at(consumo, (fila, columna), np.array(totales, dtype=float))
+
+    # Pesos del EWMA (el último día pesa ALFA, el anterior ALFA*(1-ALFA), ...), normalizados
+    pesos = ALFA * (1 - ALFA) ** np.arange(DIAS_HISTORIAL - 1, -1, -1)
+    tasas = consumo @ (pesos / pesos.sum())
+    return dict(zip(ids.tolist(), tasas.tolist()))
+
+
+def tasas_consumo():
+    """Tasas de consumo del día, calculadas una sola vez por día y guardadas en caché."""
+    if np is None:
+        return {}
+    hoy = timezone.localdate()
+    return cache.get_or_set(_clave_cache(hoy), lambda: calcular_tasas_consumo(hoy), 60 * 60 * 24)
+
+
+def pronosticar(productos):
+    """Proyecta el quiebre de stock de cada producto de `productos`.
+
+    Devuelve un diccionario `producto_id -> Pronostico`; los productos sin
+    consumo en el período no se incluyen. Si el quiebre queda a más de
+    `HORIZONTE_QUIEBRE` días, sus días y fecha de quiebre quedan en None.
+    """
+    tasas = tasas_consumo()
+    productos = [p for p in productos if tasas.get(p.pk)]
+    if not productos:
+        return {}
+
+    tasa = np.array([tasas[p.pk] for p in productos])
+    stock = np.array([p.stock_actual for p in productos], dtype=float)
+    minimo = np.array([p.stock_minimo for p in productos], dtype=float)
+
+    dias = stock / tasa
+    # Pedido: consumo durante la reposición y la cobertura, más el mínimo, menos lo disponible
+    sugerido = np.ceil(np.clip(tasa * (DIAS_REPOSICION + DIAS_COBERTURA) + minimo - stock, 0, None))
+
+    hoy = timezone.localdate()
+    pronosticos = {}
+    for producto, tasa_producto, dias_producto, sugerido_producto in zip(
+        productos, tasa.tolist(), dias.tolist(), sugerido.tolist()
+    ):
+        pronostico = Pronostico(tasa_diaria=round(tasa_producto, 2), cantidad_sugerida=int(sugerido_producto))
+        # Con una tasa mínima los días pueden superar el rango de `date`
+        if dias_producto <= HORIZONTE_QUIEBRE:
+            pronostico.dias_hasta_quiebre = round(dias_producto, 1)
+            pronostico.fecha_quiebre = hoy + timedelta(days=int(dias_producto))
+        pronosticos[producto.pk] = pronostico
+    return pronosticos
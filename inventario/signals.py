@@ -0,0 +1,39 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.dispatch import Signal
+
+_en_bloque = ContextVar('inventario_eliminacion_en_bloque', default=False)
+
+# Se envía después de modificar `stock_actual` con una sentencia UPDATE
+# (que no dispara post_save). Argumento `cambios`: lista de diccionarios con
+# los datos del producto ('id', 'nombre', 'categoria', 'estado', 'precio_costo',
+# 'stock_minimo'), 'stock_anterior' y el nuevo 'stock_actual'.
+stock_actualizado = Signal()
+
+# Se envía después de guardar movimientos con `bulk_create` (que no dispara
+# post_save). Argumento `movimientos`: lista de `MovimientoInventario` creados.
+movimientos_registrados = Signal()
+
+# Se envía después de eliminar un lote de movimientos (al archivarlos, ver
+# `inventario.archivo`). Argumento `movimientos`: lista de diccionarios con
+# 'tipo_movimiento' y 'fecha_movimiento' de cada movimiento eliminado.
+movimientos_eliminados = Signal()
+
+
+@contextmanager
+def eliminacion_en_bloque():
+    """Marca las eliminaciones cuyo efecto se informa con `movimientos_eliminados`.
+
+    Dentro del bloque los receptores de post_delete pueden omitir sus ajustes
+    por movimiento (ver `en_eliminacion_en_bloque`) y aplicarlos una vez por lote.
+    """
+    token = _en_bloque.set(True)
+    try:
+        yield
+    finally:
+        _en_bloque.reset(token)
+
+
+def en_eliminacion_en_bloque():
+    return _en_bloque.get()
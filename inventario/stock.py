@@ -0,0 +1,110 @@
+"""Mutaciones de stock atómicas.
+
+El stock nunca se calcula en Python y se vuelve a guardar: cada cambio se
+aplica con una sola sentencia `UPDATE ... SET stock_actual = stock_actual ± n`,
+de modo que dos movimientos simultáneos sobre el mismo producto no se pisan.
+Cuando el cambio descuenta stock, las filas se bloquean antes con
+`select_for_update` para validar que alcance.
+"""
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+from .models import Producto, MovimientoInventario
+from .signals import stock_actualizado, movimientos_registrados
+
+CAMPOS_CAMBIO = ('id', 'nombre', 'categoria', 'estado', 'precio_costo', 'stock_minimo', 'stock_actual')
+
+
+class StockInsuficienteError(ValidationError):
+    """No hay stock suficiente para descontar la cantidad pedida."""
+
+
+def delta_movimiento(tipo_movimiento, cantidad):
+    """Unidades que un movimiento suma (o resta) al stock del producto."""
+    if tipo_movimiento == 'entrada':
+        return cantidad
+    if tipo_movimiento == 'salida':
+        return -cantidad
+    # Los ajustes quedan registrados pero no modifican el stock
+    return 0
+
+
+def expresion_delta_movimiento():
+    """Equivalente en SQL de `delta_movimiento`, para sumar movimientos en la base."""
+    return Case(
+        When(tipo_movimiento='entrada', then=F('cantidad')),
+        When(tipo_movimiento='salida', then=-F('cantidad')),
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def ajustar_stock(deltas):
+    """Aplica a cada producto su variación de stock en una sola sentencia UPDATE.
+
+    `deltas` es un diccionario `producto_id -> unidades` (positivas o negativas).
+    Lanza `StockInsuficienteError` si algún producto quedaría con stock negativo.
+    Devuelve un diccionario `producto_id -> nuevo stock`.
+    """
+    deltas = {pk: delta for pk, delta in deltas.items() if delta}
+    if not deltas:
+        return {}
+
+    if len(deltas) == 1:
+        (pk, delta), = deltas.items()
+        expresion = F('stock_actual') + delta
+    else:
+        expresion = F('stock_actual') + Case(
+            *[When(pk=pk, then=Value(delta)) for pk, delta in deltas.items()],
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+    productos = Producto.objects.filter(pk__in=deltas)
+
+    with transaction.atomic():
+        if any(delta < 0 for delta in deltas.values()):
+            # Bloquear las filas para validar el stock antes de descontarlo
+            anteriores = {p['id']: p for p in productos.select_for_update().values(*CAMPOS_CAMBIO)}
+            for pk, delta in deltas.items():
+                if pk in anteriores and anteriores[pk]['stock_actual'] + delta < 0:
+                    producto = anteriores[pk]
+                    raise StockInsuficienteError(
+                        f"Stock insuficiente para {producto['nombre']}. "
+                        f"Solo hay {producto['stock_actual']} unidades disponibles."
+                    )
+            productos.update(stock_actual=expresion, fecha_actualizacion=timezone.now())
+            cambios = [
+                dict(fila, stock_anterior=fila['stock_actual'], stock_actual=fila['stock_actual'] + deltas[pk])
+                for pk, fila in anteriores.items()
+            ]
+        else:
+            # El UPDATE ya bloquea las filas; se leen los valores resultantes
+            productos.update(stock_actual=expresion, fecha_actualizacion=timezone.now())
+            cambios = [
+                dict(fila, stock_anterior=fila['stock_actual'] - deltas[fila['id']])
+                for fila in productos.values(*CAMPOS_CAMBIO)
+            ]
+        stock_actualizado.send(sender=Producto, cambios=cambios)
+
+    return {cambio['id']: cambio['stock_actual'] for cambio in cambios}
+
+
+def registrar_movimientos(movimientos):
+    """Guarda en bloque movimientos nuevos (sin guardar) y mueve el stock.
+
+    Los movimientos se insertan con un solo `bulk_create` y el stock de todos
+    los productos involucrados se actualiza con un único UPDATE agrupado, por
+    lo que la cantidad de consultas no depende del número de líneas.
+    """
+    deltas = {}
+    for movimiento in movimientos:
+        delta = delta_movimiento(movimiento.tipo_movimiento, movimiento.cantidad)
+        deltas[movimiento.producto_id] = deltas.get(movimiento.producto_id, 0) + delta
+
+    with transaction.atomic():
+        ajustar_stock(deltas)
+        creados = MovimientoInventario.objects.bulk_create(movimientos)
+        movimientos_registrados.send(sender=MovimientoInventario, movimientos=creados)
+    return creados
@@ -1,3 +1,234 @@
-from django.test import TestCase
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from unittest import skipIf, skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core.contadores import calcular_contadores, reconstruir_contadores
+from core.models import ContadorDashboard
+
+from .archivo import MESES_RETENCION_MINIMO, archivar_lote, fecha_corte
+from .busqueda import buscar_productos
+from .historial import fin_del_dia, generar_snapshots, stock_en_fecha
+from .models import Producto, MovimientoInventario, MovimientoInventarioArchivado
+from .pronostico import pronostico_disponible, pronosticar
+from .stock import StockInsuficienteError
+
+
+def crear_producto(**kwargs):
+    datos = {
+        'nombre': 'Champú Reparador',
+        'categoria': 'champu',
+        'precio_costo': Decimal('1000'),
+        'precio_venta': Decimal('2000'),
+        'stock_actual': 0,
+        'stock_minimo': 5,
+    }
+    datos.update(kwargs)
+    return Producto.objects.create(**datos)
+
+
+def ejecutar_en_paralelo(funcion, hilos):
+    """Ejecuta `funcion` en varios hilos, cada uno con su propia conexión."""
+    errores = []
+    barrera = threading.Barrier(hilos)
+
+    def trabajo():
+        try:
+            barrera.wait()
+            funcion()
+        except Exception as exc:  # pragma: no cover - se reporta en el assert
+            errores.append(exc)
+        finally:
+            connection.close()
+
+    trabajadores = [threading.Thread(target=trabajo) for _ in range(hilos)]
+    for trabajador in trabajadores:
+        trabajador.start()
+    for trabajador in trabajadores:
+        trabajador.join()
+    return errores
+
+
+class MovimientoInventarioTest(TestCase):
+
+    def setUp(self):
+        self.usuario = User.objects.create_user('stock', password='x')
+        self.producto = crear_producto(stock_actual=10)
+
+    def test_entrada_y_salida_actualizan_stock(self):
+        MovimientoInventario.objects.create(producto=self.producto, tipo_movimiento='entrada',
+                                            cantidad=5, motivo='Reposición', usuario=self.usuario)
+        MovimientoInventario.objects.create(producto=self.producto, tipo_movimiento='salida',
+                                            cantidad=3, motivo='Consumo', usuario=self.usuario)
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.stock_actual, 12)
+
+    def test_salida_sin_stock_suficiente_no_se_registra(self):
+        with self.assertRaises(StockInsuficienteError):
+            MovimientoInventario.objects.create(producto=self.producto, tipo_movimiento='salida',
+                                                cantidad=11, motivo='Consumo', usuario=self.usuario)
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.stock_actual, 10)
+        self.assertFalse(MovimientoInventario.objects.exists())
+
+    def test_volver_a_guardar_no_mueve_el_stock(self):
+        movimiento = MovimientoInventario.objects.create(producto=self.producto, tipo_movimiento='entrada',
+                                                         cantidad=5, motivo='Reposición', usuario=self.usuario)
+        movimiento.motivo = 'Reposición proveedor'
+        movimiento.save()
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.stock_actual, 15)
+
+
+
+@skipUnless(pronostico_disponible(), 'requiere numpy')
+class PronosticoTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.usuario = User.objects.create_user('stock', password='x')
+
+    def test_consumo_minimo_no_desborda_la_fecha_de_quiebre(self):
+        producto = crear_producto(stock_actual=31)
+        movimiento = MovimientoInventario.objects.create(producto=producto, tipo_movimiento='salida', cantidad=1,
+                                                         motivo='Venta', usuario=self.usuario)
+        MovimientoInventario.objects.filter(pk=movimiento.pk).update(
+            fecha_movimiento=timezone.now() - timedelta(days=89)
+        )
+        producto.refresh_from_db()
+
+        pronostico = pronosticar([producto])[producto.pk]
+
+        self.assertIsNone(pronostico.dias_hasta_quiebre)
+        self.assertIsNone(pronostico.fecha_quiebre)
+        self.assertFalse(pronostico.pedir_ahora)
+
+
+class ArchivoMovimientosTest(TestCase):
+
+    def test_archivar_lote_ajusta_los_contadores_una_vez_por_lote(self):
+        usuario = User.objects.create_user('stock', password='x')
+        producto = crear_producto(stock_actual=100)
+        for _ in range(20):
+            MovimientoInventario.objects.create(producto=producto, tipo_movimiento='salida', cantidad=1,
+                                                motivo='Venta', usuario=usuario)
+        MovimientoInventario.objects.update(fecha_movimiento=timezone.now() - timedelta(days=400))
+        reconstruir_contadores()
+
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(archivar_lote(fecha_corte(MESES_RETENCION_MINIMO), 100), 20)
+
+        self.assertLess(len(consultas), 15)
+        self.assertFalse(MovimientoInventario.objects.exists())
+        self.assertEqual(MovimientoInventarioArchivado.objects.count(), 20)
+        guardados = ContadorDashboard.objects.filter(clave__startswith='movimientos:').exclude(valor=0)
+        calculados = {clave: valor for clave, valor in calcular_contadores().items() if clave.startswith('movimientos:')}
+        self.assertEqual(dict(guardados.values_list('clave', 'valor')), calculados)
+
+
+class StockEnFechaTest(TestCase):
+
+    def setUp(self):
+        self.usuario = User.objects.create_user('historial', password='x')
+        self.producto = crear_producto(stock_actual=100)
+        Producto.objects.filter(pk=self.producto.pk).update(fecha_creacion=timezone.now() - timedelta(days=90))
+        self.hoy = timezone.localdate()
+
+    def registrar(self, tipo, cantidad, dias_atras):
+        movimiento = MovimientoInventario.objects.create(producto=self.producto, tipo_movimiento=tipo,
+                                                         cantidad=cantidad, motivo='x', usuario=self.usuario)
+        fecha = fin_del_dia(self.hoy - timedelta(days=dias_atras)) - timedelta(hours=1)
+        MovimientoInventario.objects.filter(pk=movimiento.pk).update(fecha_movimiento=fecha)
+
+    def test_stock_en_fecha_con_y_sin_snapshot(self):
+        self.registrar('salida', 10, dias_atras=40)   # 90
+        self.registrar('entrada', 5, dias_atras=20)   # 95
+        self.registrar('salida', 15, dias_atras=5)    # 80
+        esperado = {50: 100, 40: 90, 30: 90, 20: 95, 10: 95, 5: 80, 0: 80}
+
+        for dias, stock in esperado.items():
+            self.assertEqual(stock_en_fecha(self.producto, self.hoy - timedelta(days=dias)), stock)
+
+        generar_snapshots(self.hoy - timedelta(days=30))
+        # Con el snapshot se parte de él y el resultado debe ser el mismo
+        for dias, stock in esperado.items():
+            self.assertEqual(stock_en_fecha(self.producto, self.hoy - timedelta(days=dias)), stock)
+
+    def test_producto_creado_despues_de_la_fecha(self):
+        self.assertEqual(stock_en_fecha(self.producto, self.hoy - timedelta(days=120)), 0)
+
+
+class BusquedaProductoTest(TestCase):
+
+    def setUp(self):
+        self.champu = crear_producto(nombre='Champú Reparador')
+        self.tinte = crear_producto(nombre='Tinte Rojo Intenso', categoria='tinte')
+
+    def test_sin_tildes_ni_mayusculas_y_por_prefijo(self):
+        self.assertEqual(buscar_productos('CHAMPU'), [self.champu])
+        self.assertEqual(buscar_productos('repar'), [self.champu])
+        self.assertEqual(buscar_productos('tinte', campo='categoria'), [self.tinte])
+
+    def test_tolera_errores_de_tipeo_y_ordena_por_relevancia(self):
+        self.assertEqual(buscar_productos('intenso rojo'), [self.tinte])
+        self.assertEqual(buscar_productos('reparadro'), [self.champu])
+        self.assertEqual(buscar_productos('xyz'), [])
+
+    def test_indice_se_actualiza_al_guardar(self):
+        self.tinte.nombre = 'Tinte Azul'
+        self.tinte.save()
+        self.assertEqual(buscar_productos('rojo'), [])
+        self.assertEqual(buscar_productos('azul'), [self.tinte])
+
+
+class MovimientoInventarioConcurrenteTest(TransactionTestCase):
+    HILOS = 8
+    MOVIMIENTOS_POR_HILO = 5
+
+    def setUp(self):
+        self.usuario = User.objects.create_user('concurrente', password='x')
+
+    # SQLite bloquea la tabla completa ante escrituras simultáneas ('database table is locked')
+    @skipIf(connection.vendor == 'sqlite', 'SQLite no admite escrituras concurrentes')
+    def test_entradas_concurrentes_no_pierden_actualizaciones(self):
+        producto = crear_producto(stock_actual=0)
+
+        def registrar_entradas():
+            for _ in range(self.MOVIMIENTOS_POR_HILO):
+                # Cada hilo trabaja con su propia copia del producto, como en vistas distintas
+                copia = Producto.objects.get(pk=producto.pk)
+                MovimientoInventario.objects.create(producto=copia, tipo_movimiento='entrada', cantidad=1,
+                                                    motivo='Entrada concurrente', usuario=self.usuario)
+
+        errores = ejecutar_en_paralelo(registrar_entradas, self.HILOS)
+
+        self.assertEqual(errores, [])
+        producto.refresh_from_db()
+        self.assertEqual(producto.stock_actual, self.HILOS * self.MOVIMIENTOS_POR_HILO)
+        self.assertEqual(MovimientoInventario.objects.count(), self.HILOS * self.MOVIMIENTOS_POR_HILO)
+
+    @skipUnlessDBFeature('has_select_for_update')
+    def test_salidas_concurrentes_no_dejan_stock_negativo(self):
+        producto = crear_producto(stock_actual=self.HILOS // 2)
+
+        def registrar_salida():
+            copia = Producto.objects.get(pk=producto.pk)
+            try:
+                MovimientoInventario.objects.create(producto=copia, tipo_movimiento='salida', cantidad=1,
+                                                    motivo='Salida concurrente', usuario=self.usuario)
+            except StockInsuficienteError:
+                pass
+
+        errores = ejecutar_en_paralelo(registrar_salida, self.HILOS)
+
+        self.assertEqual(errores, [])
+        producto.refresh_from_db()
+        self.assertEqual(producto.stock_actual, 0)
+        self.assertEqual(MovimientoInventario.objects.filter(tipo_movimiento='salida').count(), self.HILOS // 2)
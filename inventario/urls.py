@@ -10,6 +10,7 @@ urlpatterns = [
     path('baja/<int:pk>/', views.dar_baja_producto, name='dar_baja_producto'),
     path('eliminar/<int:pk>/', views.eliminar_producto, name='eliminar_producto'),
     path('actualizar-stock/<int:pk>/', views.actualizar_stock, name='actualizar_stock'),
+    path('ingreso-masivo/', views.ingreso_masivo_stock, name='ingreso_masivo_stock'),
     path('bajo-minimos/', views.bajo_minimos, name='bajo_minimos'),
     path('buscar/', views.buscar_producto, name='buscar_producto'),
 ]
\ No newline at end of file
@@ -0,0 +1,99 @@
+"""Valorización del inventario (stock × precio de costo) calculada en la base.
+
+`valorar` recibe un queryset de productos y devuelve el total y los
+desgloses por categoría, proveedor y estado con consultas agregadas, sin
+cargar los productos en Python. El resultado se guarda en caché hasta el
+próximo cambio de stock o de precio: los productos, los ajustes de stock y
+los proveedores suben la versión `inventario` (ver `core.versiones`).
+"""
+import hashlib
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import Count, DecimalField, F, Q, Sum
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_save, post_delete
+
+from core.versiones import invalidar, version
+from .models import Producto
+from .signals import stock_actualizado
+
+VERSION = 'inventario'
+# Segundos máximos que se conserva una valorización en caché
+DURACION_CACHE = 60 * 60
+
+
+@dataclass
+class Valoracion:
+    """Totales de valorización de un conjunto de productos."""
+    total: Decimal = Decimal('0')
+    unidades: int = 0
+    productos: int = 0
+    bajo_minimo: int = 0
+    por_categoria: list = field(default_factory=list)
+    por_proveedor: list = field(default_factory=list)
+    por_estado: list = field(default_factory=list)
+
+
+def _agregados():
+    valor = Sum(F('precio_costo') * F('stock_actual'), output_field=DecimalField(max_digits=16, decimal_places=2))
+    return {
+        'valor': Coalesce(valor, Decimal('0'), output_field=DecimalField(max_digits=16, decimal_places=2)),
+        'unidades': Coalesce(Sum('stock_actual'), 0),
+        'productos': Count('id'),
+    }
+
+
+def calcular_valoracion(productos):
+    """Calcula la valorización de `productos` con cuatro consultas agregadas."""
+    productos = productos.order_by()
+    datos = productos.aggregate(bajo_minimo=Count('id', filter=Q(bajo_minimo=True)), **_agregados())
+    valoracion = Valoracion(
+        total=datos['valor'],
+        unidades=datos['unidades'],
+        productos=datos['productos'],
+        bajo_minimo=datos['bajo_minimo'],
+    )
+
+    categorias = dict(Producto.CATEGORIA_CHOICES)
+    valoracion.por_categoria = [
+        dict(fila, nombre=categorias.get(fila['categoria'], fila['categoria']))
+        for fila in productos.values('categoria').annotate(**_agregados()).order_by('-valor')
+    ]
+    valoracion.por_proveedor = [
+        dict(fila, nombre=fila['proveedor__nombre_empresa'] or 'Sin proveedor')
+        for fila in productos.values('proveedor_id', 'proveedor__nombre_empresa').annotate(
+            **_agregados()
+        ).order_by('-valor')
+    ]
+    estados = dict(Producto.ESTADO_CHOICES)
+    valoracion.por_estado = [
+        dict(fila, nombre=estados.get(fila['estado'], fila['estado']))
+        for fila in productos.values('estado').annotate(**_agregados()).order_by('estado')
+    ]
+    return valoracion
+
+
+def valorar(productos=None):
+    """Valorización de `productos` (todos si es None), desde la caché si está vigente."""
+    if productos is None:
+        productos = Producto.objects.all()
+    consulta = hashlib.md5(str(productos.order_by().query).encode()).hexdigest()
+    clave = f'inventario:valoracion:{version(VERSION)}:{consulta}'
+    return cache.get_or_set(clave, lambda: calcular_valoracion(productos), DURACION_CACHE)
+
+
+def _invalidar_valoracion(sender, **kwargs):
+    invalidar(VERSION)
+
+
+post_save.connect(_invalidar_valoracion, sender=Producto, dispatch_uid='valoracion_producto_guardado')
+post_delete.connect(_invalidar_valoracion, sender=Producto, dispatch_uid='valoracion_producto_eliminado')
+stock_actualizado.connect(_invalidar_valoracion, dispatch_uid='valoracion_stock_actualizado')
+# El desglose por proveedor muestra su nombre, y al eliminarlo sus productos pasan
+# a no tener proveedor (SET_NULL) sin un post_save por producto
+post_save.connect(_invalidar_valoracion, sender='proveedores.Proveedor',
+                  dispatch_uid='valoracion_proveedor_guardado')
+post_delete.connect(_invalidar_valoracion, sender='proveedores.Proveedor',
+                    dispatch_uid='valoracion_proveedor_eliminado')
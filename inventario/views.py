@@ -2,10 +2,15 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required, user_passes_test
 from usuarios.helpers import is_admin_user, has_any_role
-from django.db.models import Q, F
+from django.db.models import Count, Q
 from .models import Producto, MovimientoInventario
 from .forms import ProductoForm, MovimientoInventarioForm, ActualizarStockForm, BuscarProductoForm
+from .forms import IngresoMasivoStockForm, IngresoStockFormSet
+from .stock import registrar_movimientos
+from .pronostico import pronosticar
+from .busqueda import buscar_productos
 from usuarios.helpers import registrar_accion
+from core.paginacion import paginar
 
 @login_required
 def lista_productos(request):
@@ -18,11 +23,24 @@ def lista_productos(request):
     else:
         productos = Producto.objects.filter(estado='activo')
     
-    productos_bajo_minimo = productos.filter(stock_actual__lte=F('stock_minimo'))
+    pagina = paginar(request, productos)
+    resumen = productos.aggregate(
+        total=Count('id'),
+        activos=Count('id', filter=Q(estado='activo')),
+        bajo_minimo=Count('id', filter=Q(bajo_minimo=True)),
+        categorias=Count('categoria', distinct=True),
+    )
+
+    # Días hasta el quiebre según el consumo reciente (tasas en caché por día)
+    pronosticos = pronosticar(pagina)
+    for producto in pagina:
+        producto.pronostico = pronosticos.get(producto.pk)
 
     context = {
-        'productos': productos,
-        'productos_bajo_minimo_count': productos_bajo_minimo.count(),
+        'productos': pagina,
+        'pagina': pagina,
+        'resumen': resumen,
+        'productos_bajo_minimo_count': resumen['bajo_minimo'],
     }
     return render(request, 'inventario/listaProductos.html', context)
 
@@ -74,7 +92,8 @@ def dar_baja_producto(request, pk):
     
     if request.method == 'POST':
         producto.estado = 'inactivo'
-        producto.save()
+        # Guardar sólo el estado para no pisar el stock modificado por otros movimientos
+        producto.save(update_fields=['estado', 'fecha_actualizacion'])
         messages.success(request, 'Producto dado de baja exitosamente.')
         return redirect('inventario:lista_productos')
     
@@ -114,11 +133,56 @@ def actualizar_stock(request, pk):
     return render(request, 'inventario/actualizarStock.html', context)
 
 
+@login_required
+@user_passes_test(is_admin_user)
+def ingreso_masivo_stock(request):
+    """Registra de una vez todas las líneas de una entrega de proveedor.
+
+    Las líneas pueden venir del formulario, de un archivo CSV o de ambos. Se
+    validan todas antes de escribir y luego se guardan en una sola transacción.
+    """
+    opciones = list(Producto.objects.filter(estado='activo').values_list('id', 'nombre'))
+
+    if request.method == 'POST':
+        form = IngresoMasivoStockForm(request.POST, request.FILES)
+        formset = IngresoStockFormSet(request.POST, prefix='lineas', form_kwargs={'productos': opciones})
+        if form.is_valid() and formset.is_valid():
+            lineas = formset.lineas() + form.cleaned_data['archivo_csv']
+            if not lineas:
+                form.add_error(None, 'Ingrese al menos una línea o cargue un archivo CSV.')
+            else:
+                motivo = form.cleaned_data['motivo']
+                registrar_movimientos([
+                    MovimientoInventario(
+                        producto_id=producto_id,
+                        tipo_movimiento='entrada',
+                        cantidad=cantidad,
+                        motivo=motivo,
+                        usuario=request.user
+                    )
+                    for producto_id, cantidad in lineas
+                ])
+                unidades = sum(cantidad for _, cantidad in lineas)
+                registrar_accion(request.user, 'ingreso_masivo_stock', modelo='MovimientoInventario',
+                                 descripcion=f"{len(lineas)} líneas, {unidades} unidades: {motivo}")
+                messages.success(request, f'Stock actualizado: {len(lineas)} líneas, +{unidades} unidades.')
+                return redirect('inventario:lista_productos')
+    else:
+        form = IngresoMasivoStockForm()
+        formset = IngresoStockFormSet(prefix='lineas', form_kwargs={'productos': opciones})
+
+    context = {
+        'form': form,
+        'formset': formset,
+    }
+    return render(request, 'inventario/ingresoMasivoStock.html', context)
+
+
 @login_required
 def bajo_minimos(request):
     """Lista productos bajo stock mínimo"""
     productos_bajo_minimo = Producto.objects.filter(
-        stock_actual__lte=F('stock_minimo'),
+        bajo_minimo=True,
         estado='activo'
     )
     
@@ -136,13 +200,12 @@ def buscar_producto(request):
         tipo_busqueda = form.cleaned_data['tipo_busqueda']
         termino = form.cleaned_data['termino_busqueda']
         
-        if tipo_busqueda == 'nombre':
-            productos = Producto.objects.filter(nombre__icontains=termino)
-        elif tipo_busqueda == 'categoria':
-            productos = Producto.objects.filter(categoria__icontains=termino)
+        if tipo_busqueda in ('nombre', 'categoria'):
+            # Sin distinguir tildes ni mayúsculas, tolerando errores de tipeo en el nombre
+            productos = buscar_productos(termino, campo=tipo_busqueda)
         elif tipo_busqueda == 'bajo_minimo':
             productos = Producto.objects.filter(
-                stock_actual__lte=F('stock_minimo'),
+                bajo_minimo=True,
                 estado='activo'
             )
     
@@ -2,19 +2,29 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required, user_passes_test
 from usuarios.helpers import is_admin_user, has_any_role
-from django.db.models import Q
+from django.db.models import Count, Q
 from .models import Proveedor
 from .forms import ProveedorForm, BuscarProveedorForm
 from usuarios.helpers import registrar_accion
 from django.contrib.auth.decorators import user_passes_test
+from core.paginacion import paginar
 
 @login_required
 def lista_proveedores(request):
     """Lista todos los proveedores"""
     proveedores = Proveedor.objects.all()
     
+    pagina = paginar(request, proveedores)
+    resumen = proveedores.aggregate(
+        total=Count('id', distinct=True),
+        activos=Count('id', filter=Q(estado='activo'), distinct=True),
+        con_productos=Count('id', filter=Q(producto__isnull=False), distinct=True),
+        productos=Count('producto'),
+    )
     context = {
-        'proveedores': proveedores,
+        'proveedores': pagina,
+        'pagina': pagina,
+        'resumen': resumen,
     }
     return render(request, 'proveedores/listaProveedores.html', context)
 
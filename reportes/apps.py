@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class ReportesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'reportes'
+
+    def ready(self):
+        # Invalidar los resultados de reportes en caché cuando cambian sus datos
+        from . import resultados  # noqa: F401
+        # Mantener las ventas diarias al guardar citas y registrar consumos
+        from . import ventas  # noqa: F401
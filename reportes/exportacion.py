@@ -0,0 +1,230 @@
+"""Exportación CSV por streaming.
+
+Las filas se leen de la base por lotes de `TAMANO_LOTE` como tuplas de
+`values_list`, con las relaciones resueltas en el mismo JOIN, y se envían al
+navegador a medida que se escriben. Cada lote es una consulta por clave que
+sigue a la última fila del anterior (`core.paginacion.lotes_por_clave`): con
+pymysql un cursor del servidor no se lee por partes, así que el servidor sólo
+mantiene un lote en memoria y nunca arma el archivo completo.
+
+`EXPORTACIONES` describe cada exportación (columnas, consulta y roles que
+pueden pedirla); la usan tanto las descargas directas como el worker de
+reportes en segundo plano (`reportes.trabajos`). Los reportes agregados
+(productos más vendidos) no son una consulta que se pueda leer por lotes:
+su `consulta` devuelve las filas ya calculadas, así que sólo los genera el
+worker y sus parámetros se validan aparte (`validacion`).
+"""
+import csv
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Optional
+
+from django.db.models import QuerySet
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from clientes.models import Cliente
+from core.paginacion import lotes_por_clave
+from inventario.models import MovimientoInventario, Producto
+from servicios.models import Cita
+
+from .filtros import clientes_segun, inventario_segun, por_fechas_segun, productos_segun, ventas_segun
+from .models import VentaDiaria
+from .ventas import productos_mas_vendidos
+
+TAMANO_LOTE = 2000
+# Marca de orden de bytes para que Excel reconozca el archivo como UTF-8
+BOM = '\ufeff'
+
+COLUMNAS_INVENTARIO = [
+    ('Nombre', 'nombre'),
+    ('Categoria', 'categoria'),
+    ('Precio Costo', 'precio_costo'),
+    ('Precio Venta', 'precio_venta'),
+    ('Stock Actual', 'stock_actual'),
+    ('Stock Minimo', 'stock_minimo'),
+    ('Proveedor', 'proveedor__nombre_empresa'),
+    ('Estado', 'estado'),
+]
+COLUMNAS_CLIENTES = [
+    ('RUT', 'rut'),
+    ('Nombre', 'nombre'),
+    ('Apellido', 'apellido'),
+    ('Email', 'email'),
+    ('Telefono', 'telefono'),
+    ('Fecha Nacimiento', 'fecha_nacimiento'),
+    ('Estado', 'estado'),
+    ('Fecha Registro', 'fecha_registro'),
+]
+COLUMNAS_CITAS = [
+    ('Fecha', 'fecha_cita'),
+    ('RUT Cliente', 'cliente__rut'),
+    ('Cliente', 'cliente__nombre'),
+    ('Apellido Cliente', 'cliente__apellido'),
+    ('Servicio', 'servicio__nombre'),
+    ('Estilista', 'estilista__nombre'),
+    ('Apellido Estilista', 'estilista__apellido'),
+    ('Estado', 'estado'),
+    ('Descuento', 'descuento_aplicado'),
+    ('Precio Final', 'precio_final'),
+]
+COLUMNAS_MOVIMIENTOS = [
+    ('Fecha', 'fecha_movimiento'),
+    ('Producto', 'producto__nombre'),
+    ('Tipo', 'tipo_movimiento'),
+    ('Cantidad', 'cantidad'),
+    ('Motivo', 'motivo'),
+    ('Usuario', 'usuario__username'),
+]
+COLUMNAS_VENTAS = [
+    ('Fecha', 'fecha'),
+    ('Servicio', 'servicio__nombre'),
+    ('Estilista', 'estilista__nombre'),
+    ('Apellido Estilista', 'estilista__apellido'),
+    ('Citas', 'citas'),
+    ('Ingresos', 'ingresos'),
+    ('Descuentos', 'descuentos'),
+    ('Productos', 'productos'),
+]
+COLUMNAS_PRODUCTOS_VENDIDOS = [
+    ('Producto', 'producto__nombre'),
+    ('Categoria', 'producto__categoria'),
+    ('Unidades Vendidas', 'total_vendido'),
+    ('Monto', 'monto'),
+    ('Salidas Totales', 'salidas'),
+]
+
+
+@dataclass(frozen=True)
+class Exportacion:
+    """Una exportación CSV: `consulta(parametros)` devuelve el QuerySet a exportar.
+
+    En los reportes agregados devuelve la lista de filas (diccionarios) y
+    `validacion(parametros)` revisa los parámetros sin calcular nada.
+    """
+    archivo: str
+    columnas: list
+    consulta: Callable
+    roles: tuple
+    validacion: Optional[Callable] = None
+
+    def validar(self, parametros):
+        """Lanza `ParametrosInvalidos` si los parámetros no son válidos, sin leer los datos."""
+        (self.validacion or self.consulta)(parametros)
+
+
+def _ventas(parametros):
+    fecha_inicio, fecha_fin = ventas_segun(parametros)
+    return VentaDiaria.objects.filter(fecha__gte=fecha_inicio, fecha__lte=fecha_fin).order_by('fecha')
+
+
+EXPORTACIONES = {
+    'inventario': Exportacion(
+        'reporte_inventario.csv', COLUMNAS_INVENTARIO,
+        lambda parametros: inventario_segun(Producto.objects.order_by('nombre'), parametros),
+        ('administrador', 'recepcionista', 'estilista'),
+    ),
+    'stock_bajo': Exportacion(
+        'productos_stock_bajo.csv', COLUMNAS_INVENTARIO,
+        lambda parametros: Producto.objects.filter(bajo_minimo=True, estado='activo').order_by('nombre'),
+        ('administrador', 'recepcionista', 'estilista'),
+    ),
+    'clientes': Exportacion(
+        'reporte_clientes.csv', COLUMNAS_CLIENTES,
+        lambda parametros: clientes_segun(Cliente.objects.all(), parametros),
+        ('administrador', 'recepcionista'),
+    ),
+    'citas': Exportacion(
+        'reporte_citas.csv', COLUMNAS_CITAS,
+        lambda parametros: por_fechas_segun(Cita.objects.order_by('fecha_cita'), 'fecha_cita', parametros),
+        ('administrador', 'recepcionista'),
+    ),
+    'movimientos': Exportacion(
+        'movimientos_inventario.csv', COLUMNAS_MOVIMIENTOS,
+        lambda parametros: por_fechas_segun(
+            MovimientoInventario.objects.order_by('fecha_movimiento'), 'fecha_movimiento', parametros
+        ),
+        ('administrador', 'recepcionista'),
+    ),
+    'ventas': Exportacion(
+        'reporte_ventas.csv', COLUMNAS_VENTAS, _ventas, ('administrador', 'recepcionista'),
+    ),
+    'productos_mas_vendidos': Exportacion(
+        'productos_mas_vendidos.csv', COLUMNAS_PRODUCTOS_VENDIDOS,
+        lambda parametros: productos_mas_vendidos(*productos_segun(parametros)),
+        ('administrador', 'recepcionista'),
+        validacion=productos_segun,
+    ),
+}
+
+
+class _Eco:
+    """Pseudo-archivo para `csv.writer`: `write` devuelve la fila en vez de guardarla."""
+
+    def write(self, valor):
+        return valor
+
+
+def _valor(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, datetime):
+        if timezone.is_aware(valor):
+            valor = timezone.localtime(valor)
+        return valor.strftime('%Y-%m-%d %H:%M')
+    return valor
+
+
+def _lotes(columnas, consulta):
+    """Filas de `consulta` proyectadas a `columnas`, en listas de hasta TAMANO_LOTE."""
+    campos = [campo for _, campo in columnas]
+    if isinstance(consulta, QuerySet):
+        lotes = lotes_por_clave(consulta, campos, TAMANO_LOTE)
+    else:
+        # Filas ya calculadas de un reporte agregado
+        filas = [[fila[campo] for campo in campos] for fila in consulta]
+        lotes = (filas[i:i + TAMANO_LOTE] for i in range(0, len(filas), TAMANO_LOTE))
+    for lote in lotes:
+        yield [[_valor(v) for v in fila] for fila in lote]
+
+
+def contar(consulta):
+    """Filas a exportar de `consulta` (QuerySet o lista de filas ya calculadas)."""
+    return consulta.count() if isinstance(consulta, QuerySet) else len(consulta)
+
+
+def filas_csv(columnas, consulta):
+    """Genera el CSV (con BOM y encabezados) en trozos de TAMANO_LOTE filas."""
+    escritor = csv.writer(_Eco())
+    yield BOM + escritor.writerow([encabezado for encabezado, _ in columnas])
+    for lote in _lotes(columnas, consulta):
+        yield ''.join(escritor.writerow(fila) for fila in lote)
+
+
+def escribir_csv(destino, columnas, consulta, al_avanzar=None):
+    """Escribe `consulta` como CSV en el archivo de texto `destino` y devuelve las filas escritas.
+
+    `al_avanzar(filas)` se llama después de cada lote con el total escrito hasta ese momento.
+    """
+    escritor = csv.writer(destino)
+    destino.write(BOM)
+    escritor.writerow([encabezado for encabezado, _ in columnas])
+    total = 0
+    for lote in _lotes(columnas, consulta):
+        escritor.writerows(lote)
+        total += len(lote)
+        if al_avanzar:
+            al_avanzar(total)
+    return total
+
+
+def respuesta_csv(nombre_archivo, columnas, consulta):
+    """Respuesta que transmite `consulta` como CSV.
+
+    `columnas` es una lista de pares (encabezado, campo); los campos pueden
+    cruzar relaciones (`proveedor__nombre_empresa`) y se leen con un único
+    `values_list`.
+    """
+    response = StreamingHttpResponse(filas_csv(columnas, consulta), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{nombre_archivo}"'
+    return response
@@ -0,0 +1,132 @@
+"""Filtros de los reportes, compartidos por las vistas, las exportaciones y el worker.
+
+Reciben los parámetros tal como llegan en la URL (un QueryDict o el dict
+guardado en `Reporte.parametros`) y los validan con el formulario del reporte.
+Un rango de fechas presente pero inválido lanza `ParametrosInvalidos` en vez
+de ignorarse, para no exportar la tabla completa por un filtro mal escrito.
+"""
+from datetime import date, timedelta
+
+from django.utils import timezone
+
+from clientes.cumpleanos import cumpleanos_del_mes
+from core.fechas import inicio_del_dia
+
+from .forms import ReporteClientesForm, ReporteInventarioForm, ReporteProductosForm, ReporteVentasForm
+
+
+class ParametrosInvalidos(ValueError):
+    """Los parámetros de un reporte están presentes pero no son válidos."""
+
+
+def _errores(form):
+    return ' '.join(str(error) for errores in form.errors.values() for error in errores)
+
+
+def filtrar_inventario(productos, datos):
+    """Aplica los filtros de `ReporteInventarioForm` (ya validados) a `productos`."""
+    if not datos['incluir_inactivos']:
+        productos = productos.filter(estado='activo')
+
+    tipo_reporte = datos['tipo_reporte']
+    if tipo_reporte == 'bajo_minimo':
+        productos = productos.filter(bajo_minimo=True)
+    elif tipo_reporte == 'categoria' and datos['categoria']:
+        productos = productos.filter(categoria=datos['categoria'])
+    elif tipo_reporte == 'proveedor':
+        productos = productos.filter(proveedor__isnull=False)
+    return productos
+
+
+def filtrar_clientes(clientes, datos):
+    """Aplica los filtros y el orden de `ReporteClientesForm` (ya validados) a `clientes`."""
+    tipo_reporte = datos['tipo_reporte']
+    if tipo_reporte == 'activos':
+        clientes = clientes.filter(estado='activo')
+    elif tipo_reporte == 'inactivos':
+        clientes = clientes.filter(estado='inactivo')
+    elif tipo_reporte == 'cumpleanos':
+        clientes = cumpleanos_del_mes(clientes, timezone.localdate().month)
+
+    ordenar_por = datos['ordenar_por']
+    if ordenar_por == 'nombre':
+        clientes = clientes.order_by('nombre', 'apellido')
+    elif ordenar_por == 'fecha_registro':
+        clientes = clientes.order_by('-fecha_registro')
+    elif ordenar_por == 'estado':
+        clientes = clientes.order_by('estado', 'nombre')
+    return clientes
+
+
+def inventario_segun(productos, parametros):
+    """`productos` filtrado según los parámetros de la URL, si son válidos."""
+    form = ReporteInventarioForm(parametros or None)
+    if parametros and form.is_valid():
+        productos = filtrar_inventario(productos, form.cleaned_data)
+    return productos
+
+
+def clientes_segun(clientes, parametros):
+    """`clientes` filtrado y ordenado según los parámetros de la URL, si son válidos."""
+    form = ReporteClientesForm(parametros or None)
+    if parametros and form.is_valid():
+        clientes = filtrar_clientes(clientes, form.cleaned_data)
+    return clientes
+
+
+def por_fechas_segun(consulta, campo, parametros):
+    """Restringe `consulta` al rango fecha_inicio/fecha_fin (días locales).
+
+    Sin ninguna de las dos fechas no se filtra; si hay alguna y el rango no es
+    válido (incompleto, invertido o de más de un año) lanza `ParametrosInvalidos`.
+    """
+    if not (parametros.get('fecha_inicio') or parametros.get('fecha_fin')):
+        return consulta
+    form = ReporteVentasForm(parametros)
+    if not form.is_valid():
+        raise ParametrosInvalidos(_errores(form))
+    desde = inicio_del_dia(form.cleaned_data['fecha_inicio'])
+    hasta = inicio_del_dia(form.cleaned_data['fecha_fin'] + timedelta(days=1))
+    return consulta.filter(**{f'{campo}__gte': desde, f'{campo}__lt': hasta})
+
+
+def ventas_segun(parametros):
+    """(fecha_inicio, fecha_fin) del reporte de ventas; sin fechas, el mes en curso."""
+    hoy = timezone.localdate()
+    if not (parametros.get('fecha_inicio') or parametros.get('fecha_fin')):
+        return hoy.replace(day=1), hoy
+    form = ReporteVentasForm(parametros)
+    if not form.is_valid():
+        raise ParametrosInvalidos(_errores(form))
+    return form.cleaned_data['fecha_inicio'], form.cleaned_data['fecha_fin']
+
+
+def rango_productos(datos, hoy):
+    """(fecha_inicio, fecha_fin) del período de `ReporteProductosForm` (ya validado)."""
+    periodo = datos['periodo']
+    if periodo == 'hoy':
+        return hoy, hoy
+    if periodo == 'semana':
+        fecha_inicio = hoy - timedelta(days=hoy.weekday())
+        return fecha_inicio, fecha_inicio + timedelta(days=6)
+    if periodo == 'mes':
+        fecha_inicio = hoy.replace(day=1)
+        return fecha_inicio, (fecha_inicio + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    if periodo == 'trimestre':
+        fecha_inicio = date(hoy.year, 3 * ((hoy.month - 1) // 3) + 1, 1)
+        return fecha_inicio, (fecha_inicio + timedelta(days=92)).replace(day=1) - timedelta(days=1)
+    if periodo == 'anio':
+        return hoy.replace(month=1, day=1), hoy.replace(month=12, day=31)
+    # personalizado
+    return datos['fecha_inicio'] or hoy - timedelta(days=30), datos['fecha_fin'] or hoy
+
+
+def productos_segun(parametros):
+    """(fecha_inicio, fecha_fin, top_n) del reporte de productos más vendidos; sin parámetros, el último mes."""
+    hoy = timezone.localdate()
+    if not parametros:
+        return hoy - timedelta(days=30), hoy, 10
+    form = ReporteProductosForm(parametros)
+    if not form.is_valid():
+        raise ParametrosInvalidos(_errores(form))
+    return (*rango_productos(form.cleaned_data, hoy), form.cleaned_data['top_n'])
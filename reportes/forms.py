@@ -35,6 +35,20 @@ class ReporteInventarioForm(forms.Form):
         initial=False,
         widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
     )
+    fecha_corte = forms.DateField(
+        required=False,
+        label='Stock al',
+        widget=forms.DateInput(attrs={
+            'type': 'date',
+            'class': 'form-control'
+        })
+    )
+
+    def clean_fecha_corte(self):
+        fecha_corte = self.cleaned_data.get('fecha_corte')
+        if fecha_corte and fecha_corte > timezone.localdate():
+            raise ValidationError('La fecha de corte no puede ser futura')
+        return fecha_corte
 
 class ReporteVentasForm(forms.Form):
     fecha_inicio = forms.DateField(
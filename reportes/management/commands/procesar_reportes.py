@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from reportes.trabajos import procesar, tomar_siguiente
+
+
+class Command(BaseCommand):
+    help = ('Worker de reportes en segundo plano: genera los reportes pendientes y guarda sus archivos. '
+            'Se pueden correr varios a la vez; cada reporte lo toma un solo worker.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--una-vez',
+            action='store_true',
+            help='Procesa los reportes pendientes y termina en vez de quedar esperando nuevos.',
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=float,
+            default=5,
+            help='Segundos de espera cuando la cola está vacía (por defecto 5).',
+        )
+
+    def handle(self, *args, **options):
+        procesados = 0
+        try:
+            while True:
+                reporte = tomar_siguiente()
+                if reporte is None:
+                    if options['una_vez']:
+                        break
+                    time.sleep(options['intervalo'])
+                    continue
+
+                procesar(reporte)
+                procesados += 1
+                if reporte.estado == 'completado':
+                    self.stdout.write(f'Reporte {reporte.pk} ({reporte.tipo_reporte}) generado: {reporte.archivo.name}')
+                elif reporte.estado == 'error':
+                    self.stderr.write(f'Reporte {reporte.pk} ({reporte.tipo_reporte}) con error: {reporte.error}')
+                else:
+                    self.stderr.write(f'Reporte {reporte.pk} ({reporte.tipo_reporte}) reasignado: se descartó lo generado')
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f'Se procesaron {procesados} reportes.'))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from reportes.ventas import diferencias, diferencias_productos, reconstruir_ventas, reconstruir_ventas_productos
+
+
+class Command(BaseCommand):
+    help = ('Reconstruye desde las citas completadas y los productos consumidos las ventas diarias '
+            'que usan los reportes de ventas y de productos más vendidos.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verificar',
+            action='store_true',
+            help='Solo compara las ventas diarias con los valores reales, sin modificarlas.',
+        )
+
+    def handle(self, *args, **options):
+        if options['verificar']:
+            filas = diferencias()
+            filas_productos = diferencias_productos()
+            if not filas and not filas_productos:
+                self.stdout.write(self.style.SUCCESS('Las ventas diarias coinciden con las citas.'))
+                return
+            for (fecha, servicio_id, estilista_id), guardado, real in filas:
+                self.stdout.write(self.style.WARNING(
+                    f'{fecha:%d/%m/%Y} servicio={servicio_id} estilista={estilista_id}: '
+                    f'guardado={guardado} real={real}'
+                ))
+            for (fecha, producto_id), guardado, real in filas_productos:
+                self.stdout.write(self.style.WARNING(
+                    f'{fecha:%d/%m/%Y} producto={producto_id}: guardado={guardado} real={real}'
+                ))
+            return
+
+        total = reconstruir_ventas()
+        total_productos = reconstruir_ventas_productos()
+        self.stdout.write(self.style.SUCCESS(
+            f'Se reconstruyeron {total} filas de ventas diarias y {total_productos} de ventas por producto.'
+        ))
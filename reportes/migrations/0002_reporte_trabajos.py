@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:56
+
+import django.core.validators
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reportes', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reporte',
+            name='archivo',
+            field=models.FileField(blank=True, upload_to='reportes/%Y/%m/'),
+        ),
+        migrations.AddField(
+            model_name='reporte',
+            name='error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='reporte',
+            name='estado',
+            field=models.CharField(choices=[('pendiente', 'Pendiente'), ('en_proceso', 'En Proceso'), ('completado', 'Completado'), ('error', 'Error')], default='completado', max_length=15),
+        ),
+        migrations.AddField(
+            model_name='reporte',
+            name='fecha_finalizacion',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='reporte',
+            name='progreso',
+            field=models.PositiveSmallIntegerField(default=0, validators=[django.core.validators.MaxValueValidator(100)]),
+        ),
+        migrations.AlterField(
+            model_name='reporte',
+            name='tipo_reporte',
+            field=models.CharField(choices=[('inventario', 'Reporte de Inventario'), ('ventas', 'Reporte de Ventas'), ('clientes', 'Reporte de Clientes'), ('productos_mas_vendidos', 'Productos Más Vendidos'), ('stock_bajo', 'Productos Bajo Stock Mínimo'), ('citas', 'Exportación de Citas'), ('movimientos', 'Movimientos de Inventario')], max_length=30),
+        ),
+        migrations.AddIndex(
+            model_name='reporte',
+            index=models.Index(fields=['estado', 'fecha_generacion'], name='rep_estado_fecha_idx'),
+        ),
+    ]
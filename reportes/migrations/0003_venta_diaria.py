@@ -0,0 +1,76 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:01
+
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Coalesce, TruncDate
+
+
+def calcular_ventas_diarias(apps, schema_editor):
+    Cita = apps.get_model('servicios', 'Cita')
+    ProductoConsumido = apps.get_model('servicios', 'ProductoConsumido')
+    VentaDiaria = apps.get_model('reportes', 'VentaDiaria')
+    monto = models.DecimalField(max_digits=14, decimal_places=2)
+    cero = Decimal('0')
+
+    ventas = {}
+    citas = Cita.objects.filter(estado='completada').order_by().annotate(
+        fecha=TruncDate('fecha_cita')
+    ).values('fecha', 'servicio_id', 'estilista_id').annotate(
+        citas=Count('id'),
+        ingresos=Coalesce(Sum('precio_final'), cero, output_field=monto),
+        descuentos=Coalesce(Sum('descuento_aplicado'), cero, output_field=monto),
+    )
+    for fila in citas:
+        clave = (fila['fecha'], fila['servicio_id'], fila['estilista_id'])
+        ventas[clave] = {campo: fila[campo] for campo in ('citas', 'ingresos', 'descuentos')}
+        ventas[clave]['productos'] = cero
+
+    consumos = ProductoConsumido.objects.filter(cita__estado='completada').order_by().annotate(
+        fecha=TruncDate('cita__fecha_cita')
+    ).values('fecha', 'cita__servicio_id', 'cita__estilista_id').annotate(
+        productos=Sum(F('cantidad') * F('precio_unitario'), output_field=monto)
+    )
+    for fila in consumos:
+        clave = (fila['fecha'], fila['cita__servicio_id'], fila['cita__estilista_id'])
+        if clave in ventas:
+            ventas[clave]['productos'] = fila['productos']
+
+    VentaDiaria.objects.bulk_create([
+        VentaDiaria(fecha=fecha, servicio_id=servicio_id, estilista_id=estilista_id, **valores)
+        for (fecha, servicio_id, estilista_id), valores in ventas.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('colaboradores', '0003_alter_colaborador_cargo'),
+        ('reportes', '0002_reporte_trabajos'),
+        ('servicios', '0002_cita_indices_fecha'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VentaDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('citas', models.IntegerField(default=0)),
+                ('ingresos', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('descuentos', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('productos', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('estilista', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='colaboradores.colaborador')),
+                ('servicio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='servicios.servicio')),
+            ],
+            options={
+                'verbose_name': 'Venta Diaria',
+                'verbose_name_plural': 'Ventas Diarias',
+                'ordering': ['-fecha'],
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'servicio', 'estilista'), name='rep_venta_diaria_uniq')],
+            },
+        ),
+        migrations.RunPython(calcular_ventas_diarias, migrations.RunPython.noop),
+    ]
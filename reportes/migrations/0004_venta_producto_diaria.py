@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F, Sum
+from django.db.models.functions import TruncDate
+
+
+def calcular_ventas_productos(apps, schema_editor):
+    ProductoConsumido = apps.get_model('servicios', 'ProductoConsumido')
+    VentaProductoDiaria = apps.get_model('reportes', 'VentaProductoDiaria')
+    filas = ProductoConsumido.objects.order_by().annotate(
+        fecha=TruncDate('cita__fecha_cita')
+    ).values('fecha', 'producto_id').annotate(
+        unidades=Sum('cantidad'),
+        total=Sum(F('cantidad') * F('precio_unitario'), output_field=models.DecimalField(max_digits=14, decimal_places=2)),
+    )
+    VentaProductoDiaria.objects.bulk_create([
+        VentaProductoDiaria(fecha=fila['fecha'], producto_id=fila['producto_id'], cantidad=fila['unidades'],
+                            monto=fila['total'])
+        for fila in filas
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0005_terminobusquedaproducto'),
+        ('reportes', '0003_venta_diaria'),
+        ('servicios', '0002_cita_indices_fecha'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VentaProductoDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('cantidad', models.IntegerField(default=0)),
+                ('monto', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='inventario.producto')),
+            ],
+            options={
+                'verbose_name': 'Venta Diaria de Producto',
+                'verbose_name_plural': 'Ventas Diarias de Productos',
+                'ordering': ['-fecha'],
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'producto'), name='rep_venta_producto_uniq')],
+            },
+        ),
+        migrations.RunPython(calcular_ventas_productos, migrations.RunPython.noop),
+    ]
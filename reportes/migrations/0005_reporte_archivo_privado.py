@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:14
+
+import os
+import shutil
+
+import core.almacenamiento
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mover_archivos_existentes(apps, schema_editor):
+    """Saca de MEDIA_ROOT los archivos ya generados, para que dejen de servirse por /media/."""
+    Reporte = apps.get_model('reportes', 'Reporte')
+    for nombre in Reporte.objects.exclude(archivo='').values_list('archivo', flat=True):
+        origen = os.path.join(settings.MEDIA_ROOT, nombre)
+        if not os.path.isfile(origen):
+            continue
+        destino = os.path.join(settings.ARCHIVOS_PRIVADOS_ROOT, nombre)
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        shutil.move(origen, destino)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reportes', '0004_venta_producto_diaria'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='reporte',
+            name='archivo',
+            field=models.FileField(blank=True, storage=core.almacenamiento.AlmacenamientoPrivado(), upload_to='reportes/%Y/%m/'),
+        ),
+        migrations.RunPython(mover_archivos_existentes, migrations.RunPython.noop),
+    ]
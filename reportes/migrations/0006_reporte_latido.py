@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reportes', '0005_reporte_archivo_privado'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reporte',
+            name='fecha_latido',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='reporte',
+            name='intentos',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
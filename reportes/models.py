@@ -1,5 +1,7 @@
 from django.db import models
-from django.core.validators import MinValueValidator
+from django.core.validators import MaxValueValidator, MinValueValidator
+
+from core.almacenamiento import AlmacenamientoPrivado
 
 class Reporte(models.Model):
     TIPO_REPORTE_CHOICES = [
@@ -8,6 +10,17 @@ class Reporte(models.Model):
         ('clientes', 'Reporte de Clientes'),
         ('productos_mas_vendidos', 'Productos Más Vendidos'),
         ('stock_bajo', 'Productos Bajo Stock Mínimo'),
+        ('citas', 'Exportación de Citas'),
+        ('movimientos', 'Movimientos de Inventario'),
+    ]
+    
+    # Los reportes generados dentro de la petición quedan 'completado' al crearse;
+    # los encolados para el worker (`procesar_reportes`) parten en 'pendiente'.
+    ESTADO_CHOICES = [
+        ('pendiente', 'Pendiente'),
+        ('en_proceso', 'En Proceso'),
+        ('completado', 'Completado'),
+        ('error', 'Error'),
     ]
     
     nombre = models.CharField(max_length=100)
@@ -15,14 +28,83 @@ class Reporte(models.Model):
     fecha_generacion = models.DateTimeField(auto_now_add=True)
     parametros = models.JSONField(default=dict, blank=True)  # Para guardar filtros usados
     usuario = models.ForeignKey('auth.User', on_delete=models.CASCADE)
+    estado = models.CharField(max_length=15, choices=ESTADO_CHOICES, default='completado')
+    progreso = models.PositiveSmallIntegerField(default=0, validators=[MaxValueValidator(100)])
+    # Pueden contener datos personales: sólo se descargan con `descargar_reporte`
+    archivo = models.FileField(upload_to='reportes/%Y/%m/', storage=AlmacenamientoPrivado(), blank=True)
+    error = models.TextField(blank=True)
+    fecha_finalizacion = models.DateTimeField(blank=True, null=True)
+    # Último avance informado por el worker; sin avance reciente se considera abandonado
+    fecha_latido = models.DateTimeField(blank=True, null=True)
+    intentos = models.PositiveSmallIntegerField(default=0)
     
     class Meta:
         verbose_name = "Reporte"
         verbose_name_plural = "Reportes"
         ordering = ['-fecha_generacion']
+        indexes = [
+            # Cola del worker: pendientes en orden de llegada
+            models.Index(fields=['estado', 'fecha_generacion'], name='rep_estado_fecha_idx'),
+        ]
     
     def __str__(self):
         return f"{self.nombre} - {self.get_tipo_reporte_display()}"
+    
+    @property
+    def en_curso(self):
+        return self.estado in ('pendiente', 'en_proceso')
+
+
+class VentaDiaria(models.Model):
+    """Ventas de un día (hora local) por servicio y estilista.
+
+    Acumula las citas completadas: cantidad, `precio_final` (ingresos, que
+    incluyen los productos consumidos), `descuento_aplicado` y el subtotal de
+    los productos consumidos. Se mantiene al guardar, completar o eliminar
+    citas y al registrar consumos (ver `reportes.ventas`), y se reconstruye
+    con `python manage.py reconstruir_ventas_diarias`.
+    """
+    fecha = models.DateField()
+    servicio = models.ForeignKey('servicios.Servicio', on_delete=models.CASCADE, related_name='+')
+    estilista = models.ForeignKey('colaboradores.Colaborador', on_delete=models.CASCADE, related_name='+')
+    citas = models.IntegerField(default=0)
+    ingresos = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    descuentos = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    productos = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    
+    class Meta:
+        verbose_name = "Venta Diaria"
+        verbose_name_plural = "Ventas Diarias"
+        ordering = ['-fecha']
+        constraints = [
+            # También sirve de índice para leer un rango de fechas
+            models.UniqueConstraint(fields=['fecha', 'servicio', 'estilista'], name='rep_venta_diaria_uniq'),
+        ]
+    
+    def __str__(self):
+        return f"{self.fecha} - servicio {self.servicio_id} - estilista {self.estilista_id}: {self.citas} citas"
+
+class VentaProductoDiaria(models.Model):
+    """Unidades de un producto consumidas en citas de un día (hora local de la cita).
 
-# No necesitamos más modelos para reportes básicos
-# Los reportes se generarán dinámicamente desde las vistas
\ No newline at end of file
+    Sólo cuenta los `ProductoConsumido`, no el resto de las salidas de
+    inventario (mermas, ajustes). Se mantiene al registrar consumos y al
+    mover o eliminar citas (ver `reportes.ventas`), y se reconstruye con
+    `python manage.py reconstruir_ventas_diarias`.
+    """
+    fecha = models.DateField()
+    producto = models.ForeignKey('inventario.Producto', on_delete=models.CASCADE, related_name='+')
+    cantidad = models.IntegerField(default=0)
+    monto = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    
+    class Meta:
+        verbose_name = "Venta Diaria de Producto"
+        verbose_name_plural = "Ventas Diarias de Productos"
+        ordering = ['-fecha']
+        constraints = [
+            # También sirve de índice para leer un rango de fechas
+            models.UniqueConstraint(fields=['fecha', 'producto'], name='rep_venta_producto_uniq'),
+        ]
+    
+    def __str__(self):
+        return f"{self.fecha} - producto {self.producto_id}: {self.cantidad} unidades"
@@ -0,0 +1,116 @@
+"""Caché de los resultados calculados de los reportes.
+
+Varios usuarios suelen pedir el mismo reporte con los mismos filtros en pocos
+minutos. `en_cache` guarda lo calculado bajo una clave con el tipo de
+reporte, un hash canónico de los parámetros (el `cleaned_data` del
+formulario, con claves ordenadas y fechas en ISO) y las versiones de los
+datos de los que depende (ver `core.versiones`). Guardar o eliminar
+productos, clientes o proveedores y registrar movimientos sube esas
+versiones, de modo que los resultados anteriores dejan de usarse sin
+borrarlos uno por uno.
+
+Los aciertos y fallos se cuentan por tipo de reporte para la página de
+estadísticas de los administradores. Versiones y contadores viven en la
+caché compartida (`CACHES`), así que se ven desde todos los procesos.
+"""
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+
+from clientes.models import Cliente
+from core.versiones import invalidar, version
+from inventario.models import MovimientoInventario, Producto
+from inventario.signals import movimientos_registrados, stock_actualizado
+from proveedores.models import Proveedor
+
+# Segundos máximos que se conserva un resultado en caché
+DURACION_CACHE = 15 * 60
+
+# Datos de los que depende cada reporte
+DEPENDENCIAS = {
+    'inventario': ('reportes:productos', 'reportes:movimientos'),
+    'clientes': ('reportes:clientes',),
+    # Nombre y categoría salen de los productos; las unidades, de las ventas por producto
+    # y las salidas totales, de los movimientos
+    'productos_mas_vendidos': ('reportes:productos', 'reportes:ventas_productos', 'reportes:movimientos'),
+    # Sube al aplicar cambios a las ventas diarias (ver `reportes.ventas`)
+    'ventas': ('reportes:ventas',),
+}
+
+
+def clave_parametros(parametros):
+    """Hash estable de `parametros`: no depende del orden de las claves ni del tipo de fecha."""
+    canonico = json.dumps(parametros, sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.sha256(canonico.encode()).hexdigest()[:32]
+
+
+def _contar(tipo_reporte, resultado):
+    clave = f'reportes:cache:{resultado}:{tipo_reporte}'
+    try:
+        cache.incr(clave)
+    except ValueError:
+        cache.add(clave, 1, None)
+
+
+def en_cache(tipo_reporte, parametros, calcular):
+    """Resultado del reporte `tipo_reporte` con `parametros`, calculándolo con `calcular()` si no está en caché."""
+    versiones = ':'.join(str(version(nombre)) for nombre in DEPENDENCIAS[tipo_reporte])
+    clave = f'reportes:resultado:{tipo_reporte}:{versiones}:{clave_parametros(parametros)}'
+    valor = cache.get(clave)
+    if valor is None:
+        _contar(tipo_reporte, 'fallos')
+        valor = calcular()
+        cache.set(clave, valor, DURACION_CACHE)
+    else:
+        _contar(tipo_reporte, 'aciertos')
+    return valor
+
+
+def estadisticas():
+    """Aciertos, fallos y porcentaje de aciertos de la caché por tipo de reporte."""
+    filas = []
+    for tipo_reporte in DEPENDENCIAS:
+        aciertos = cache.get(f'reportes:cache:aciertos:{tipo_reporte}', 0)
+        fallos = cache.get(f'reportes:cache:fallos:{tipo_reporte}', 0)
+        total = aciertos + fallos
+        filas.append({
+            'tipo_reporte': tipo_reporte,
+            'aciertos': aciertos,
+            'fallos': fallos,
+            'total': total,
+            'porcentaje_aciertos': round(aciertos * 100 / total, 1) if total else None,
+        })
+    return filas
+
+
+def reiniciar_estadisticas():
+    cache.delete_many([
+        f'reportes:cache:{resultado}:{tipo_reporte}'
+        for tipo_reporte in DEPENDENCIAS for resultado in ('aciertos', 'fallos')
+    ])
+
+
+def _invalidar(nombre):
+    def receptor(sender, **kwargs):
+        invalidar(nombre)
+    return receptor
+
+
+_invalidar_productos = _invalidar('reportes:productos')
+_invalidar_clientes = _invalidar('reportes:clientes')
+_invalidar_movimientos = _invalidar('reportes:movimientos')
+
+post_save.connect(_invalidar_productos, sender=Producto, dispatch_uid='reportes_producto_guardado')
+post_delete.connect(_invalidar_productos, sender=Producto, dispatch_uid='reportes_producto_eliminado')
+stock_actualizado.connect(_invalidar_productos, dispatch_uid='reportes_stock_actualizado')
+# El reporte muestra el nombre del proveedor, y al eliminarlo sus productos quedan
+# sin proveedor (SET_NULL) sin guardar cada Producto
+post_save.connect(_invalidar_productos, sender=Proveedor, dispatch_uid='reportes_proveedor_guardado')
+post_delete.connect(_invalidar_productos, sender=Proveedor, dispatch_uid='reportes_proveedor_eliminado')
+post_save.connect(_invalidar_clientes, sender=Cliente, dispatch_uid='reportes_cliente_guardado')
+post_delete.connect(_invalidar_clientes, sender=Cliente, dispatch_uid='reportes_cliente_eliminado')
+# Los movimientos sólo se eliminan al archivarlos, lo que no cambia los totales de los reportes
+post_save.connect(_invalidar_movimientos, sender=MovimientoInventario, dispatch_uid='reportes_movimiento_guardado')
+movimientos_registrados.connect(_invalidar_movimientos, dispatch_uid='reportes_movimientos_registrados')
@@ -9,3 +9,12 @@ def multiply(value, arg):
         return float(value) * float(arg)
     except (ValueError, TypeError):
         return 0
+
+
+@register.filter(name='get_item')
+def get_item(diccionario, clave):
+    """Obtiene el valor de un diccionario por clave"""
+    try:
+        return diccionario.get(clave, 0)
+    except AttributeError:
+        return 0
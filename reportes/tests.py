@@ -1,3 +1,387 @@
-from django.test import TestCase
+import csv
+import io
+import os
+import shutil
+import tempfile
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import F
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from clientes.models import Cliente
+from colaboradores.models import Colaborador
+from inventario.archivo import MESES_RETENCION_MINIMO, archivar_movimientos
+from inventario.models import MovimientoInventario, Producto, ResumenMensualMovimiento
+from proveedores.models import Proveedor
+from servicios.consumo import registrar_consumo
+from servicios.models import Cita, ProductoConsumido, Servicio
+from servicios.registro import registrar_citas
+
+from .exportacion import BOM
+from .models import Reporte, VentaDiaria, VentaProductoDiaria
+from .resultados import clave_parametros, en_cache, estadisticas
+from .trabajos import procesar, tomar_siguiente
+from .ventas import diferencias, diferencias_productos, productos_mas_vendidos, reconstruir_ventas
+
+
+class ExportarCsvTest(TestCase):
+    """Exportaciones CSV por streaming."""
+
+    @classmethod
+    def setUpTestData(cls):
+        proveedor = Proveedor.objects.create(
+            rut='76123456-7', nombre_empresa='Distribuidora Sur', nombre_contacto='Ana',
+            email='ventas@sur.cl', telefono='221234567', direccion='Calle 1', productos_que_suministra='Champú',
+        )
+        for i in range(30):
+            Producto.objects.create(
+                nombre=f'Producto {i:02d}', categoria='champu', precio_costo=Decimal('1000'),
+                precio_venta=Decimal('2000'), stock_actual=i, stock_minimo=5,
+                proveedor=proveedor if i % 2 else None,
+            )
+        cls.usuario = User.objects.create_superuser('admin', password='x')
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+
+    def descargar(self, url):
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(url)
+            contenido = b''.join(response.streaming_content).decode('utf-8')
+        selects = [q['sql'] for q in consultas if q['sql'].startswith('SELECT') and 'inventario_producto' in q['sql']]
+        return response, contenido, selects
+
+    def test_inventario_en_streaming_con_proveedor_en_una_consulta(self):
+        response, contenido, selects = self.descargar(reverse('reportes:exportar_inventario_csv'))
+
+        self.assertTrue(response.streaming)
+        self.assertTrue(contenido.startswith(BOM))
+        filas = list(csv.reader(io.StringIO(contenido[len(BOM):])))
+        self.assertEqual(filas[0][6], 'Proveedor')
+        self.assertEqual(len(filas), 31)
+        self.assertEqual(filas[1][:7], ['Producto 00', 'champu', '1000.00', '2000.00', '0', '5', ''])
+        self.assertEqual(filas[2][6], 'Distribuidora Sur')
+        self.assertEqual(len(selects), 1)
+
+    def test_inventario_aplica_los_filtros_del_reporte(self):
+        url = reverse('reportes:exportar_inventario_csv') + '?tipo_reporte=bajo_minimo&categoria='
+        _, contenido, _ = self.descargar(url)
+
+        filas = list(csv.reader(io.StringIO(contenido[len(BOM):])))
+        self.assertEqual([fila[0] for fila in filas[1:]], [f'Producto {i:02d}' for i in range(6)])
+
+    def test_lee_por_lotes_siguiendo_a_la_ultima_fila(self):
+        with mock.patch('reportes.exportacion.TAMANO_LOTE', 7):
+            _, contenido, selects = self.descargar(reverse('reportes:exportar_inventario_csv'))
+
+        filas = list(csv.reader(io.StringIO(contenido[len(BOM):])))
+        self.assertEqual([fila[0] for fila in filas[1:]], [f'Producto {i:02d}' for i in range(30)])
+        self.assertEqual(len(selects), 5)
+        self.assertNotIn('OFFSET', selects[-1].upper())
+
+    def test_rango_de_fechas_invalido_no_exporta_todo(self):
+        url = reverse('reportes:exportar_movimientos_csv')
+        for parametros in ('?fecha_inicio=2030-06-30&fecha_fin=2030-06-01', '?fecha_inicio=2030-06-01',
+                           '?fecha_inicio=2028-01-01&fecha_fin=2030-01-01', '?fecha_inicio=ayer&fecha_fin=hoy'):
+            self.assertEqual(self.client.get(url + parametros).status_code, 400, parametros)
+        self.assertEqual(self.client.get(url + '?fecha_inicio=&fecha_fin=').status_code, 200)
+
+        response = self.client.post(reverse('reportes:encolar_reporte', args=['citas']) + '?fecha_fin=2030-06-01')
+        self.assertRedirects(response, reverse('reportes:historial_reportes'))
+        self.assertFalse(Reporte.objects.exists())
+
+
+class ReporteEnSegundoPlanoTest(TestCase):
+    """Cola de reportes procesada por el comando `procesar_reportes`."""
+
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(3):
+            Producto.objects.create(
+                nombre=f'Producto {i}', categoria='champu', precio_costo=Decimal('1000'),
+                precio_venta=Decimal('2000'), stock_actual=i * 10, stock_minimo=5,
+            )
+        cls.usuario = User.objects.create_superuser('admin', password='x')
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+        self.privado = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.privado, ignore_errors=True)
+        ajustes = override_settings(ARCHIVOS_PRIVADOS_ROOT=self.privado)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    def test_encola_procesa_y_descarga(self):
+        url = reverse('reportes:encolar_reporte', args=['inventario']) + '?tipo_reporte=bajo_minimo'
+        self.assertRedirects(self.client.post(url), reverse('reportes:historial_reportes'))
+        reporte = Reporte.objects.get(estado='pendiente')
+        self.assertEqual(reporte.parametros, {'tipo_reporte': 'bajo_minimo'})
+
+        call_command('procesar_reportes', '--una-vez', stdout=io.StringIO())
+
+        estado = self.client.get(reverse('reportes:estado_reporte', args=[reporte.pk])).json()
+        self.assertEqual((estado['estado'], estado['progreso']), ('completado', 100))
+        response = self.client.get(estado['descarga'])
+        contenido = b''.join(response.streaming_content).decode('utf-8')
+        filas = list(csv.reader(io.StringIO(contenido[len(BOM):])))
+        self.assertEqual([fila[0] for fila in filas[1:]], ['Producto 0'])
+        self.assertIsNone(tomar_siguiente())
+        reporte.refresh_from_db()
+        # Fuera de MEDIA_ROOT: no se puede descargar por /media/ sin pasar por la vista
+        self.assertTrue(reporte.archivo.path.startswith(self.privado))
+        self.assertFalse(reporte.archivo.path.startswith(settings.MEDIA_ROOT))
+
+    def test_reporte_abandonado_vuelve_a_la_cola(self):
+        hace_rato = timezone.now() - timedelta(hours=1)
+        abandonado = Reporte.objects.create(nombre='Inventario', tipo_reporte='inventario', usuario=self.usuario,
+                                            estado='en_proceso', fecha_latido=hace_rato, intentos=1)
+        agotado = Reporte.objects.create(nombre='Clientes', tipo_reporte='clientes', usuario=self.usuario,
+                                         estado='en_proceso', fecha_latido=hace_rato, intentos=3)
+
+        self.assertEqual(tomar_siguiente(), abandonado)
+
+        abandonado.refresh_from_db()
+        agotado.refresh_from_db()
+        self.assertEqual((abandonado.estado, abandonado.intentos), ('en_proceso', 2))
+        self.assertEqual(agotado.estado, 'error')
+        self.assertIsNone(tomar_siguiente())
+
+    def test_tipo_sin_exportacion_no_se_encola(self):
+        response = self.client.post(reverse('reportes:encolar_reporte', args=['pronostico']))
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(Reporte.objects.exists())
+
+    def test_reportes_agregados_en_segundo_plano(self):
+        hoy = timezone.localdate()
+        VentaProductoDiaria.objects.create(fecha=hoy, producto=Producto.objects.get(nombre='Producto 1'),
+                                           cantidad=4, monto=Decimal('8000'))
+        url = reverse('reportes:encolar_reporte', args=['productos_mas_vendidos'])
+        self.client.post(url + '?periodo=hoy&top_n=5')
+        self.client.post(reverse('reportes:encolar_reporte', args=['ventas']) + '?fecha_inicio=2030-02-01')
+        reporte = Reporte.objects.get()
+        self.assertEqual(reporte.parametros, {'periodo': 'hoy', 'top_n': '5'})
+
+        call_command('procesar_reportes', '--una-vez', stdout=io.StringIO())
+
+        reporte.refresh_from_db()
+        self.assertEqual(reporte.estado, 'completado')
+        with reporte.archivo.open('rb') as archivo:
+            filas = list(csv.reader(io.StringIO(archivo.read().decode('utf-8')[len(BOM):])))
+        producto, categoria, unidades, monto, salidas = filas[1]
+        self.assertEqual((producto, categoria, unidades, Decimal(monto), salidas),
+                         ('Producto 1', 'champu', '4', Decimal('8000'), '0'))
+
+    def test_worker_reasignado_no_pisa_el_reporte(self):
+        Reporte.objects.create(nombre='Inventario', tipo_reporte='inventario', usuario=self.usuario,
+                               estado='pendiente')
+        reporte = tomar_siguiente()
+        # Otro worker lo tomó después de darlo por abandonado
+        Reporte.objects.filter(pk=reporte.pk).update(intentos=F('intentos') + 1)
+
+        procesar(reporte)
+
+        reporte.refresh_from_db()
+        self.assertEqual((reporte.estado, reporte.archivo.name), ('en_proceso', ''))
+        self.assertEqual(os.listdir(self.privado), [])
+
+
+class ResultadosEnCacheTest(TestCase):
+    """Caché de resultados de reportes por tipo, parámetros y versión de los datos."""
+
+    def setUp(self):
+        cache.clear()
+        self.calculos = 0
+
+    def calcular(self):
+        self.calculos += 1
+        return Cliente.objects.count()
+
+    def test_clave_no_depende_del_orden_de_los_parametros(self):
+        self.assertEqual(
+            clave_parametros({'tipo_reporte': 'activos', 'desde': date(2030, 1, 1)}),
+            clave_parametros({'desde': date(2030, 1, 1), 'tipo_reporte': 'activos'}),
+        )
+        self.assertNotEqual(clave_parametros({'top_n': 10}), clave_parametros({'top_n': 20}))
+
+    def test_reutiliza_hasta_que_cambian_los_datos(self):
+        parametros = {'tipo_reporte': 'todos', 'ordenar_por': 'nombre'}
+        self.assertEqual(en_cache('clientes', parametros, self.calcular), 0)
+        self.assertEqual(en_cache('clientes', dict(reversed(parametros.items())), self.calcular), 0)
+        self.assertEqual(self.calculos, 1)
+
+        # La versión sube al confirmarse la transacción
+        with self.captureOnCommitCallbacks(execute=True):
+            Cliente.objects.create(rut='11111111-1', nombre='Ana', apellido='Prueba',
+                                   fecha_nacimiento=date(1990, 1, 1))
+            self.assertEqual(en_cache('clientes', parametros, self.calcular), 0)
+        self.assertEqual(en_cache('clientes', parametros, self.calcular), 1)
+        self.assertEqual(self.calculos, 2)
+
+        fila = next(fila for fila in estadisticas() if fila['tipo_reporte'] == 'clientes')
+        self.assertEqual((fila['aciertos'], fila['fallos']), (2, 2))
+
+    def test_cambios_de_proveedor_invalidan_los_productos(self):
+        proveedor = Proveedor.objects.create(
+            rut='76123456-7', nombre_empresa='Distribuidora Sur', nombre_contacto='Ana',
+            email='ventas@sur.cl', telefono='221234567', direccion='Calle 1', productos_que_suministra='Champú',
+        )
+        parametros = {'proveedor': proveedor.pk}
+        en_cache('inventario', parametros, self.calcular)
+        with self.captureOnCommitCallbacks(execute=True):
+            proveedor.nombre_empresa = 'Distribuidora Norte'
+            proveedor.save()
+        en_cache('inventario', parametros, self.calcular)
+        self.assertEqual(self.calculos, 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            proveedor.delete()
+        en_cache('inventario', parametros, self.calcular)
+        self.assertEqual(self.calculos, 3)
+
+
+class VentasDiariasTest(TestCase):
+    """Ventas diarias mantenidas al guardar citas y consumos, y el reporte que las lee."""
+
+    def setUp(self):
+        cache.clear()
+        self.usuario = User.objects.create_user('recepcion', password='x')
+        self.cliente = Cliente.objects.create(rut='11111111-1', nombre='Ana', apellido='Pérez',
+                                              fecha_nacimiento=date(1990, 1, 1))
+        self.luz, self.sol = [
+            Colaborador.objects.create(rut=rut, nombre=nombre, apellido='Soto', email=f'{nombre}@example.com',
+                                       telefono='123', cargo='estilista', fecha_contratacion=date(2020, 1, 1),
+                                       sueldo=Decimal('500000'))
+            for rut, nombre in (('22222222-2', 'Luz'), ('33333333-3', 'Sol'))
+        ]
+        self.corte = Servicio.objects.create(nombre='Corte', categoria='corte', precio_base=Decimal('10000'))
+        self.champu = Producto.objects.create(nombre='Champú', categoria='champu', precio_costo=Decimal('1000'),
+                                              precio_venta=Decimal('2000'), stock_actual=10, stock_minimo=1)
+        self.fecha = timezone.make_aware(datetime(2030, 6, 1, 10))
+
+    def fila(self, estilista=None):
+        return VentaDiaria.objects.filter(fecha=date(2030, 6, 1), estilista=estilista or self.luz).first()
+
+    def test_sigue_a_las_citas_y_sus_consumos(self):
+        cita = Cita.objects.create(cliente=self.cliente, servicio=self.corte, estilista=self.luz,
+                                   fecha_cita=self.fecha)
+        self.assertFalse(VentaDiaria.objects.exists())
+
+        cita.estado = 'completada'
+        cita.save()
+        self.assertEqual((self.fila().citas, self.fila().ingresos), (1, Decimal('10000')))
+
+        registrar_consumo(cita, [(self.champu.pk, 2)], self.usuario)
+        self.assertEqual((self.fila().ingresos, self.fila().productos), (Decimal('14000'), Decimal('4000')))
+
+        cita.refresh_from_db()
+        cita.estilista = self.sol
+        cita.save()
+        self.assertIsNone(self.fila())
+        self.assertEqual(self.fila(self.sol).productos, Decimal('4000'))
+
+        # Más tarde el mismo día: a la misma hora chocaría con la cita de Sol
+        registrar_citas(self.cliente, [self.corte], self.sol, self.fecha + timedelta(hours=1))
+        self.assertEqual(self.fila(self.sol).citas, 2)
+        self.assertEqual(diferencias(), [])
+
+        cita.delete()
+        self.assertEqual((self.fila(self.sol).citas, self.fila(self.sol).productos), (1, Decimal('0')))
+        self.assertEqual(diferencias(), [])
+
+    def test_sigue_los_productos_consumidos_por_dia(self):
+        cita = Cita.objects.create(cliente=self.cliente, servicio=self.corte, estilista=self.luz,
+                                   fecha_cita=self.fecha)
+        registrar_consumo(cita, [(self.champu.pk, 2)], self.usuario)
+        consumo = ProductoConsumido(cita=cita, producto=self.champu, cantidad=1)
+        consumo.suppress_movimiento = True
+        consumo.save()
+        self.assertEqual(productos_mas_vendidos(date(2030, 6, 1), date(2030, 6, 1), 5)[0]['total_vendido'], 3)
+
+        cita.refresh_from_db()
+        cita.fecha_cita = self.fecha + timedelta(days=1)
+        cita.save()
+        self.assertEqual(productos_mas_vendidos(date(2030, 6, 1), date(2030, 6, 1), 5), [])
+        self.assertEqual(
+            VentaProductoDiaria.objects.get(fecha=date(2030, 6, 2)).monto, Decimal('6000')
+        )
+        self.assertEqual(diferencias_productos(), [])
+
+        cita.delete()
+        self.assertFalse(VentaProductoDiaria.objects.exists())
+
+    def test_top_n_no_cuenta_otras_salidas(self):
+        self.usuario.is_superuser = True
+        self.usuario.save()
+        self.client.force_login(self.usuario)
+        tinte = Producto.objects.create(nombre='Tinte', categoria='tinte', precio_costo=Decimal('1000'),
+                                        precio_venta=Decimal('5000'), stock_actual=10, stock_minimo=1)
+        cita = Cita.objects.create(cliente=self.cliente, servicio=self.corte, estilista=self.luz,
+                                   fecha_cita=timezone.now())
+        registrar_consumo(cita, [(self.champu.pk, 1), (tinte.pk, 3)], self.usuario)
+        MovimientoInventario.objects.create(producto=self.champu, tipo_movimiento='salida', cantidad=5,
+                                            motivo='Merma', usuario=self.usuario)
+
+        respuesta = self.client.get(reverse('reportes:reporte_productos_mas_vendidos'),
+                                    {'periodo': 'hoy', 'top_n': 5})
+
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(
+            [(fila['producto__nombre'], fila['total_vendido']) for fila in respuesta.context['productos_vendidos']],
+            [('Tinte', 3), ('Champú', 1)],
+        )
+
+    def test_archivar_movimientos_no_cambia_los_mas_vendidos(self):
+        hace_un_anio = timezone.now() - timedelta(days=365)
+        cita = Cita.objects.create(cliente=self.cliente, servicio=self.corte, estilista=self.luz,
+                                   fecha_cita=hace_un_anio)
+        registrar_consumo(cita, [(self.champu.pk, 2)], self.usuario)
+        MovimientoInventario.objects.update(fecha_movimiento=hace_un_anio)
+        dia = timezone.localdate(hace_un_anio)
+        antes = productos_mas_vendidos(dia, dia, 5)
+
+        archivar_movimientos(MESES_RETENCION_MINIMO)
+
+        self.assertFalse(MovimientoInventario.objects.exists())
+        self.assertEqual(ResumenMensualMovimiento.objects.get(producto=self.champu).cantidad, 2)
+        self.assertEqual(productos_mas_vendidos(dia, dia, 5), antes)
+        self.assertEqual(antes[0]['total_vendido'], 2)
+
+    def test_salidas_combinan_movimientos_archivados_y_vigentes(self):
+        hace_un_anio = timezone.now() - timedelta(days=365)
+        cita = Cita.objects.create(cliente=self.cliente, servicio=self.corte, estilista=self.luz,
+                                   fecha_cita=hace_un_anio)
+        registrar_consumo(cita, [(self.champu.pk, 2)], self.usuario)
+        MovimientoInventario.objects.update(fecha_movimiento=hace_un_anio)
+        archivar_movimientos(MESES_RETENCION_MINIMO)
+        MovimientoInventario.objects.create(producto=self.champu, tipo_movimiento='salida', cantidad=3,
+                                            motivo='Merma', usuario=self.usuario)
+
+        fila, = productos_mas_vendidos(timezone.localdate(hace_un_anio), timezone.localdate(), 5)
+
+        self.assertEqual((fila['total_vendido'], fila['salidas']), (2, 5))
+
+    def test_reporte_lee_las_ventas_diarias(self):
+        self.usuario.is_superuser = True
+        self.usuario.save()
+        self.client.force_login(self.usuario)
+        registrar_citas(self.cliente, [self.corte], self.luz, self.fecha)
+        VentaDiaria.objects.all().delete()
+        self.assertEqual(reconstruir_ventas(), 1)
+
+        respuesta = self.client.get(reverse('reportes:reporte_ventas'),
+                                    {'fecha_inicio': '2030-06-01', 'fecha_fin': '2030-06-30'})
+
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.context['totales']['citas'], 1)
+        self.assertEqual(respuesta.context['por_estilista'][0]['ingresos'], Decimal('10000'))
+        self.assertTrue(Reporte.objects.filter(tipo_reporte='ventas').exists())
@@ -0,0 +1,148 @@
+"""Cola de reportes en segundo plano, guardada en la tabla de `Reporte`.
+
+Una vista encola el reporte con `encolar` (estado 'pendiente') y responde de
+inmediato. El comando `procesar_reportes` toma los pendientes con
+`select_for_update(skip_locked=True)`, de modo que varios workers pueden
+correr a la vez sin tomar el mismo reporte, escribe el CSV en un archivo
+temporal informando el avance y lo guarda en `Reporte.archivo`.
+
+Cada avance actualiza `fecha_latido`. Un reporte 'en_proceso' sin avance en
+`TIEMPO_SIN_AVANCE` (worker detenido a mitad del trabajo) vuelve a la cola,
+hasta `MAX_INTENTOS` veces; después queda con error. El número de intento
+identifica al worker dueño del reporte: los avances y el resultado sólo se
+guardan si el reporte sigue 'en_proceso' en ese mismo intento, así que un
+worker lento cuyo reporte fue devuelto a la cola se detiene sin pisar el
+trabajo del que lo tomó después.
+"""
+import logging
+import os
+import tempfile
+from datetime import timedelta
+
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .exportacion import EXPORTACIONES, contar, escribir_csv
+from .models import Reporte
+
+logger = logging.getLogger(__name__)
+
+TIEMPO_SIN_AVANCE = timedelta(minutes=10)
+MAX_INTENTOS = 3
+
+
+def encolar(tipo_reporte, parametros, usuario):
+    """Crea el reporte pendiente de tipo `tipo_reporte` con los parámetros de la URL."""
+    if tipo_reporte not in EXPORTACIONES:
+        raise ValueError(f'No hay exportación en segundo plano para {tipo_reporte!r}')
+    reporte = Reporte(
+        tipo_reporte=tipo_reporte,
+        usuario=usuario,
+        parametros={clave: valor for clave, valor in parametros.items() if valor},
+        estado='pendiente',
+    )
+    reporte.nombre = f"{reporte.get_tipo_reporte_display()} - {timezone.localtime():%Y-%m-%d %H:%M}"
+    reporte.save()
+    return reporte
+
+
+def liberar_abandonados():
+    """Devuelve a la cola (o marca con error) los reportes 'en_proceso' sin avance reciente."""
+    limite = timezone.now() - TIEMPO_SIN_AVANCE
+    abandonados = Reporte.objects.filter(
+        Q(fecha_latido__lt=limite) | Q(fecha_latido__isnull=True, fecha_generacion__lt=limite),
+        estado='en_proceso',
+    )
+    agotados = abandonados.filter(intentos__gte=MAX_INTENTOS).update(
+        estado='error', error='El worker dejó de responder mientras generaba el reporte.',
+        fecha_finalizacion=timezone.now(),
+    )
+    return agotados + abandonados.update(estado='pendiente', progreso=0)
+
+
+def tomar_siguiente():
+    """Marca 'en_proceso' y devuelve el pendiente más antiguo, o None si la cola está vacía.
+
+    Las filas bloqueadas por otro worker se saltan en vez de esperar.
+    """
+    liberar_abandonados()
+    with transaction.atomic():
+        reporte = (
+            Reporte.objects.select_for_update(skip_locked=True)
+            .filter(estado='pendiente')
+            .order_by('fecha_generacion', 'pk')
+            .first()
+        )
+        if reporte is None:
+            return None
+        reporte.estado = 'en_proceso'
+        reporte.progreso = 0
+        reporte.fecha_latido = timezone.now()
+        reporte.intentos += 1
+        reporte.save(update_fields=['estado', 'progreso', 'fecha_latido', 'intentos'])
+    return reporte
+
+
+class ReporteReasignado(Exception):
+    """El reporte volvió a la cola (o lo tomó otro worker) mientras se generaba."""
+
+
+def _del_intento(reporte):
+    return Reporte.objects.filter(pk=reporte.pk, estado='en_proceso', intentos=reporte.intentos)
+
+
+def _actualizar_progreso(reporte, progreso):
+    if not _del_intento(reporte).update(progreso=progreso, fecha_latido=timezone.now()):
+        raise ReporteReasignado(reporte.pk)
+
+
+def procesar(reporte):
+    """Genera el archivo del reporte `reporte` (ya tomado con `tomar_siguiente`).
+
+    Los errores quedan en el reporte (estado 'error') en vez de propagarse,
+    para que el worker siga con el resto de la cola. Si el reporte fue
+    reasignado, se descarta lo generado y se deja como está.
+    """
+    try:
+        exportacion = EXPORTACIONES[reporte.tipo_reporte]
+        # Latido antes de contar: en tablas grandes el conteo puede tardar
+        _actualizar_progreso(reporte, 0)
+        consulta = exportacion.consulta(reporte.parametros)
+        total = contar(consulta)
+        _actualizar_progreso(reporte, 0)
+
+        with tempfile.NamedTemporaryFile('w+', encoding='utf-8', newline='', suffix='.csv', delete=False) as temporal:
+            try:
+                escribir_csv(
+                    temporal, exportacion.columnas, consulta,
+                    al_avanzar=lambda filas: _actualizar_progreso(reporte, min(99, filas * 100 // max(total, 1))),
+                )
+                temporal.flush()
+                nombre, extension = os.path.splitext(exportacion.archivo)
+                with open(temporal.name, 'rb') as contenido:
+                    reporte.archivo.save(f'{nombre}_{reporte.pk}_{reporte.intentos}{extension}', File(contenido),
+                                         save=False)
+            finally:
+                os.unlink(temporal.name)
+    except ReporteReasignado:
+        logger.warning('El reporte %s fue reasignado mientras se generaba; se descarta', reporte.pk)
+        return reporte
+    except Exception as error:
+        logger.exception('Error al generar el reporte %s', reporte.pk)
+        campos = {'estado': 'error', 'error': str(error) or error.__class__.__name__}
+    else:
+        campos = {'estado': 'completado', 'progreso': 100, 'archivo': reporte.archivo.name}
+    campos['fecha_finalizacion'] = timezone.now()
+
+    # Sólo si el reporte sigue siendo de este intento
+    if not _del_intento(reporte).update(**campos):
+        logger.warning('El reporte %s fue reasignado mientras se generaba; se descarta', reporte.pk)
+        if reporte.archivo:
+            reporte.archivo.delete(save=False)
+        return reporte
+    for campo, valor in campos.items():
+        if campo != 'archivo':
+            setattr(reporte, campo, valor)
+    return reporte
@@ -7,9 +7,18 @@ urlpatterns = [
     path('', views.reportes_principal, name='reportes_principal'),
     path('inventario/', views.reporte_inventario, name='reporte_inventario'),
     path('clientes/', views.reporte_clientes, name='reporte_clientes'),
+    path('ventas/', views.reporte_ventas, name='reporte_ventas'),
     path('productos-mas-vendidos/', views.reporte_productos_mas_vendidos, name='reporte_productos_mas_vendidos'),
     path('stock-bajo/', views.reporte_stock_bajo, name='reporte_stock_bajo'),
+    path('pronostico-stock/', views.reporte_pronostico_stock, name='reporte_pronostico_stock'),
     path('historial/', views.historial_reportes, name='historial_reportes'),
+    path('cache/', views.estadisticas_cache, name='estadisticas_cache'),
+    path('trabajos/<str:tipo>/encolar/', views.encolar_reporte, name='encolar_reporte'),
+    path('trabajos/<int:pk>/estado/', views.estado_reporte, name='estado_reporte'),
+    path('trabajos/<int:pk>/descargar/', views.descargar_reporte, name='descargar_reporte'),
     path('exportar/inventario/csv/', views.exportar_inventario_csv, name='exportar_inventario_csv'),
+    path('exportar/clientes/csv/', views.exportar_clientes_csv, name='exportar_clientes_csv'),
+    path('exportar/citas/csv/', views.exportar_citas_csv, name='exportar_citas_csv'),
+    path('exportar/movimientos/csv/', views.exportar_movimientos_csv, name='exportar_movimientos_csv'),
     path('exportar/inventario/pdf/', views.exportar_inventario_pdf, name='exportar_inventario_pdf'),
 ]
\ No newline at end of file
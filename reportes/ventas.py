@@ -0,0 +1,357 @@
+"""Mantenimiento incremental de las ventas diarias (`VentaDiaria`).
+
+Cada cita completada aporta a la fila de su día local, servicio y
+estilista: una cita, su `precio_final`, su `descuento_aplicado` y el
+subtotal de sus productos consumidos. Al guardar o eliminar una cita se
+aplica la diferencia entre el aporte anterior y el nuevo (completarla,
+cancelarla o moverla de día o de estilista), de modo que el reporte de
+ventas de un año lee unas 365 × k filas en lugar de recorrer las citas.
+
+Los consumos llegan por `post_save`/`post_delete` de `ProductoConsumido` y
+por `servicios.signals.consumos_registrados` (registro en bloque); las citas
+insertadas en bloque, por `citas_registradas`. Las operaciones masivas que no
+disparan señales (`QuerySet.update`) pueden desviar los totales; se corrigen
+con `python manage.py reconstruir_ventas_diarias`.
+
+Los consumos además suman unidades y monto a `VentaProductoDiaria`, por día
+de la cita y producto, de la que lee el reporte de productos más vendidos
+sin recorrer los movimientos de inventario.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.utils import timezone
+
+from core.versiones import invalidar
+from inventario.archivo import cantidades_por_producto
+from servicios.models import Cita, ProductoConsumido
+from servicios.signals import citas_registradas, consumos_registrados
+
+from .models import VentaDiaria, VentaProductoDiaria
+
+VERSION = 'reportes:ventas'
+VERSION_PRODUCTOS = 'reportes:ventas_productos'
+CAMPOS_CITA = ('estado', 'fecha_cita', 'servicio_id', 'estilista_id', 'precio_final', 'descuento_aplicado')
+VALORES = ('citas', 'ingresos', 'descuentos', 'productos')
+VALORES_PRODUCTO = ('cantidad', 'monto')
+CERO = Decimal('0')
+
+
+def _clave(datos):
+    """(día local, servicio, estilista) de una cita."""
+    return timezone.localdate(datos['fecha_cita']), datos['servicio_id'], datos['estilista_id']
+
+
+def _aportes(datos, productos=CERO):
+    """Aporte de una cita (sus `CAMPOS_CITA`) a las ventas diarias."""
+    if not datos or datos['estado'] != 'completada':
+        return {}
+    return {_clave(datos): {
+        'citas': 1,
+        'ingresos': datos['precio_final'] or CERO,
+        'descuentos': datos['descuento_aplicado'] or CERO,
+        'productos': productos,
+    }}
+
+
+def _sumar(totales, aportes, signo=1):
+    for clave, valores in aportes.items():
+        acumulado = totales.setdefault(clave, {})
+        for campo, valor in valores.items():
+            acumulado[campo] = acumulado.get(campo, 0) + signo * valor
+    return totales
+
+
+def aplicar_deltas(deltas):
+    """Suma cada delta a su fila de `VentaDiaria`, creándola si no existe."""
+    aplicados = False
+    for (fecha, servicio_id, estilista_id), valores in deltas.items():
+        valores = {campo: valor for campo, valor in valores.items() if valor}
+        if not valores:
+            continue
+        aplicados = True
+        filas = VentaDiaria.objects.filter(fecha=fecha, servicio_id=servicio_id, estilista_id=estilista_id)
+        if not filas.update(**{campo: F(campo) + valor for campo, valor in valores.items()}):
+            _, creada = VentaDiaria.objects.get_or_create(
+                fecha=fecha, servicio_id=servicio_id, estilista_id=estilista_id, defaults=valores
+            )
+            if not creada:
+                filas.update(**{campo: F(campo) + valor for campo, valor in valores.items()})
+        if valores.get('citas', 0) < 0:
+            # Sin citas completadas la fila no aporta nada al reporte
+            filas.filter(citas=0).delete()
+    if aplicados:
+        invalidar(VERSION)
+
+
+def aplicar_deltas_productos(deltas):
+    """Suma cada delta a su fila de `VentaProductoDiaria`, creándola si no existe."""
+    aplicados = False
+    for (fecha, producto_id), valores in deltas.items():
+        if not valores.get('cantidad'):
+            continue
+        aplicados = True
+        filas = VentaProductoDiaria.objects.filter(fecha=fecha, producto_id=producto_id)
+        cambios = {campo: F(campo) + valor for campo, valor in valores.items()}
+        if valores['cantidad'] < 0:
+            # Si la fila ya no existe (producto eliminado en cascada) no hay nada que descontar
+            filas.update(**cambios)
+            filas.filter(cantidad__lte=0).delete()
+        elif not filas.update(**cambios):
+            _, creada = VentaProductoDiaria.objects.get_or_create(
+                fecha=fecha, producto_id=producto_id, defaults=valores
+            )
+            if not creada:
+                filas.update(**cambios)
+    if aplicados:
+        invalidar(VERSION_PRODUCTOS)
+
+
+def _aportes_por_producto(fecha, consumos, signo=1):
+    """Aporte de `consumos` [(producto_id, cantidad, precio_unitario)] a las ventas de `fecha`."""
+    totales = {}
+    for producto_id, cantidad, precio_unitario in consumos:
+        _sumar(totales, {(fecha, producto_id): {'cantidad': cantidad, 'monto': cantidad * precio_unitario}}, signo)
+    return totales
+
+
+def _productos_de(cita_id):
+    """Subtotal de los productos consumidos en la cita `cita_id`."""
+    subtotal = F('cantidad') * F('precio_unitario')
+    return ProductoConsumido.objects.filter(cita_id=cita_id).aggregate(
+        total=Coalesce(Sum(subtotal, output_field=DecimalField(max_digits=14, decimal_places=2)), CERO)
+    )['total']
+
+
+def _aportes_productos(datos_cita, subtotal):
+    """Aporte de productos consumidos a la fila de su cita (sólo si está completada)."""
+    return {clave: {'productos': subtotal} for clave in _aportes(datos_cita)}
+
+
+def _guardar_estado_previo(sender, instance, raw=False, **kwargs):
+    instance._ventas_previo = None
+    if raw or instance.pk is None:
+        return
+    previo = Cita._base_manager.filter(pk=instance.pk).values(*CAMPOS_CITA).first()
+    if previo:
+        instance._ventas_previo = (previo, _productos_de(instance.pk))
+
+
+def _actualizar_tras_guardar(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    previo, productos = getattr(instance, '_ventas_previo', None) or (None, CERO)
+    actual = {campo: getattr(instance, campo) for campo in CAMPOS_CITA}
+    deltas = _sumar(_sumar({}, _aportes(previo, productos), -1), _aportes(actual, productos))
+    aplicar_deltas(deltas)
+
+    if previo:
+        antes, despues = timezone.localdate(previo['fecha_cita']), timezone.localdate(instance.fecha_cita)
+        if antes != despues and productos:
+            # Cita reprogramada: sus productos pasan al nuevo día
+            consumos = list(ProductoConsumido.objects.filter(cita_id=instance.pk).values_list(
+                'producto_id', 'cantidad', 'precio_unitario'
+            ))
+            aplicar_deltas_productos(
+                _sumar(_aportes_por_producto(antes, consumos, -1), _aportes_por_producto(despues, consumos))
+            )
+    instance._ventas_previo = None
+
+
+def _actualizar_tras_eliminar(sender, instance, **kwargs):
+    # Los productos de la cita ya se descontaron al eliminarse sus consumos en cascada
+    actual = {campo: getattr(instance, campo) for campo in CAMPOS_CITA}
+    aplicar_deltas(_sumar({}, _aportes(actual), -1))
+
+
+def _actualizar_tras_registro_citas(sender, citas, **kwargs):
+    """Suma las citas insertadas con `bulk_create` (ver `servicios.registro`)."""
+    totales = {}
+    for cita in citas:
+        _sumar(totales, _aportes({campo: getattr(cita, campo) for campo in CAMPOS_CITA}))
+    aplicar_deltas(totales)
+
+
+def _actualizar_tras_consumos(sender, cita, consumos, **kwargs):
+    """Suma los productos registrados en bloque (ver `servicios.consumo`)."""
+    datos = {campo: getattr(cita, campo) for campo in CAMPOS_CITA}
+    aplicar_deltas(_aportes_productos(datos, sum((consumo.subtotal for consumo in consumos), CERO)))
+    aplicar_deltas_productos(_aportes_por_producto(
+        timezone.localdate(cita.fecha_cita),
+        [(consumo.producto_id, consumo.cantidad, consumo.precio_unitario) for consumo in consumos],
+    ))
+
+
+def _actualizar_tras_consumo(sender, instance, signo):
+    datos = Cita._base_manager.filter(pk=instance.cita_id).values(*CAMPOS_CITA).first()
+    aplicar_deltas(_aportes_productos(datos, signo * instance.subtotal))
+    if datos:
+        aplicar_deltas_productos(_aportes_por_producto(
+            timezone.localdate(datos['fecha_cita']),
+            [(instance.producto_id, instance.cantidad, instance.precio_unitario)],
+            signo,
+        ))
+
+
+def _actualizar_tras_guardar_consumo(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw:
+        _actualizar_tras_consumo(sender, instance, 1)
+
+
+def _actualizar_tras_eliminar_consumo(sender, instance, **kwargs):
+    _actualizar_tras_consumo(sender, instance, -1)
+
+
+pre_save.connect(_guardar_estado_previo, sender=Cita, dispatch_uid='ventas_cita_pre_save')
+post_save.connect(_actualizar_tras_guardar, sender=Cita, dispatch_uid='ventas_cita_post_save')
+post_delete.connect(_actualizar_tras_eliminar, sender=Cita, dispatch_uid='ventas_cita_post_delete')
+post_save.connect(_actualizar_tras_guardar_consumo, sender=ProductoConsumido, dispatch_uid='ventas_consumo_post_save')
+post_delete.connect(_actualizar_tras_eliminar_consumo, sender=ProductoConsumido,
+                    dispatch_uid='ventas_consumo_post_delete')
+citas_registradas.connect(_actualizar_tras_registro_citas, dispatch_uid='ventas_citas_registradas')
+consumos_registrados.connect(_actualizar_tras_consumos, dispatch_uid='ventas_consumos_registrados')
+
+
+def resumir_ventas(fecha_inicio, fecha_fin):
+    """Totales de ventas entre `fecha_inicio` y `fecha_fin` (incluidas), y sus desgloses.
+
+    Lee sólo las filas de `VentaDiaria` del período: una por día, servicio y
+    estilista con ventas.
+    """
+    filas = VentaDiaria.objects.filter(fecha__gte=fecha_inicio, fecha__lte=fecha_fin).order_by()
+    sumas = {campo: Sum(campo) for campo in VALORES}
+
+    totales = filas.aggregate(**{campo: Coalesce(Sum(campo), 0 if campo == 'citas' else CERO) for campo in VALORES})
+    totales['servicios'] = totales['ingresos'] - totales['productos']
+    totales['ticket_promedio'] = totales['ingresos'] / totales['citas'] if totales['citas'] else CERO
+
+    return {
+        'totales': totales,
+        'por_servicio': list(
+            filas.values('servicio_id', 'servicio__nombre').annotate(**sumas).order_by('-ingresos')
+        ),
+        'por_estilista': list(
+            filas.values('estilista_id', 'estilista__nombre', 'estilista__apellido').annotate(**sumas)
+            .order_by('-ingresos')
+        ),
+        'por_dia': list(filas.values('fecha').annotate(**sumas).order_by('fecha')),
+    }
+
+
+def productos_mas_vendidos(fecha_inicio, fecha_fin, top_n):
+    """Los `top_n` productos con más unidades consumidas entre `fecha_inicio` y `fecha_fin` (incluidas).
+
+    Cada fila incluye además `salidas`: todas las unidades que salieron del
+    inventario en el período (con mermas y ajustes), de los movimientos
+    vigentes y archivados (ver `inventario.archivo.cantidades_por_producto`).
+    """
+    filas = list(
+        VentaProductoDiaria.objects.filter(fecha__gte=fecha_inicio, fecha__lte=fecha_fin)
+        .values('producto_id', 'producto__nombre', 'producto__categoria')
+        .annotate(total_vendido=Sum('cantidad'), monto=Sum('monto'))
+        .order_by('-total_vendido', 'producto__nombre')[:top_n]
+    )
+    if filas:
+        salidas = cantidades_por_producto('salida', fecha_inicio, fecha_fin,
+                                          productos=[fila['producto_id'] for fila in filas])
+        for fila in filas:
+            fila['salidas'] = salidas.get(fila['producto_id'], 0)
+    return filas
+
+
+def calcular_ventas():
+    """Recalcula desde cero las ventas diarias: {(fecha, servicio_id, estilista_id): valores}."""
+    monto = DecimalField(max_digits=14, decimal_places=2)
+    ventas = {}
+    citas = Cita.objects.filter(estado='completada').order_by().annotate(
+        fecha=TruncDate('fecha_cita')
+    ).values('fecha', 'servicio_id', 'estilista_id').annotate(
+        citas=Count('id'),
+        ingresos=Coalesce(Sum('precio_final'), CERO, output_field=monto),
+        descuentos=Coalesce(Sum('descuento_aplicado'), CERO, output_field=monto),
+    )
+    for fila in citas:
+        clave = (fila['fecha'], fila['servicio_id'], fila['estilista_id'])
+        ventas[clave] = {campo: fila[campo] for campo in ('citas', 'ingresos', 'descuentos')}
+        ventas[clave]['productos'] = CERO
+
+    consumos = ProductoConsumido.objects.filter(cita__estado='completada').order_by().annotate(
+        fecha=TruncDate('cita__fecha_cita')
+    ).values('fecha', 'cita__servicio_id', 'cita__estilista_id').annotate(
+        productos=Sum(F('cantidad') * F('precio_unitario'), output_field=monto)
+    )
+    for fila in consumos:
+        clave = (fila['fecha'], fila['cita__servicio_id'], fila['cita__estilista_id'])
+        if clave in ventas:
+            ventas[clave]['productos'] = fila['productos']
+    return ventas
+
+
+def calcular_ventas_productos():
+    """Recalcula desde cero las ventas diarias por producto: {(fecha, producto_id): valores}."""
+    filas = ProductoConsumido.objects.order_by().annotate(
+        fecha=TruncDate('cita__fecha_cita')
+    ).values('fecha', 'producto_id').annotate(
+        unidades=Sum('cantidad'),
+        total=Sum(F('cantidad') * F('precio_unitario'), output_field=DecimalField(max_digits=14, decimal_places=2)),
+    )
+    return {
+        (fila['fecha'], fila['producto_id']): {'cantidad': fila['unidades'], 'monto': fila['total']}
+        for fila in filas
+    }
+
+
+def reconstruir_ventas():
+    """Reemplaza todas las ventas diarias por sus valores recalculados. Devuelve las filas creadas."""
+    ventas = calcular_ventas()
+    with transaction.atomic():
+        VentaDiaria.objects.all().delete()
+        VentaDiaria.objects.bulk_create([
+            VentaDiaria(fecha=fecha, servicio_id=servicio_id, estilista_id=estilista_id, **valores)
+            for (fecha, servicio_id, estilista_id), valores in ventas.items()
+        ], batch_size=1000)
+    invalidar(VERSION)
+    return len(ventas)
+
+
+def reconstruir_ventas_productos():
+    """Reemplaza todas las ventas diarias por producto por sus valores recalculados."""
+    ventas = calcular_ventas_productos()
+    with transaction.atomic():
+        VentaProductoDiaria.objects.all().delete()
+        VentaProductoDiaria.objects.bulk_create([
+            VentaProductoDiaria(fecha=fecha, producto_id=producto_id, **valores)
+            for (fecha, producto_id), valores in ventas.items()
+        ], batch_size=1000)
+    invalidar(VERSION_PRODUCTOS)
+    return len(ventas)
+
+
+def _comparar(guardadas, calculadas, campos):
+    vacio = dict.fromkeys(campos, 0)
+    return [
+        (clave, guardadas.get(clave, vacio), calculadas.get(clave, vacio))
+        for clave in sorted(set(guardadas) | set(calculadas))
+        if guardadas.get(clave, vacio) != calculadas.get(clave, vacio)
+    ]
+
+
+def diferencias():
+    """Filas cuyo valor guardado no coincide con el recalculado: [(clave, guardado, calculado)]."""
+    guardadas = {
+        (fila['fecha'], fila['servicio_id'], fila['estilista_id']): {campo: fila[campo] for campo in VALORES}
+        for fila in VentaDiaria.objects.values('fecha', 'servicio_id', 'estilista_id', *VALORES)
+    }
+    return _comparar(guardadas, calcular_ventas(), VALORES)
+
+
+def diferencias_productos():
+    """Como `diferencias`, para las ventas diarias por producto."""
+    guardadas = {
+        (fila['fecha'], fila['producto_id']): {campo: fila[campo] for campo in VALORES_PRODUCTO}
+        for fila in VentaProductoDiaria.objects.values('fecha', 'producto_id', *VALORES_PRODUCTO)
+    }
+    return _comparar(guardadas, calcular_ventas_productos(), VALORES_PRODUCTO)
@@ -1,19 +1,34 @@
-from django.shortcuts import render, redirect
+from django.shortcuts import render, redirect, get_object_or_404
+from django.contrib import messages
 from django.contrib.auth.decorators import login_required, user_passes_test
-from usuarios.helpers import has_any_role
-from django.db.models import Count, Sum, Q, F
+from usuarios.helpers import has_any_role, is_admin_user
+from django.db.models import Count, Sum, Q
 from django.utils import timezone
 from datetime import datetime, timedelta
 from clientes.models import Cliente
-from inventario.models import Producto, MovimientoInventario
+from inventario.models import Producto
+from inventario.historial import stock_en_fecha_productos
+from inventario import pronostico
+from inventario.valoracion import valorar
 from servicios.models import Servicio
 from proveedores.models import Proveedor
 from .forms import ReporteInventarioForm, ReporteVentasForm, ReporteClientesForm, ReporteProductosForm
 from .models import Reporte
 from usuarios.helpers import registrar_accion
-from django.http import HttpResponse
-import csv
+from core.fechas import inicio_del_dia
+from core.paginacion import paginar
+from django.http import (FileResponse, Http404, HttpResponse, HttpResponseBadRequest, HttpResponseForbidden,
+                         JsonResponse)
+from django.urls import reverse
+from django.views.decorators.http import require_POST
+from .exportacion import EXPORTACIONES, respuesta_csv
+from .filtros import ParametrosInvalidos, filtrar_clientes, filtrar_inventario, rango_productos
+from .trabajos import encolar, liberar_abandonados
+from . import resultados
+from .resultados import en_cache
+from .ventas import productos_mas_vendidos, resumir_ventas
 import io
+import os
 
 @login_required
 @user_passes_test(lambda u: has_any_role(u, ['administrador', 'recepcionista', 'estilista']))
@@ -28,42 +43,58 @@ def reporte_inventario(request):
     """Genera reportes de inventario"""
     productos = Producto.objects.all()
     form = ReporteInventarioForm(request.GET or None)
+    fecha_corte = None
     
     if request.GET and form.is_valid():
-        tipo_reporte = form.cleaned_data['tipo_reporte']
-        categoria = form.cleaned_data['categoria']
-        incluir_inactivos = form.cleaned_data['incluir_inactivos']
-        
-        if not incluir_inactivos:
-            productos = productos.filter(estado='activo')
+        fecha_corte = form.cleaned_data['fecha_corte']
+        productos = filtrar_inventario(productos, form.cleaned_data)
+    
+    def calcular():
+        # Estadísticas agregadas en la base
+        valoracion = valorar(productos)
         
-        if tipo_reporte == 'bajo_minimo':
-            productos = productos.filter(stock_actual__lte=F('stock_minimo'))
-        elif tipo_reporte == 'categoria' and categoria:
-            productos = productos.filter(categoria=categoria)
-        elif tipo_reporte == 'proveedor':
-            productos = productos.filter(proveedor__isnull=False)
+        # Stock y valorización a una fecha pasada (snapshot más cercano + movimientos posteriores)
+        stock_al_corte = {}
+        valor_al_corte = 0
+        if fecha_corte:
+            stock_al_corte = stock_en_fecha_productos(fecha_corte, productos.values_list('id', flat=True))
+            valor_al_corte = sum(
+                precio_costo * stock_al_corte.get(pk, 0)
+                for pk, precio_costo in productos.values_list('id', 'precio_costo')
+            )
+        return valoracion, stock_al_corte, valor_al_corte
     
-    # Estadísticas
-    total_productos = productos.count()
-    productos_bajo_minimo = productos.filter(stock_actual__lte=F('stock_minimo')).count()
-    valor_total_inventario = sum(p.precio_costo * p.stock_actual for p in productos)
+    # Mismos filtros, mismo resultado: se reutiliza hasta que cambien productos o movimientos
+    parametros = form.cleaned_data if request.GET and form.is_valid() else {}
+    valoracion, stock_al_corte, valor_al_corte = en_cache('inventario', parametros, calcular)
     
     # Guardar el reporte generado
     if request.GET:
+        parametros = dict(form.cleaned_data) if form.is_valid() else {}
+        if parametros.get('fecha_corte'):
+            parametros['fecha_corte'] = parametros['fecha_corte'].isoformat()
         Reporte.objects.create(
             nombre=f"Reporte Inventario - {timezone.now().strftime('%Y-%m-%d')}",
             tipo_reporte='inventario',
             usuario=request.user,
-            parametros=form.cleaned_data
+            parametros=parametros
         )
     
     context = {
         'form': form,
         'productos': productos,
-        'total_productos': total_productos,
-        'productos_bajo_minimo': productos_bajo_minimo,
-        'valor_total_inventario': valor_total_inventario,
+        'valoracion': valoracion,
+        'desgloses': [
+            ('Por Categoría', valoracion.por_categoria),
+            ('Por Proveedor', valoracion.por_proveedor),
+            ('Por Estado', valoracion.por_estado),
+        ],
+        'total_productos': valoracion.productos,
+        'productos_bajo_minimo': valoracion.bajo_minimo,
+        'valor_total_inventario': valoracion.total,
+        'fecha_corte': fecha_corte,
+        'stock_al_corte': stock_al_corte,
+        'valor_al_corte': valor_al_corte,
     }
     return render(request, 'reportes/reporteInventario.html', context)
 
@@ -74,93 +105,89 @@ def reporte_clientes(request):
     clientes = Cliente.objects.all()
     form = ReporteClientesForm(request.GET or None)
     
+    parametros = {}
     if request.GET and form.is_valid():
-        tipo_reporte = form.cleaned_data['tipo_reporte']
-        ordenar_por = form.cleaned_data['ordenar_por']
-        
-        if tipo_reporte == 'activos':
-            clientes = clientes.filter(estado='activo')
-        elif tipo_reporte == 'inactivos':
-            clientes = clientes.filter(estado='inactivo')
-        elif tipo_reporte == 'cumpleanos':
-            mes_actual = timezone.now().month
-            clientes = clientes.filter(fecha_nacimiento__month=mes_actual)
-        
-        # Ordenar
-        if ordenar_por == 'nombre':
-            clientes = clientes.order_by('nombre', 'apellido')
-        elif ordenar_por == 'fecha_registro':
-            clientes = clientes.order_by('-fecha_registro')
-        elif ordenar_por == 'estado':
-            clientes = clientes.order_by('estado', 'nombre')
+        clientes = filtrar_clientes(clientes, form.cleaned_data)
+        parametros = dict(form.cleaned_data)
+        if parametros['tipo_reporte'] == 'cumpleanos':
+            # "Cumpleaños del mes" cambia de resultado al cambiar el mes
+            parametros['mes'] = timezone.localdate().month
     
     # Estadísticas
-    total_clientes = clientes.count()
-    clientes_activos = clientes.filter(estado='activo').count()
-    clientes_inactivos = clientes.filter(estado='inactivo').count()
+    estadisticas = en_cache('clientes', parametros, lambda: clientes.aggregate(
+        total=Count('id'),
+        activos=Count('id', filter=Q(estado='activo')),
+        inactivos=Count('id', filter=Q(estado='inactivo')),
+    ))
     
     context = {
         'form': form,
         'clientes': clientes,
-        'total_clientes': total_clientes,
-        'clientes_activos': clientes_activos,
-        'clientes_inactivos': clientes_inactivos,
+        'total_clientes': estadisticas['total'],
+        'clientes_activos': estadisticas['activos'],
+        'clientes_inactivos': estadisticas['inactivos'],
     }
     return render(request, 'reportes/reporteClientes.html', context)
 
+@login_required
+@user_passes_test(lambda u: has_any_role(u, ['administrador', 'recepcionista']))
+def reporte_ventas(request):
+    """Reporte de ventas por servicio, estilista y día, leído de las ventas diarias"""
+    form = ReporteVentasForm(request.GET or None)
+    
+    hoy = timezone.localdate()
+    if request.GET and form.is_valid():
+        fecha_inicio = form.cleaned_data['fecha_inicio']
+        fecha_fin = form.cleaned_data['fecha_fin']
+        Reporte.objects.create(
+            nombre=f"Reporte Ventas - {timezone.now().strftime('%Y-%m-%d')}",
+            tipo_reporte='ventas',
+            usuario=request.user,
+            parametros={'fecha_inicio': fecha_inicio.isoformat(), 'fecha_fin': fecha_fin.isoformat()}
+        )
+    else:
+        # Por defecto: mes en curso
+        fecha_inicio = hoy.replace(day=1)
+        fecha_fin = hoy
+    
+    resumen = en_cache(
+        'ventas',
+        {'fecha_inicio': fecha_inicio, 'fecha_fin': fecha_fin},
+        lambda: resumir_ventas(fecha_inicio, fecha_fin),
+    )
+    
+    context = {
+        'form': form,
+        'fecha_inicio': fecha_inicio,
+        'fecha_fin': fecha_fin,
+        **resumen,
+    }
+    return render(request, 'reportes/reporteVentas.html', context)
+
 @login_required
 @user_passes_test(lambda u: has_any_role(u, ['administrador', 'recepcionista']))
 def reporte_productos_mas_vendidos(request):
     """Reporte de productos más vendidos"""
     form = ReporteProductosForm(request.GET or None)
-    movimientos = MovimientoInventario.objects.filter(tipo_movimiento='salida')
     
     # Determinar el período
-    hoy = timezone.now().date()
+    hoy = timezone.localdate()
     if request.GET and form.is_valid():
-        periodo = form.cleaned_data['periodo']
+        fecha_inicio, fecha_fin = rango_productos(form.cleaned_data, hoy)
         top_n = form.cleaned_data['top_n']
-        
-        if periodo == 'hoy':
-            fecha_inicio = hoy
-            fecha_fin = hoy
-        elif periodo == 'semana':
-            fecha_inicio = hoy - timedelta(days=hoy.weekday())
-            fecha_fin = fecha_inicio + timedelta(days=6)
-        elif periodo == 'mes':
-            fecha_inicio = hoy.replace(day=1)
-            fecha_fin = (fecha_inicio + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-        elif periodo == 'trimestre':
-            trimestre_actual = (hoy.month - 1) // 3 + 1
-            fecha_inicio = datetime(hoy.year, 3 * (trimestre_actual - 1) + 1, 1).date()
-            fecha_fin = (fecha_inicio + timedelta(days=92)).replace(day=1) - timedelta(days=1)
-        elif periodo == 'anio':
-            fecha_inicio = hoy.replace(month=1, day=1)
-            fecha_fin = hoy.replace(month=12, day=31)
-        else:  # personalizado
-            fecha_inicio = form.cleaned_data['fecha_inicio'] or hoy - timedelta(days=30)
-            fecha_fin = form.cleaned_data['fecha_fin'] or hoy
-        
-        movimientos = movimientos.filter(
-            fecha_movimiento__date__range=[fecha_inicio, fecha_fin]
-        )
     else:
         # Por defecto: último mes
         fecha_inicio = hoy - timedelta(days=30)
         fecha_fin = hoy
         top_n = 10
-        movimientos = movimientos.filter(
-            fecha_movimiento__date__range=[fecha_inicio, fecha_fin]
-        )
     
-    # Agrupar por producto y sumar cantidades
-    from django.db.models import Sum
-    productos_vendidos = movimientos.values(
-        'producto__nombre', 
-        'producto__categoria'
-    ).annotate(
-        total_vendido=Sum('cantidad')
-    ).order_by('-total_vendido')[:top_n]
+    # Unidades consumidas en citas, de las ventas diarias por producto (no cuenta mermas ni ajustes).
+    # Los períodos relativos ('mes', 'semana'...) se identifican por sus fechas ya resueltas
+    productos_vendidos = en_cache(
+        'productos_mas_vendidos',
+        {'fecha_inicio': fecha_inicio, 'fecha_fin': fecha_fin, 'top_n': top_n},
+        lambda: productos_mas_vendidos(fecha_inicio, fecha_fin, top_n),
+    )
     
     context = {
         'form': form,
@@ -176,7 +203,7 @@ def reporte_productos_mas_vendidos(request):
 def reporte_stock_bajo(request):
     """Reporte de productos bajo stock mínimo"""
     productos_bajo_minimo = Producto.objects.filter(
-        stock_actual__lte=F('stock_minimo'),
+        bajo_minimo=True,
         estado='activo'
     ).order_by('stock_actual')
     
@@ -187,37 +214,72 @@ def reporte_stock_bajo(request):
     return render(request, 'reportes/reportesStockBajo.html', context)
 
 
+@login_required
+@user_passes_test(lambda u: has_any_role(u, ['administrador', 'recepcionista', 'estilista']))
+def reporte_pronostico_stock(request):
+    """Reporte de productos ordenados por días estimados hasta quedarse sin stock"""
+    productos = list(Producto.objects.filter(estado='activo').select_related('proveedor'))
+    pronosticos = pronostico.pronosticar(productos)
+    for producto in productos:
+        producto.pronostico = pronosticos.get(producto.pk)
+
+    # Los que quiebran más allá del horizonte (sin días estimados) van al final
+    filas = sorted(
+        (p for p in productos if p.pronostico),
+        key=lambda p: (p.pronostico.dias_hasta_quiebre is None, p.pronostico.dias_hasta_quiebre or 0),
+    )
+    context = {
+        'productos': filas,
+        'sin_consumo': len(productos) - len(filas),
+        'pronostico_disponible': pronostico.pronostico_disponible(),
+        'dias_historial': pronostico.DIAS_HISTORIAL,
+        'dias_reposicion': pronostico.DIAS_REPOSICION,
+        'dias_cobertura': pronostico.DIAS_COBERTURA,
+        'horizonte_quiebre': pronostico.HORIZONTE_QUIEBRE,
+    }
+    return render(request, 'reportes/reportePronosticoStock.html', context)
+
+
+def _exportar_csv(request, tipo, accion, modelo):
+    exportacion = EXPORTACIONES[tipo]
+    try:
+        consulta = exportacion.consulta(request.GET)
+    except ParametrosInvalidos as error:
+        return HttpResponseBadRequest(f'Filtros inválidos: {error}')
+    registrar_accion(request.user, accion, modelo=modelo,
+                     descripcion=f"Export CSV ({request.GET.urlencode() or 'sin filtros'})")
+    return respuesta_csv(exportacion.archivo, exportacion.columnas, consulta)
+
 @login_required
 @user_passes_test(lambda u: has_any_role(u, ['administrador', 'recepcionista', 'estilista']))
 def exportar_inventario_csv(request):
-    """Exporta el conjunto filtrado de inventario (basado en GET params) como CSV compatible con Excel."""
-    productos = Producto.objects.all()
-    tipo_reporte = request.GET.get('tipo_reporte')
-    if tipo_reporte == 'bajo_minimo':
-        productos = productos.filter(stock_actual__lte=F('stock_minimo'))
-    # otros filtros se pueden aplicar igual que en `reporte_inventario`
+    """Exporta el inventario con los mismos filtros de `reporte_inventario`, como CSV compatible con Excel."""
+    return _exportar_csv(request, 'inventario', 'exportar_inventario_csv', 'Producto')
 
-    # Registrar acción
-    registrar_accion(request.user, 'exportar_inventario_csv', modelo='Producto', descripcion=f'Export {productos.count()} items')
+@login_required
+@user_passes_test(lambda u: has_any_role(u, ['administrador', 'recepcionista']))
+def exportar_clientes_csv(request):
+    """Exporta los clientes con los mismos filtros y orden de `reporte_clientes`."""
+    return _exportar_csv(request, 'clientes', 'exportar_clientes_csv', 'Cliente')
 
-    # Crear CSV
-    buffer = io.StringIO()
-    writer = csv.writer(buffer)
-    writer.writerow(['Nombre', 'Categoria', 'Precio Costo', 'Precio Venta', 'Stock Actual', 'Stock Minimo', 'Proveedor', 'Estado'])
-    for p in productos:
-        proveedor = p.proveedor.nombre_empresa if p.proveedor else ''
-        writer.writerow([p.nombre, p.categoria, str(p.precio_costo), str(p.precio_venta), p.stock_actual, p.stock_minimo, proveedor, p.estado])
+@login_required
+@user_passes_test(lambda u: has_any_role(u, ['administrador', 'recepcionista']))
+def exportar_citas_csv(request):
+    """Exporta las citas, opcionalmente entre fecha_inicio y fecha_fin (días locales)."""
+    return _exportar_csv(request, 'citas', 'exportar_citas_csv', 'Cita')
 
-    response = HttpResponse(buffer.getvalue(), content_type='text/csv; charset=utf-8')
-    response['Content-Disposition'] = 'attachment; filename="reporte_inventario.csv"'
-    return response
+@login_required
+@user_passes_test(lambda u: has_any_role(u, ['administrador', 'recepcionista']))
+def exportar_movimientos_csv(request):
+    """Exporta los movimientos de inventario vigentes, opcionalmente entre fecha_inicio y fecha_fin."""
+    return _exportar_csv(request, 'movimientos', 'exportar_movimientos_csv', 'MovimientoInventario')
 
 
 @login_required
 @user_passes_test(lambda u: has_any_role(u, ['administrador', 'recepcionista', 'estilista']))
 def exportar_inventario_pdf(request):
     """Intenta generar un PDF con ReportLab; si no está disponible, devuelve un mensaje instructivo."""
-    productos = Producto.objects.filter(stock_actual__lte=F('stock_minimo'), estado='activo')
+    productos = Producto.objects.filter(bajo_minimo=True, estado='activo')
     registrar_accion(request.user, 'exportar_inventario_pdf', modelo='Producto', descripcion=f'Export PDF {productos.count()} items')
 
     try:
@@ -252,7 +314,87 @@ def historial_reportes(request):
     """Muestra el historial de reportes generados"""
     reportes = Reporte.objects.filter(usuario=request.user)
     
+    pagina = paginar(request, reportes)
+    inicio_mes = inicio_del_dia(timezone.localdate().replace(day=1))
+    resumen = reportes.aggregate(
+        total=Count('id'),
+        este_mes=Count('id', filter=Q(fecha_generacion__gte=inicio_mes)),
+        inventario=Count('id', filter=Q(tipo_reporte='inventario')),
+        ventas=Count('id', filter=Q(tipo_reporte='ventas')),
+    )
+    context = {
+        'reportes': pagina,
+        'pagina': pagina,
+        'resumen': resumen,
+    }
+    return render(request, 'reportes/historialReportes.html', context)
+
+def _reporte_del_usuario(request, pk):
+    """El reporte `pk` si es del usuario (o el usuario es administrador); si no, 404."""
+    reportes = Reporte.objects.all()
+    if not has_any_role(request.user, ['administrador']):
+        reportes = reportes.filter(usuario=request.user)
+    return get_object_or_404(reportes, pk=pk)
+
+@login_required
+@require_POST
+def encolar_reporte(request, tipo):
+    """Encola el reporte o exportación `tipo` con los filtros de la URL para que lo genere el worker."""
+    exportacion = EXPORTACIONES.get(tipo)
+    if exportacion is None:
+        raise Http404
+    if not has_any_role(request.user, list(exportacion.roles)):
+        return HttpResponseForbidden('No tiene permiso para generar este reporte.')
+
+    try:
+        exportacion.validar(request.GET)
+    except ParametrosInvalidos as error:
+        messages.error(request, f'No se encoló el reporte. Filtros inválidos: {error}')
+        return redirect('reportes:historial_reportes')
+    
+    reporte = encolar(tipo, request.GET, request.user)
+    registrar_accion(request.user, 'encolar_reporte', modelo='Reporte', objeto_id=reporte.pk,
+                     descripcion=f"{reporte.nombre} ({request.GET.urlencode() or 'sin filtros'})")
+    messages.info(request, 'El reporte se está generando en segundo plano. Podrá descargarlo desde el historial.')
+    return redirect('reportes:historial_reportes')
+
+@login_required
+def estado_reporte(request, pk):
+    """Estado y avance de un reporte en segundo plano, para consultar periódicamente desde la página."""
+    liberar_abandonados()
+    reporte = _reporte_del_usuario(request, pk)
+    return JsonResponse({
+        'estado': reporte.estado,
+        'estado_display': reporte.get_estado_display(),
+        'progreso': reporte.progreso,
+        'error': reporte.error,
+        'descarga': reverse('reportes:descargar_reporte', args=[reporte.pk]) if reporte.archivo else None,
+    })
+
+@login_required
+def descargar_reporte(request, pk):
+    """Descarga el archivo generado por el worker."""
+    reporte = _reporte_del_usuario(request, pk)
+    if not reporte.archivo:
+        raise Http404
+    return FileResponse(reporte.archivo.open('rb'), as_attachment=True,
+                        filename=os.path.basename(reporte.archivo.name))
+
+@login_required
+@user_passes_test(is_admin_user)
+def estadisticas_cache(request):
+    """Aciertos y fallos de la caché de resultados de reportes (sólo administradores)."""
+    if request.method == 'POST':
+        resultados.reiniciar_estadisticas()
+        registrar_accion(request.user, 'reiniciar_estadisticas_cache', modelo='Reporte',
+                         descripcion='Estadísticas de caché de reportes reiniciadas')
+        messages.success(request, 'Estadísticas de caché reiniciadas.')
+        return redirect('reportes:estadisticas_cache')
+    
+    tipos = dict(Reporte.TIPO_REPORTE_CHOICES)
+    filas = [dict(fila, nombre=tipos[fila['tipo_reporte']]) for fila in resultados.estadisticas()]
     context = {
-        'reportes': reportes,
+        'filas': filas,
+        'duracion_minutos': resultados.DURACION_CACHE // 60,
     }
-    return render(request, 'reportes/historialReportes.html', context)
\ No newline at end of file
+    return render(request, 'reportes/estadisticasCache.html', context)
@@ -0,0 +1,167 @@
+"""Disponibilidad de estilistas y detección de citas superpuestas.
+
+`Agenda.cargar` trae en una sola consulta las citas de un rango de días de
+todos los estilistas y las guarda, por estilista, en listas ordenadas por
+hora de inicio. Junto a ellas se guarda el máximo acumulado de las horas de
+término, así que saber si un intervalo choca con alguna cita es una búsqueda
+binaria (`bisect`) aunque existan citas superpuestas de antes. Las preguntas
+"¿está libre este horario?", "¿qué estilistas están libres a tal hora?" y
+"¿cuáles son los próximos horarios libres para este servicio?" se responden
+en memoria.
+"""
+from bisect import bisect_left
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+from colaboradores.models import Colaborador
+from core.fechas import rango_dia_local
+
+from .models import Cita
+
+# Horario de atención (hora local) y separación entre horarios ofrecidos
+HORA_APERTURA = time(9, 0)
+HORA_CIERRE = time(20, 0)
+INTERVALO_MINUTOS = 15
+# Días que se revisan al buscar los próximos horarios libres
+DIAS_BUSQUEDA = 7
+
+
+def horario_del_dia(fecha):
+    """(apertura, cierre) de un día como datetimes locales."""
+    return (timezone.make_aware(datetime.combine(fecha, HORA_APERTURA)),
+            timezone.make_aware(datetime.combine(fecha, HORA_CIERRE)))
+
+
+class _Intervalos:
+    """Citas de un estilista: inicios ordenados y máximo acumulado de los términos."""
+
+    def __init__(self, citas):
+        citas = sorted(citas)
+        self.inicios = [inicio for inicio, _, _ in citas]
+        self.citas = citas
+        self.max_fin = []
+        maximo = None
+        for _, fin, _ in citas:
+            maximo = fin if maximo is None or fin > maximo else maximo
+            self.max_fin.append(maximo)
+
+    def choca(self, inicio, fin):
+        # Sólo pueden chocar las citas que empiezan antes de `fin`
+        posicion = bisect_left(self.inicios, fin)
+        return posicion > 0 and self.max_fin[posicion - 1] > inicio
+
+    def conflictos(self, inicio, fin):
+        posicion = bisect_left(self.inicios, fin) - 1
+        encontrados = []
+        while posicion >= 0 and self.max_fin[posicion] > inicio:
+            if self.citas[posicion][1] > inicio:
+                encontrados.append(self.citas[posicion])
+            posicion -= 1
+        return encontrados[::-1]
+
+
+def cargar_para_validar(estilista, fecha_cita, excluir=None):
+    """Agenda de `estilista` para revisar un horario que empieza en `fecha_cita`.
+
+    Desde el día anterior (una cita de la tarde puede terminar pasada la
+    medianoche) y con los días que revisan los próximos horarios libres.
+    """
+    return Agenda.cargar(timezone.localdate(fecha_cita) - timedelta(days=1), dias=DIAS_BUSQUEDA + 1,
+                         estilistas=[estilista], excluir=excluir)
+
+
+class Agenda:
+    """Citas de todos los estilistas activos en un rango de días."""
+
+    def __init__(self, fecha_inicio, dias, estilistas, citas):
+        self.fecha_inicio = fecha_inicio
+        self.dias = dias
+        # id -> nombre del estilista
+        self.estilistas = estilistas
+        por_estilista = {}
+        for estilista_id, inicio, fin, cita_id in citas:
+            por_estilista.setdefault(estilista_id, []).append((inicio, fin, cita_id))
+        self._intervalos = {pk: _Intervalos(c) for pk, c in por_estilista.items()}
+        self._vacio = _Intervalos([])
+
+    @classmethod
+    def cargar(cls, fecha_inicio, dias=1, estilistas=None, excluir=None):
+        """Carga la agenda de `dias` días desde `fecha_inicio`.
+
+        `estilistas` limita la agenda a esos colaboradores; `excluir` es el
+        id de una cita que no debe considerarse (la que se está modificando).
+        """
+        if estilistas is None:
+            estilistas = Colaborador.objects.filter(cargo='estilista', estado='activo')
+        estilistas = {e.pk: e.nombre_completo for e in estilistas}
+
+        desde, hasta = rango_dia_local(fecha_inicio, dias)
+        citas = Cita.objects.filter(
+            estilista__in=list(estilistas), fecha_cita__gte=desde, fecha_cita__lt=hasta
+        ).exclude(estado='cancelada')
+        if excluir:
+            citas = citas.exclude(pk=excluir)
+        filas = []
+        for cita_id, estilista_id, inicio, real, prevista in citas.values_list(
+            'id', 'estilista_id', 'fecha_cita', 'duracion_real_minutos', 'servicio__duracion_minutos'
+        ):
+            filas.append((estilista_id, inicio, inicio + timedelta(minutes=real or prevista), cita_id))
+        return cls(fecha_inicio, dias, estilistas, filas)
+
+    def esta_libre(self, estilista_id, inicio, duracion_minutos):
+        fin = inicio + timedelta(minutes=duracion_minutos)
+        return not self._intervalos.get(estilista_id, self._vacio).choca(inicio, fin)
+
+    def conflictos(self, estilista_id, inicio, duracion_minutos):
+        """Citas (inicio, fin, id) del estilista que se superponen con el horario."""
+        fin = inicio + timedelta(minutes=duracion_minutos)
+        return self._intervalos.get(estilista_id, self._vacio).conflictos(inicio, fin)
+
+    def mensaje_conflicto(self, estilista_id, inicio, duracion_minutos):
+        """Mensaje para el usuario si el horario choca con otra cita del estilista, o None si está libre.
+
+        Sugiere los próximos horarios libres del estilista para esa duración.
+        """
+        conflictos = self.conflictos(estilista_id, inicio, duracion_minutos)
+        if not conflictos:
+            return None
+        desde, hasta, _ = conflictos[0]
+        mensaje = (f'{self.estilistas.get(estilista_id, "El estilista")} ya tiene una cita de '
+                   f'{timezone.localtime(desde):%H:%M} a {timezone.localtime(hasta):%H:%M}.')
+        horarios = self.proximos_horarios(duracion_minutos, desde=inicio, cantidad=3, estilista_id=estilista_id)
+        if horarios:
+            mensaje += ' Próximos horarios libres: ' + ', '.join(
+                f'{timezone.localtime(horario):%d/%m %H:%M}' for horario, _ in horarios
+            ) + '.'
+        return mensaje
+
+    def estilistas_libres(self, inicio, duracion_minutos):
+        """Ids de los estilistas sin citas en el horario indicado."""
+        return [pk for pk in self.estilistas if self.esta_libre(pk, inicio, duracion_minutos)]
+
+    def proximos_horarios(self, duracion_minutos, desde=None, cantidad=5, estilista_id=None):
+        """Próximos horarios libres dentro del horario de atención.
+
+        Devuelve una lista de (inicio, [ids de estilistas libres]), empezando
+        en `desde` (por defecto ahora) y sin salir de los días cargados.
+        """
+        desde = desde or timezone.now()
+        estilistas = [estilista_id] if estilista_id else list(self.estilistas)
+        paso = timedelta(minutes=INTERVALO_MINUTOS)
+        duracion = timedelta(minutes=duracion_minutos)
+        horarios = []
+        for dia in range(self.dias):
+            apertura, cierre = horario_del_dia(self.fecha_inicio + timedelta(days=dia))
+            inicio = apertura
+            if inicio < desde:
+                # Redondear al siguiente múltiplo del intervalo desde la apertura
+                inicio += paso * -(-(desde - apertura) // paso)
+            while inicio + duracion <= cierre:
+                libres = [pk for pk in estilistas if self.esta_libre(pk, inicio, duracion_minutos)]
+                if libres:
+                    horarios.append((inicio, libres))
+                    if len(horarios) >= cantidad:
+                        return horarios
+                inicio += paso
+        return horarios
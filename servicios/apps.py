@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ServiciosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'servicios'
+
+    def ready(self):
+        # Invalidar la grilla de ocupación del día de cada cita modificada
+        from . import ocupacion  # noqa: F401
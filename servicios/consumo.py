@@ -0,0 +1,66 @@
+"""Registro en bloque de los productos consumidos en una cita.
+
+En lugar de guardar cada producto por separado (un movimiento, un
+`ProductoConsumido` y un nuevo guardado de la cita por línea), se valida el
+stock de todas las líneas con las filas bloqueadas, se insertan consumos y
+movimientos con `bulk_create`, se descuenta el stock con un único UPDATE
+agrupado y el `precio_final` de la cita se recalcula una sola vez.
+"""
+from django.db import transaction
+
+from inventario.models import Producto, MovimientoInventario
+from inventario.stock import registrar_movimientos
+
+from .models import Cita, ProductoConsumido
+from .signals import consumos_registrados
+
+
+def agrupar_lineas(lineas):
+    """Suma las cantidades de un mismo producto: [(producto_id, cantidad)] -> {producto_id: cantidad}."""
+    cantidades = {}
+    for producto_id, cantidad in lineas:
+        cantidades[producto_id] = cantidades.get(producto_id, 0) + cantidad
+    return cantidades
+
+
+def registrar_consumo(cita, lineas, usuario):
+    """Registra los productos consumidos en `cita` y descuenta su stock.
+
+    `lineas` es una lista de (producto_id, cantidad). Lanza
+    `inventario.stock.StockInsuficienteError` sin guardar nada si alguno de
+    los productos no tiene stock suficiente. Devuelve los `ProductoConsumido`
+    creados.
+    """
+    cantidades = agrupar_lineas(lineas)
+    if not cantidades:
+        return []
+
+    with transaction.atomic():
+        # Bloquear la cita para que dos registros simultáneos no pisen el precio final
+        cita = Cita.objects.select_for_update().select_related('cliente', 'servicio').get(pk=cita.pk)
+        precios = dict(Producto.objects.filter(pk__in=cantidades).values_list('id', 'precio_venta'))
+
+        # Valida el stock con las filas bloqueadas y lo descuenta con un solo UPDATE
+        registrar_movimientos([
+            MovimientoInventario(
+                producto_id=producto_id,
+                tipo_movimiento='salida',
+                cantidad=cantidad,
+                motivo=f"Consumo en cita #{cita.id}",
+                usuario=usuario
+            )
+            for producto_id, cantidad in cantidades.items()
+        ])
+        consumos = ProductoConsumido.objects.bulk_create([
+            ProductoConsumido(cita=cita, producto_id=producto_id, cantidad=cantidad,
+                              precio_unitario=precios[producto_id])
+            for producto_id, cantidad in cantidades.items()
+        ])
+        consumos_registrados.send(sender=ProductoConsumido, cita=cita, consumos=consumos)
+
+        if cita.precio_final is None:
+            cita.calcular_precio_final()
+        cita.precio_final += sum(consumo.subtotal for consumo in consumos)
+        cita.save(update_fields=['precio_final', 'descuento_aplicado', 'fecha_actualizacion'])
+
+    return consumos
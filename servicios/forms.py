@@ -1,8 +1,11 @@
 from django import forms
 from django.core.exceptions import ValidationError
+from django.db import transaction
 from django.utils import timezone
 from .models import Servicio, Cita, ProductoConsumido
+from .agenda import cargar_para_validar
 from clientes.models import Cliente
+from colaboradores.models import Colaborador
 from inventario.models import Producto
 
 class ServicioForm(forms.ModelForm):
@@ -66,12 +69,52 @@ class CitaForm(forms.ModelForm):
             }),
         }
     
+    def __init__(self, *args, estilista=None, **kwargs):
+        # `estilista`: colaborador al que la vista asignará la cita, si no es el elegido en el formulario
+        super().__init__(*args, **kwargs)
+        self.estilista_asignado = estilista
+
     def clean_fecha_cita(self):
         fecha_cita = self.cleaned_data.get('fecha_cita')
         if fecha_cita and fecha_cita < timezone.now():
             raise ValidationError('La fecha de la cita no puede ser en el pasado')
         return fecha_cita
 
+    def clean(self):
+        cleaned_data = super().clean()
+        estilista = self.estilista_asignado or cleaned_data.get('estilista')
+        servicio = cleaned_data.get('servicio')
+        fecha_cita = cleaned_data.get('fecha_cita')
+        if not (estilista and servicio and fecha_cita):
+            return cleaned_data
+
+        # Evitar que el estilista quede con dos citas superpuestas
+        self._validar_agenda(estilista, servicio.duracion_minutos, fecha_cita)
+        return cleaned_data
+
+    def _validar_agenda(self, estilista, duracion, fecha_cita):
+        """Agrega un error a `fecha_cita` si el estilista ya tiene una cita en ese horario."""
+        agenda = cargar_para_validar(estilista, fecha_cita, excluir=self.instance.pk)
+        mensaje = agenda.mensaje_conflicto(estilista.pk, fecha_cita, duracion)
+        if mensaje is None:
+            return True
+        self.add_error('fecha_cita', mensaje)
+        return False
+
+    def guardar(self, cita):
+        """Guarda `cita` (de `save(commit=False)`) si su horario sigue libre.
+
+        Vuelve a revisar la agenda con el estilista bloqueado, de modo que dos
+        guardados simultáneos no puedan tomar el mismo horario. Si otra cita
+        lo ocupó desde la validación, agrega el error y devuelve False.
+        """
+        with transaction.atomic():
+            estilista = Colaborador.objects.select_for_update().get(pk=cita.estilista_id)
+            if not self._validar_agenda(estilista, cita.servicio.duracion_minutos, cita.fecha_cita):
+                return False
+            cita.save()
+        return True
+
 class ProductoConsumidoForm(forms.ModelForm):
     producto = forms.ModelChoiceField(
         queryset=Producto.objects.filter(estado='activo', stock_actual__gt=0),
@@ -99,6 +142,59 @@ class ProductoConsumidoForm(forms.ModelForm):
         
         return cantidad
 
+class LineaConsumoForm(forms.Form):
+    """Una línea de los productos consumidos en una cita (producto y cantidad)."""
+    producto = forms.TypedChoiceField(
+        coerce=int,
+        required=False,
+        empty_value=None,
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    cantidad = forms.IntegerField(
+        min_value=1,
+        required=False,
+        widget=forms.NumberInput(attrs={
+            'class': 'form-control',
+            'placeholder': '1',
+            'min': '1'
+        })
+    )
+
+    def __init__(self, *args, productos=(), **kwargs):
+        # `productos`: opciones (id, nombre) calculadas una sola vez para todo el formset
+        super().__init__(*args, **kwargs)
+        self.fields['producto'].choices = [('', '---------')] + list(productos)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        producto = cleaned_data.get('producto')
+        cantidad = cleaned_data.get('cantidad')
+        if bool(producto) != bool(cantidad) and not self.errors:
+            raise ValidationError('Indique el producto y la cantidad de la línea.')
+        return cleaned_data
+
+
+class BaseConsumoProductosFormSet(forms.BaseFormSet):
+
+    def clean(self):
+        super().clean()
+        if not any(self.errors) and not self.lineas():
+            raise ValidationError('Ingrese al menos un producto consumido.')
+
+    def lineas(self):
+        """Lista de (producto_id, cantidad) de las líneas completadas."""
+        return [
+            (form.cleaned_data['producto'], form.cleaned_data['cantidad'])
+            for form in self.forms
+            if form.cleaned_data.get('producto')
+        ]
+
+
+ConsumoProductosFormSet = forms.formset_factory(
+    LineaConsumoForm, formset=BaseConsumoProductosFormSet, extra=5
+)
+
+
 class CalcularServicioForm(forms.Form):
     cliente = forms.ModelChoiceField(
         queryset=Cliente.objects.filter(estado='activo'),
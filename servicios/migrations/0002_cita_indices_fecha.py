@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0001_initial'),
+        ('colaboradores', '0003_alter_colaborador_cargo'),
+        ('servicios', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cita',
+            index=models.Index(fields=['estilista', 'fecha_cita'], name='serv_cita_estilista_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cita',
+            index=models.Index(fields=['estado', 'fecha_cita'], name='serv_cita_estado_fecha_idx'),
+        ),
+    ]
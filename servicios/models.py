@@ -2,6 +2,8 @@ from django.db import models
 from django.core.validators import MinValueValidator
 from django.utils import timezone
 
+from clientes.cumpleanos import es_cumpleanos
+
 class Servicio(models.Model):
     CATEGORIA_CHOICES = [
         ('corte', 'Corte'),
@@ -59,6 +61,11 @@ class Cita(models.Model):
         verbose_name = "Cita"
         verbose_name_plural = "Citas"
         ordering = ['-fecha_cita']
+        indexes = [
+            # Citas de un estilista o en un estado dentro de un rango de fechas
+            models.Index(fields=['estilista', 'fecha_cita'], name='serv_cita_estilista_fecha_idx'),
+            models.Index(fields=['estado', 'fecha_cita'], name='serv_cita_estado_fecha_idx'),
+        ]
     
     def __str__(self):
         return f"{self.cliente.nombre_completo} - {self.servicio.nombre} - {self.fecha_cita.strftime('%d/%m/%Y %H:%M')}"
@@ -66,24 +73,15 @@ class Cita(models.Model):
     @property
     def es_cumpleanos_cliente(self):
         """Verifica si la cita coincide con el cumpleaños del cliente"""
-        return (self.fecha_cita.date().month == self.cliente.fecha_nacimiento.month and 
-                self.fecha_cita.date().day == self.cliente.fecha_nacimiento.day)
+        return es_cumpleanos(self.cliente.fecha_nacimiento, timezone.localdate(self.fecha_cita))
     
     def calcular_precio_final(self):
-        """Calcula el precio final con descuentos aplicados"""
-        precio = self.servicio.precio_base
-        
-        # Aplicar descuento por cumpleaños (20%)
-        from decimal import Decimal
-
-        if self.es_cumpleanos_cliente:
-            descuento = precio * Decimal('0.20')
-            precio -= descuento
-            self.descuento_aplicado = descuento
-
-        
-        self.precio_final = precio
-        return precio
+        """Calcula el precio final con los descuentos vigentes (ver `servicios.precios`)"""
+        from .precios import SolicitudPrecio, cotizar
+        cotizacion, = cotizar([SolicitudPrecio(self.cliente, self.servicio, fecha=self.fecha_cita)])
+        self.descuento_aplicado = cotizacion.descuento_servicio
+        self.precio_final = cotizacion.total
+        return self.precio_final
     
     def save(self, *args, **kwargs):
         # Calcular precio final antes de guardar
@@ -0,0 +1,202 @@
+"""Grilla semanal de ocupación de los estilistas.
+
+Cada día del horario de atención se divide en bloques de
+`agenda.INTERVALO_MINUTOS` minutos. La ocupación de un día se calcula en una
+sola pasada sobre sus citas y se guarda como dos matrices NumPy
+estilistas × bloques: cuántas citas ocupan cada bloque (más de una indica
+citas superpuestas) y el id de la cita que lo ocupa.
+
+Las grillas se guardan en caché por día. Cada día tiene su propia versión
+(ver `core.versiones`), de modo que al guardar o eliminar una cita sólo se
+recalcula el día afectado; los cambios de servicios, de estilistas o de
+clientes (el detalle muestra su nombre) suben la versión general y descartan
+todas las grillas.
+"""
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from django.core.cache import cache
+from django.db.models.signals import post_init, post_save, post_delete
+from django.utils import timezone
+
+from clientes.models import Cliente
+from colaboradores.models import Colaborador
+from core.fechas import rango_dia_local
+from core.versiones import invalidar, version
+
+from .agenda import HORA_APERTURA, HORA_CIERRE, INTERVALO_MINUTOS, horario_del_dia
+from .models import Cita, Servicio
+from .signals import citas_registradas
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - dependencia opcional
+    np = None
+
+VERSION = 'ocupacion'
+# Segundos máximos que se conserva la grilla de un día en caché
+DURACION_CACHE = 60 * 60 * 24
+BLOQUES_POR_DIA = (
+    (HORA_CIERRE.hour * 60 + HORA_CIERRE.minute) - (HORA_APERTURA.hour * 60 + HORA_APERTURA.minute)
+) // INTERVALO_MINUTOS
+
+
+@dataclass
+class OcupacionDia:
+    """Ocupación de un día: matrices estilistas × bloques y datos de sus citas."""
+    fecha: object
+    estilistas: list
+    ocupados: object
+    citas: object
+    detalle: dict = field(default_factory=dict)
+
+    def fila(self, estilista_id):
+        """Posición del estilista en las matrices, o None si no tenía citas ese día."""
+        try:
+            return self.estilistas.index(estilista_id)
+        except ValueError:
+            return None
+
+
+def ocupacion_disponible():
+    return np is not None
+
+
+def inicio_semana(fecha):
+    """Lunes de la semana de `fecha`."""
+    return fecha - timedelta(days=fecha.weekday())
+
+
+def horas_bloques():
+    """Hora de inicio de cada bloque del día ('09:00', '09:15', ...)."""
+    base = datetime.combine(datetime.min.date(), HORA_APERTURA)
+    return [(base + timedelta(minutes=INTERVALO_MINUTOS * i)).strftime('%H:%M') for i in range(BLOQUES_POR_DIA)]
+
+
+def _clave_dia(fecha):
+    return f'servicios:ocupacion:{version(VERSION)}:{fecha.isoformat()}:{version(f"{VERSION}:{fecha.isoformat()}")}'
+
+
+def calcular_ocupacion(fechas):
+    """Calcula la ocupación de cada día de `fechas` con una sola consulta.
+
+    Devuelve un diccionario `fecha -> OcupacionDia`.
+    """
+    fechas = sorted(fechas)
+    desde, hasta = rango_dia_local(fechas[0], (fechas[-1] - fechas[0]).days + 1)
+    citas = Cita.objects.filter(fecha_cita__gte=desde, fecha_cita__lt=hasta).exclude(estado='cancelada').order_by('fecha_cita').values_list(
+        'id', 'estilista_id', 'fecha_cita', 'duracion_real_minutos', 'servicio__duracion_minutos',
+        'estado', 'cliente__nombre', 'cliente__apellido', 'servicio__nombre',
+    )
+
+    por_dia = {fecha: [] for fecha in fechas}
+    for fila in citas:
+        fecha = timezone.localdate(fila[2])
+        if fecha in por_dia:
+            por_dia[fecha].append(fila)
+
+    resultado = {}
+    for fecha, filas in por_dia.items():
+        apertura, _ = horario_del_dia(fecha)
+        estilistas = sorted({fila[1] for fila in filas})
+        posiciones = {pk: i for i, pk in enumerate(estilistas)}
+        ocupados = np.zeros((len(estilistas), BLOQUES_POR_DIA + 1), dtype=np.int16)
+        ids = np.zeros((len(estilistas), BLOQUES_POR_DIA), dtype=np.int64)
+        detalle = {}
+        if filas:
+            cita_ids, estilista_ids, inicios, reales, previstas = zip(*(fila[:5] for fila in filas))
+            filas_matriz = np.array([posiciones[pk] for pk in estilista_ids])
+            minutos = np.array([(inicio - apertura).total_seconds() / 60 for inicio in inicios])
+            duraciones = np.array([real or prevista for real, prevista in zip(reales, previstas)])
+            # Bloques que toca cada cita (aunque sea en parte), recortados al horario de atención
+            desde = np.clip(np.floor(minutos / INTERVALO_MINUTOS), 0, BLOQUES_POR_DIA).astype(np.int64)
+            hasta = np.clip(np.ceil((minutos + duraciones) / INTERVALO_MINUTOS), 0, BLOQUES_POR_DIA).astype(np.int64)
+            # Diferencias acumuladas: +1 donde empieza cada cita y -1 donde termina
+            np.add.at(ocupados, (filas_matriz, desde), 1)
+            np.add.at(ocupados, (filas_matriz, hasta), -1)
+            for fila, inicio_bloque, fin_bloque, cita_id in zip(filas_matriz, desde, hasta, cita_ids):
+                ids[fila, inicio_bloque:fin_bloque] = cita_id
+            for cita_id, _, inicio, real, prevista, estado, nombre, apellido, servicio in filas:
+                detalle[cita_id] = {
+                    'cliente': f'{nombre} {apellido}',
+                    'servicio': servicio,
+                    'estado': estado,
+                    'inicio': timezone.localtime(inicio).strftime('%H:%M'),
+                    'fin': timezone.localtime(inicio + timedelta(minutes=real or prevista)).strftime('%H:%M'),
+                }
+        resultado[fecha] = OcupacionDia(
+            fecha=fecha,
+            estilistas=estilistas,
+            ocupados=np.cumsum(ocupados, axis=1)[:, :BLOQUES_POR_DIA].astype(np.int8),
+            citas=ids,
+            detalle=detalle,
+        )
+    return resultado
+
+
+def ocupacion_semana(fecha):
+    """Ocupación de los siete días de la semana de `fecha`, desde la caché cuando se puede."""
+    lunes = inicio_semana(fecha)
+    fechas = [lunes + timedelta(days=i) for i in range(7)]
+    claves = {fecha: _clave_dia(fecha) for fecha in fechas}
+    guardadas = cache.get_many(list(claves.values()))
+    semana = {fecha: guardadas[clave] for fecha, clave in claves.items() if clave in guardadas}
+
+    faltantes = [fecha for fecha in fechas if fecha not in semana]
+    if faltantes:
+        calculadas = calcular_ocupacion(faltantes)
+        cache.set_many({claves[fecha]: dia for fecha, dia in calculadas.items()}, DURACION_CACHE)
+        semana.update(calculadas)
+    return [semana[fecha] for fecha in fechas]
+
+
+def bloques_fila(dia, estilista_id):
+    """Agrupa los bloques consecutivos de una misma cita de un estilista.
+
+    Devuelve una lista de (cantidad de bloques, id de la cita o 0, superpuesta).
+    """
+    fila = dia.fila(estilista_id)
+    if fila is None:
+        return [(BLOQUES_POR_DIA, 0, False)]
+    ids = dia.citas[fila]
+    cortes = np.flatnonzero(np.diff(ids)) + 1
+    limites = np.concatenate(([0], cortes, [BLOQUES_POR_DIA]))
+    superpuestos = dia.ocupados[fila] > 1
+    return [
+        (int(fin - inicio), int(ids[inicio]), bool(superpuestos[inicio:fin].any()))
+        for inicio, fin in zip(limites[:-1], limites[1:])
+    ]
+
+
+def _invalidar_dia(valor):
+    if valor is not None:
+        invalidar(f'{VERSION}:{timezone.localdate(valor).isoformat()}')
+
+
+def _recordar_fecha(sender, instance, **kwargs):
+    # Sin leer el campo si fue diferido, para no generar una consulta por instancia
+    instance._fecha_cita_original = instance.__dict__.get('fecha_cita')
+
+
+def _cita_modificada(sender, instance, **kwargs):
+    _invalidar_dia(getattr(instance, '_fecha_cita_original', None))
+    _invalidar_dia(instance.fecha_cita)
+    instance._fecha_cita_original = instance.fecha_cita
+
+
+def _citas_registradas(sender, citas, **kwargs):
+    for dia in {timezone.localdate(cita.fecha_cita) for cita in citas}:
+        invalidar(f'{VERSION}:{dia.isoformat()}')
+
+
+def _invalidar_todo(sender, **kwargs):
+    invalidar(VERSION)
+
+
+post_init.connect(_recordar_fecha, sender=Cita, dispatch_uid='ocupacion_cita_init')
+post_save.connect(_cita_modificada, sender=Cita, dispatch_uid='ocupacion_cita_guardada')
+post_delete.connect(_cita_modificada, sender=Cita, dispatch_uid='ocupacion_cita_eliminada')
+citas_registradas.connect(_citas_registradas, dispatch_uid='ocupacion_citas_registradas')
+for _modelo in (Servicio, Colaborador, Cliente):
+    post_save.connect(_invalidar_todo, sender=_modelo, dispatch_uid=f'ocupacion_{_modelo.__name__}_guardado')
+    post_delete.connect(_invalidar_todo, sender=_modelo, dispatch_uid=f'ocupacion_{_modelo.__name__}_eliminado')
@@ -0,0 +1,232 @@
+"""Motor de precios de servicios y productos.
+
+Las reglas de descuento se definen en `settings.PRECIOS_REGLAS` y se
+compilan una sola vez (conjuntos de categorías, fechas y porcentajes ya
+convertidos). `cotizar` recibe una lista de solicitudes
+(cliente, servicio, productos, fecha), trae con una consulta por modelo los
+clientes, servicios y productos indicados por id, y calcula todas las
+cotizaciones en memoria.
+
+Tipos de regla:
+
+- `cumpleanos`: descuento sobre el servicio si la fecha coincide con el
+  cumpleaños del cliente.
+- `promocion`: descuento sobre los servicios de ciertas `categorias` o ids
+  (`servicios`), opcionalmente limitado a un rango `desde`/`hasta` y a
+  ciertos `dias_semana` (0 = lunes).
+- `paquete`: descuento sobre los servicios de un mismo cliente y día cuando
+  en el lote están todas las `categorias` del paquete (por ejemplo, corte +
+  tinte registrados juntos).
+- `categoria`: descuento sobre los servicios de `categorias` o sobre los
+  productos de `categorias_producto`.
+
+Cada regla indica un `porcentaje` o un `monto` fijo. Entre las reglas que
+aplican a un mismo servicio se usa el mayor descuento, salvo las marcadas
+con `acumulable`, que se suman.
+"""
+from dataclasses import dataclass, field
+from datetime import date
+from decimal import Decimal
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.utils import timezone
+
+from clientes.cumpleanos import es_cumpleanos
+from clientes.models import Cliente
+from inventario.models import Producto
+
+from .models import Servicio
+
+REGLAS_POR_DEFECTO = [
+    {'tipo': 'cumpleanos', 'nombre': 'Descuento Cumpleaños', 'porcentaje': 20},
+]
+TIPOS_REGLA = ('cumpleanos', 'promocion', 'paquete', 'categoria')
+CENTAVOS = Decimal('0.01')
+
+
+@dataclass
+class SolicitudPrecio:
+    """Lo que se quiere cotizar. Cliente, servicio y productos pueden ser instancias o ids."""
+    cliente: object
+    servicio: object
+    productos: list = field(default_factory=list)
+    fecha: object = None
+
+
+@dataclass
+class Cotizacion:
+    """Precio calculado de una solicitud."""
+    cliente: Cliente
+    servicio: Servicio
+    productos: list
+    fecha: date
+    precio_base: Decimal
+    descuento_servicio: Decimal = Decimal('0')
+    total_productos: Decimal = Decimal('0')
+    descuento_productos: Decimal = Decimal('0')
+    # (nombre de la regla, monto descontado)
+    descuentos: list = field(default_factory=list)
+    es_cumpleanos: bool = False
+
+    @property
+    def precio_servicio(self):
+        return self.precio_base - self.descuento_servicio
+
+    @property
+    def descuento(self):
+        return self.descuento_servicio + self.descuento_productos
+
+    @property
+    def total(self):
+        return self.precio_servicio + self.total_productos - self.descuento_productos
+
+
+class Regla:
+    """Regla de descuento compilada a partir de un diccionario de configuración."""
+
+    def __init__(self, config):
+        self.tipo = config.get('tipo')
+        if self.tipo not in TIPOS_REGLA:
+            raise ImproperlyConfigured(f"PRECIOS_REGLAS: tipo de regla desconocido {self.tipo!r}.")
+        if ('porcentaje' in config) == ('monto' in config):
+            raise ImproperlyConfigured(f"PRECIOS_REGLAS: la regla {config!r} debe indicar 'porcentaje' o 'monto'.")
+        self.nombre = config.get('nombre', self.tipo.capitalize())
+        self.porcentaje = Decimal(str(config['porcentaje'])) / 100 if 'porcentaje' in config else None
+        self.monto = Decimal(str(config['monto'])) if 'monto' in config else None
+        self.acumulable = bool(config.get('acumulable', False))
+        self.categorias = frozenset(config.get('categorias', ()))
+        self.servicios = frozenset(config.get('servicios', ()))
+        self.categorias_producto = frozenset(config.get('categorias_producto', ()))
+        self.dias_semana = frozenset(config.get('dias_semana', ()))
+        self.desde = date.fromisoformat(config['desde']) if config.get('desde') else None
+        self.hasta = date.fromisoformat(config['hasta']) if config.get('hasta') else None
+        if self.tipo == 'paquete' and len(self.categorias) < 2:
+            raise ImproperlyConfigured(f"PRECIOS_REGLAS: el paquete {self.nombre!r} necesita al menos dos categorías.")
+
+    def monto_descuento(self, precio):
+        descuento = precio * self.porcentaje if self.porcentaje is not None else self.monto
+        return min(descuento, precio).quantize(CENTAVOS)
+
+    def _vigente(self, fecha):
+        return ((self.desde is None or fecha >= self.desde) and (self.hasta is None or fecha <= self.hasta)
+                and (not self.dias_semana or fecha.weekday() in self.dias_semana))
+
+    def _incluye_servicio(self, servicio):
+        if not self.categorias and not self.servicios:
+            return self.tipo in ('cumpleanos', 'promocion')
+        return servicio.categoria in self.categorias or servicio.pk in self.servicios
+
+    def aplica_a_servicio(self, cotizacion, categorias_sesion):
+        if not self._vigente(cotizacion.fecha):
+            return False
+        if self.tipo == 'cumpleanos':
+            return cotizacion.es_cumpleanos and self._incluye_servicio(cotizacion.servicio)
+        if self.tipo == 'paquete':
+            return self.categorias <= categorias_sesion and cotizacion.servicio.categoria in self.categorias
+        return self._incluye_servicio(cotizacion.servicio)
+
+    def aplica_a_producto(self, cotizacion, producto):
+        return (self.tipo == 'categoria' and producto.categoria in self.categorias_producto
+                and self._vigente(cotizacion.fecha))
+
+
+class MotorPrecios:
+    """Conjunto de reglas compiladas."""
+
+    def __init__(self, configuracion):
+        self.reglas = [Regla(config) for config in configuracion]
+        self.reglas_servicio = [r for r in self.reglas if r.tipo != 'categoria' or r.categorias or r.servicios]
+        self.reglas_producto = [r for r in self.reglas if r.categorias_producto]
+
+    def _aplicar(self, cotizacion, categorias_sesion):
+        # Servicio: el mayor de los descuentos no acumulables más los acumulables
+        aplicables = [r for r in self.reglas_servicio if r.aplica_a_servicio(cotizacion, categorias_sesion)]
+        mejor = max((r for r in aplicables if not r.acumulable),
+                    key=lambda r: r.monto_descuento(cotizacion.precio_base), default=None)
+        elegidas = ([mejor] if mejor else []) + [r for r in aplicables if r.acumulable]
+        for regla in elegidas:
+            monto = min(regla.monto_descuento(cotizacion.precio_base),
+                        cotizacion.precio_base - cotizacion.descuento_servicio)
+            if monto:
+                cotizacion.descuento_servicio += monto
+                cotizacion.descuentos.append((regla.nombre, monto))
+
+        # Productos: cada producto con el mayor descuento de su categoría
+        for producto in cotizacion.productos:
+            cotizacion.total_productos += producto.precio_venta
+            reglas = [r for r in self.reglas_producto if r.aplica_a_producto(cotizacion, producto)]
+            if reglas:
+                regla = max(reglas, key=lambda r: r.monto_descuento(producto.precio_venta))
+                monto = regla.monto_descuento(producto.precio_venta)
+                cotizacion.descuento_productos += monto
+                cotizacion.descuentos.append((f'{regla.nombre} ({producto.nombre})', monto))
+
+    def cotizar(self, solicitudes):
+        """Cotiza todas las solicitudes juntas (ver `SolicitudPrecio`)."""
+        solicitudes = list(solicitudes)
+        clientes = _resolver(Cliente, [s.cliente for s in solicitudes])
+        servicios = _resolver(Servicio, [s.servicio for s in solicitudes])
+        productos = _resolver(Producto, [p for s in solicitudes for p in s.productos])
+        hoy = timezone.localdate()
+
+        cotizaciones = []
+        for solicitud in solicitudes:
+            cliente = clientes[_pk(solicitud.cliente)]
+            servicio = servicios[_pk(solicitud.servicio)]
+            fecha = solicitud.fecha or hoy
+            if hasattr(fecha, 'tzinfo'):
+                fecha = timezone.localdate(fecha) if timezone.is_aware(fecha) else fecha.date()
+            cotizaciones.append(Cotizacion(
+                cliente=cliente,
+                servicio=servicio,
+                productos=[productos[_pk(p)] for p in solicitud.productos],
+                fecha=fecha,
+                precio_base=servicio.precio_base,
+                es_cumpleanos=es_cumpleanos(cliente.fecha_nacimiento, fecha),
+            ))
+
+        # Categorías de servicio de cada sesión (mismo cliente y día), para los paquetes
+        sesiones = {}
+        for cotizacion in cotizaciones:
+            sesiones.setdefault((cotizacion.cliente.pk, cotizacion.fecha), set()).add(cotizacion.servicio.categoria)
+        for cotizacion in cotizaciones:
+            self._aplicar(cotizacion, sesiones[(cotizacion.cliente.pk, cotizacion.fecha)])
+        return cotizaciones
+
+
+def _pk(valor):
+    return getattr(valor, 'pk', valor)
+
+
+def _resolver(modelo, valores):
+    """id -> instancia; las instancias recibidas se usan tal cual y el resto se trae con una consulta."""
+    instancias = {v.pk: v for v in valores if isinstance(v, modelo)}
+    faltantes = {v for v in valores if not isinstance(v, modelo)} - set(instancias)
+    if faltantes:
+        encontradas = modelo.objects.in_bulk(faltantes)
+        if len(encontradas) < len(faltantes):
+            ausentes = ', '.join(str(pk) for pk in sorted(faltantes - set(encontradas), key=str))
+            raise modelo.DoesNotExist(f'{modelo._meta.verbose_name} no encontrado: {ausentes}')
+        instancias.update(encontradas)
+    return instancias
+
+
+@lru_cache(maxsize=1)
+def motor():
+    """Motor con las reglas de `settings.PRECIOS_REGLAS`, compiladas una vez por proceso."""
+    return MotorPrecios(getattr(settings, 'PRECIOS_REGLAS', REGLAS_POR_DEFECTO))
+
+
+def cotizar(solicitudes):
+    return motor().cotizar(solicitudes)
+
+
+def _reglas_modificadas(setting, **kwargs):
+    if setting == 'PRECIOS_REGLAS':
+        motor.cache_clear()
+
+
+setting_changed.connect(_reglas_modificadas, dispatch_uid='precios_reglas_modificadas')
@@ -0,0 +1,81 @@
+"""Registro en bloque de varias citas para un mismo cliente.
+
+Una sesión combinada (corte + tinte + tratamiento) crea una cita por
+servicio, una a continuación de la otra con el mismo estilista. Los precios
+de todos los servicios se calculan juntos con `servicios.precios` (así
+aplican los paquetes) y las citas se insertan con un solo `bulk_create`,
+después de revisar en la agenda que el estilista tiene libre todo el bloque.
+"""
+from datetime import timedelta
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from colaboradores.models import Colaborador
+
+from .agenda import cargar_para_validar
+from .models import Cita
+from .precios import SolicitudPrecio, cotizar
+from .signals import citas_registradas
+
+
+class HorarioOcupadoError(ValidationError):
+    """El estilista ya tiene una cita en el horario de la sesión."""
+
+
+def _asignar_pks(citas):
+    """Recupera los `pk` que `bulk_create` no devuelve en algunos motores (MySQL).
+
+    Se llama dentro de la transacción que insertó las citas, con el estilista
+    bloqueado: ninguna otra cita activa suya puede ocupar esos horarios, así
+    que cliente, estilista, estado y hora de inicio identifican a cada una.
+    """
+    cita = citas[0]
+    pks = dict(
+        Cita.objects.filter(
+            cliente_id=cita.cliente_id,
+            estilista_id=cita.estilista_id,
+            estado=cita.estado,
+            fecha_cita__in=[c.fecha_cita for c in citas],
+        ).values_list('fecha_cita', 'id')
+    )
+    for cita in citas:
+        cita.pk = pks[cita.fecha_cita]
+        cita._state.adding = False
+
+
+def registrar_citas(cliente, servicios, estilista, fecha_cita, observaciones='', estado='completada'):
+    """Crea una cita por cada servicio, seguidas desde `fecha_cita`, y las devuelve con cliente y servicio cargados.
+
+    Lanza `HorarioOcupadoError` si el estilista no tiene libre el bloque completo.
+    """
+    cotizaciones = cotizar([SolicitudPrecio(cliente, servicio, fecha=fecha_cita) for servicio in servicios])
+    citas = []
+    inicio = fecha_cita
+    for cotizacion in cotizaciones:
+        citas.append(Cita(
+            cliente=cliente,
+            servicio=cotizacion.servicio,
+            estilista=estilista,
+            fecha_cita=inicio,
+            observaciones=observaciones,
+            estado=estado,
+            precio_final=cotizacion.total,
+            descuento_aplicado=cotizacion.descuento_servicio,
+        ))
+        inicio += timedelta(minutes=cotizacion.servicio.duracion_minutos)
+    if not citas:
+        return []
+
+    duracion = int((inicio - fecha_cita).total_seconds() // 60)
+    with transaction.atomic():
+        # Con el estilista bloqueado, dos registros simultáneos no pueden tomar el mismo horario
+        Colaborador.objects.select_for_update().get(pk=estilista.pk)
+        mensaje = cargar_para_validar(estilista, fecha_cita).mensaje_conflicto(estilista.pk, fecha_cita, duracion)
+        if mensaje:
+            raise HorarioOcupadoError(mensaje)
+        Cita.objects.bulk_create(citas)
+        if any(cita.pk is None for cita in citas):
+            _asignar_pks(citas)
+        citas_registradas.send(sender=Cita, citas=citas)
+    return citas
@@ -0,0 +1,10 @@
+from django.dispatch import Signal
+
+# Se envía después de guardar citas con `bulk_create` (que no dispara
+# post_save). Argumento `citas`: lista de `Cita` creadas, con su `pk`.
+citas_registradas = Signal()
+
+# Se envía después de registrar en bloque los productos consumidos en una cita
+# (ver `servicios.consumo`), antes de recalcular su precio final. Argumentos
+# `cita` y `consumos`: lista de `ProductoConsumido` creados.
+consumos_registrados = Signal()
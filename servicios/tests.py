@@ -1,3 +1,325 @@
-from django.test import TestCase
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from unittest import skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from clientes.models import Cliente
+from core.contadores import calcular_contadores
+from core.fechas import rango_dia_local
+from core.models import ContadorDashboard
+from colaboradores.models import Colaborador
+from inventario.models import Producto, MovimientoInventario
+from inventario.stock import StockInsuficienteError
+from usuarios.models import AccionHistorial
+
+from .agenda import Agenda, HORA_APERTURA, INTERVALO_MINUTOS
+from .consumo import registrar_consumo
+from .forms import CitaForm
+from .models import Servicio, Cita
+from .ocupacion import calcular_ocupacion, ocupacion_disponible, ocupacion_semana
+from .precios import SolicitudPrecio, cotizar
+from .registro import HorarioOcupadoError, _asignar_pks, registrar_citas
+
+
+def crear_cita(**kwargs):
+    cliente = Cliente.objects.create(rut='11111111-1', nombre='Ana', apellido='Pérez',
+                                     fecha_nacimiento=date(1990, 1, 1))
+    estilista = Colaborador.objects.create(rut='22222222-2', nombre='Luz', apellido='Soto', email='luz@example.com',
+                                           telefono='123', cargo='estilista', fecha_contratacion=date(2020, 1, 1),
+                                           sueldo=Decimal('500000'))
+    servicio = Servicio.objects.create(nombre='Corte', categoria='corte', precio_base=Decimal('10000'))
+    datos = {
+        'cliente': cliente,
+        'servicio': servicio,
+        'estilista': estilista,
+        # Fuera del cumpleaños del cliente, para que no haya descuento
+        'fecha_cita': timezone.make_aware(datetime(2030, 6, 1, 10)),
+    }
+    datos.update(kwargs)
+    return Cita.objects.create(**datos)
+
+
+def crear_producto(nombre, stock_actual, precio_venta='2000'):
+    return Producto.objects.create(nombre=nombre, categoria='champu', precio_costo=Decimal('1000'),
+                                   precio_venta=Decimal(precio_venta), stock_actual=stock_actual, stock_minimo=1)
+
+
+class RegistrarConsumoTest(TestCase):
+
+    def setUp(self):
+        self.usuario = User.objects.create_user('estilista', password='x')
+        self.cita = crear_cita()
+        self.champu = crear_producto('Champú', 10)
+        self.tinte = crear_producto('Tinte', 3, precio_venta='5000')
+
+    def test_registra_todas_las_lineas_y_recalcula_el_precio_una_vez(self):
+        consumos = registrar_consumo(self.cita, [(self.champu.pk, 2), (self.tinte.pk, 1), (self.champu.pk, 1)],
+                                     self.usuario)
+
+        self.assertEqual(len(consumos), 2)
+        self.champu.refresh_from_db()
+        self.tinte.refresh_from_db()
+        self.assertEqual((self.champu.stock_actual, self.tinte.stock_actual), (7, 2))
+        self.assertEqual(MovimientoInventario.objects.filter(tipo_movimiento='salida').count(), 2)
+        self.cita.refresh_from_db()
+        self.assertEqual(self.cita.precio_final, Decimal('10000') + 3 * Decimal('2000') + Decimal('5000'))
+
+    def test_stock_insuficiente_no_guarda_nada(self):
+        with self.assertRaises(StockInsuficienteError):
+            registrar_consumo(self.cita, [(self.champu.pk, 2), (self.tinte.pk, 4)], self.usuario)
+
+        self.champu.refresh_from_db()
+        self.assertEqual(self.champu.stock_actual, 10)
+        self.assertFalse(self.cita.productos_consumidos.exists())
+        self.assertFalse(MovimientoInventario.objects.exists())
+        self.cita.refresh_from_db()
+        self.assertEqual(self.cita.precio_final, Decimal('10000'))
+
+    def test_vista_registra_la_accion_sobre_la_cita(self):
+        self.usuario.is_superuser = True
+        self.usuario.save()
+        self.client.force_login(self.usuario)
+        datos = {'lineas-TOTAL_FORMS': 1, 'lineas-INITIAL_FORMS': 0,
+                 'lineas-0-producto': self.champu.pk, 'lineas-0-cantidad': 2}
+
+        self.client.post(reverse('servicios:agregar_producto_consumido', args=[self.cita.pk]), datos)
+
+        accion = AccionHistorial.objects.get(accion='agregar_producto_consumido')
+        self.assertEqual((accion.modelo, accion.objeto_id), ('Cita', str(self.cita.pk)))
+
+
+class RegistrarCitasTest(TestCase):
+
+    def setUp(self):
+        cita = crear_cita()
+        self.cliente, self.estilista = cita.cliente, cita.estilista
+        cita.delete()
+        self.servicios = [
+            Servicio.objects.create(nombre='Tinte', categoria='tinte', precio_base=Decimal('2000')),
+            Servicio.objects.create(nombre='Tratamiento', categoria='tratamiento', precio_base=Decimal('1500')),
+        ]
+
+    def test_inserta_todas_las_citas_con_el_descuento_de_cumpleanos(self):
+        cumpleanos = timezone.make_aware(datetime(2030, 1, 1, 10))
+        with CaptureQueriesContext(connection) as consultas:
+            citas = registrar_citas(self.cliente, self.servicios, self.estilista, cumpleanos)
+
+        inserciones = [c for c in consultas if c['sql'].startswith('INSERT') and 'servicios_cita' in c['sql']]
+        self.assertEqual(len(inserciones), 1)
+
+        self.assertTrue(all(cita.pk for cita in citas))
+        self.assertEqual(
+            sorted(Cita.objects.values_list('precio_final', 'descuento_aplicado')),
+            [(Decimal('1200'), Decimal('300')), (Decimal('1600'), Decimal('400'))]
+        )
+        self.assertEqual(calcular_contadores()['citas:estado:completada'],
+                         ContadorDashboard.objects.get(clave='citas:estado:completada').valor)
+
+    def test_recupera_los_pk_si_la_base_no_los_devuelve(self):
+        citas = registrar_citas(self.cliente, self.servicios, self.estilista, timezone.now())
+        esperados = [cita.pk for cita in citas]
+        for cita in citas:
+            cita.pk = None
+
+        _asignar_pks(citas)
+
+        self.assertEqual([cita.pk for cita in citas], esperados)
+
+    def test_las_citas_van_seguidas_y_respetan_la_agenda(self):
+        inicio = timezone.make_aware(datetime(2030, 6, 1, 10))
+        tinte, tratamiento = registrar_citas(self.cliente, self.servicios, self.estilista, inicio)
+        self.assertEqual(tratamiento.fecha_cita, inicio + timedelta(minutes=tinte.servicio.duracion_minutos))
+
+        # Otra sesión que empieza durante el tratamiento choca con él
+        with self.assertRaises(HorarioOcupadoError):
+            registrar_citas(self.cliente, self.servicios[:1], self.estilista, tratamiento.fecha_cita)
+        self.assertEqual(Cita.objects.count(), 2)
+
+
+class AgendaTest(TestCase):
+
+    def setUp(self):
+        self.cita = crear_cita()  # 01/06/2030 10:00, servicio de 30 minutos
+        self.estilista = self.cita.estilista
+        self.fecha = timezone.localdate(self.cita.fecha_cita)
+        self.a_las = lambda hora, minuto=0: timezone.make_aware(datetime(2030, 6, 1, hora, minuto))
+
+    def test_horario_libre_y_ocupado(self):
+        agenda = Agenda.cargar(self.fecha)
+
+        self.assertFalse(agenda.esta_libre(self.estilista.pk, self.a_las(9, 45), 30))
+        self.assertFalse(agenda.esta_libre(self.estilista.pk, self.a_las(10, 15), 30))
+        self.assertTrue(agenda.esta_libre(self.estilista.pk, self.a_las(9, 30), 30))
+        self.assertTrue(agenda.esta_libre(self.estilista.pk, self.a_las(10, 30), 30))
+        self.assertEqual(agenda.estilistas_libres(self.a_las(10), 30), [])
+
+    def test_citas_superpuestas_y_canceladas(self):
+        # Una cita larga anterior que envuelve a otra más corta
+        Cita.objects.create(cliente=self.cita.cliente, servicio=self.cita.servicio, estilista=self.estilista,
+                            fecha_cita=self.a_las(9), duracion_real_minutos=180)
+        Cita.objects.create(cliente=self.cita.cliente, servicio=self.cita.servicio, estilista=self.estilista,
+                            fecha_cita=self.a_las(14), estado='cancelada')
+        agenda = Agenda.cargar(self.fecha)
+
+        self.assertFalse(agenda.esta_libre(self.estilista.pk, self.a_las(11, 30), 30))
+        self.assertEqual(len(agenda.conflictos(self.estilista.pk, self.a_las(10), 15)), 2)
+        self.assertTrue(agenda.esta_libre(self.estilista.pk, self.a_las(14), 30))
+        self.assertEqual(agenda.proximos_horarios(30, desde=self.a_las(8), cantidad=1)[0][0], self.a_las(12))
+
+    def test_cita_form_rechaza_horario_ocupado(self):
+        datos = {
+            'cliente': self.cita.cliente.pk,
+            'servicio': self.cita.servicio.pk,
+            'estilista': self.estilista.pk,
+            'fecha_cita': '2030-06-01 10:15',
+        }
+        form = CitaForm(datos)
+        self.assertFalse(form.is_valid())
+        self.assertIn('10:00 a 10:30', form.errors['fecha_cita'][0])
+
+        # Al modificar la propia cita no choca consigo misma
+        self.assertTrue(CitaForm(datos, instance=self.cita).is_valid())
+
+    def test_cita_form_considera_la_cita_de_la_noche_anterior(self):
+        Cita.objects.create(cliente=self.cita.cliente, servicio=self.cita.servicio, estilista=self.estilista,
+                            fecha_cita=self.a_las(23) - timedelta(days=1), duracion_real_minutos=120)
+        datos = {
+            'cliente': self.cita.cliente.pk,
+            'servicio': self.cita.servicio.pk,
+            'estilista': self.estilista.pk,
+            'fecha_cita': '2030-06-01 00:15',
+        }
+        self.assertFalse(CitaForm(datos).is_valid())
+
+    def test_guardar_revisa_de_nuevo_el_horario(self):
+        datos = {
+            'cliente': self.cita.cliente.pk,
+            'servicio': self.cita.servicio.pk,
+            'estilista': self.estilista.pk,
+            'fecha_cita': '2030-06-01 12:00',
+        }
+        form = CitaForm(datos)
+        self.assertTrue(form.is_valid())
+        # Otra cita toma el horario entre la validación y el guardado
+        Cita.objects.create(cliente=self.cita.cliente, servicio=self.cita.servicio, estilista=self.estilista,
+                            fecha_cita=self.a_las(12))
+
+        self.assertFalse(form.guardar(form.save(commit=False)))
+        self.assertIn('fecha_cita', form.errors)
+        self.assertEqual(Cita.objects.filter(fecha_cita=self.a_las(12)).count(), 1)
+
+
+@skipUnless(ocupacion_disponible(), 'requiere numpy')
+class OcupacionSemanaTest(TestCase):
+
+    def setUp(self):
+        self.cita = crear_cita()  # 01/06/2030 10:00, servicio de 30 minutos
+        self.fecha = timezone.localdate(self.cita.fecha_cita)
+
+    def test_grilla_por_bloques_y_superposiciones(self):
+        Cita.objects.create(cliente=self.cita.cliente, servicio=self.cita.servicio, estilista=self.cita.estilista,
+                            fecha_cita=self.cita.fecha_cita + timedelta(minutes=20))
+        dia = calcular_ocupacion([self.fecha])[self.fecha]
+        fila = dia.fila(self.cita.estilista.pk)
+        desde = (10 - HORA_APERTURA.hour) * 60 // INTERVALO_MINUTOS
+
+        self.assertEqual(dia.ocupados[fila, desde:desde + 5].tolist(), [1, 2, 1, 1, 0])
+        self.assertEqual(dia.ocupados[fila].sum(), 5)
+
+    def test_solo_se_recalcula_el_dia_modificado(self):
+        ocupacion_semana(self.fecha)
+        with self.assertNumQueries(0):
+            ocupacion_semana(self.fecha)
+
+        self.cita.fecha_cita += timedelta(days=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cita.save()
+        with CaptureQueriesContext(connection) as consultas:
+            semana = ocupacion_semana(self.fecha)
+
+        self.assertEqual(len(consultas), 1)
+        ocupados = {dia.fecha: int(dia.ocupados.sum()) for dia in semana}
+        self.assertEqual(ocupados[self.fecha], 0)
+        self.assertEqual(ocupados[self.fecha + timedelta(days=1)], 2)
+
+    def test_cambio_de_cliente_descarta_las_grillas(self):
+        ocupacion_semana(self.fecha)
+        cliente = self.cita.cliente
+        cliente.nombre = 'Renombrada'
+        with self.captureOnCommitCallbacks(execute=True):
+            cliente.save()
+
+        dia = ocupacion_semana(self.fecha)[self.fecha.weekday()]
+        self.assertTrue(dia.detalle[self.cita.pk]['cliente'].startswith('Renombrada '))
+
+
+class MotorPreciosTest(TestCase):
+
+    def setUp(self):
+        cita = crear_cita()
+        self.cliente, self.corte = cita.cliente, cita.servicio
+        self.tinte = Servicio.objects.create(nombre='Tinte', categoria='tinte', precio_base=Decimal('2000'))
+        self.champu = crear_producto('Champú', 10, precio_venta='1000')
+        self.martes = date(2030, 6, 4)
+
+    def test_cumpleanos_por_defecto_y_consultas_por_lote(self):
+        with self.assertNumQueries(3):
+            normal, cumpleanos = cotizar([
+                SolicitudPrecio(self.cliente.pk, self.corte.pk, [self.champu.pk], self.martes),
+                SolicitudPrecio(self.cliente.pk, self.tinte.pk, [], date(2030, 1, 1)),
+            ])
+
+        self.assertEqual(normal.total, Decimal('11000'))
+        self.assertEqual(cumpleanos.descuentos, [('Descuento Cumpleaños', Decimal('400'))])
+        self.assertEqual(cumpleanos.total, Decimal('1600'))
+
+    @override_settings(PRECIOS_REGLAS=[
+        {'tipo': 'promocion', 'nombre': 'Martes de color', 'porcentaje': 15, 'categorias': ['tinte'], 'dias_semana': [1]},
+        {'tipo': 'paquete', 'nombre': 'Corte + Tinte', 'porcentaje': 10, 'categorias': ['corte', 'tinte']},
+        {'tipo': 'categoria', 'nombre': 'Champús', 'monto': 100, 'categorias_producto': ['champu'],
+         'acumulable': True},
+    ])
+    def test_promociones_paquetes_y_categorias(self):
+        corte, tinte = cotizar([
+            SolicitudPrecio(self.cliente, self.corte, [self.champu], self.martes),
+            SolicitudPrecio(self.cliente, self.tinte, [], self.martes),
+        ])
+
+        # En el tinte gana la promoción (15%) sobre el paquete (10%)
+        self.assertEqual(tinte.descuentos, [('Martes de color', Decimal('300'))])
+        self.assertEqual(corte.descuento_servicio, Decimal('1000'))
+        self.assertEqual(corte.descuento_productos, Decimal('100'))
+        self.assertEqual(corte.total, Decimal('9900'))
+
+        # Sin el tinte en la misma sesión no hay paquete
+        solo_corte, = cotizar([SolicitudPrecio(self.cliente, self.corte, [], self.martes)])
+        self.assertEqual(solo_corte.total, Decimal('10000'))
+
+    @override_settings(PRECIOS_REGLAS=[{'tipo': 'regalo', 'porcentaje': 5}])
+    def test_regla_desconocida(self):
+        with self.assertRaises(ImproperlyConfigured):
+            cotizar([SolicitudPrecio(self.cliente, self.corte)])
+
+
+class IndicesCitaTest(TestCase):
+    """Los filtros por día usan rangos sobre `fecha_cita`, que aprovechan los índices compuestos."""
+
+    def setUp(self):
+        self.cita = crear_cita()
+        self.desde, self.hasta = rango_dia_local(timezone.localdate(self.cita.fecha_cita))
+
+    def test_citas_del_dia_de_un_estilista(self):
+        plan = Cita.objects.filter(estilista=self.cita.estilista, fecha_cita__gte=self.desde,
+                                   fecha_cita__lt=self.hasta).explain()
+        self.assertIn('serv_cita_estilista_fecha_idx', plan)
+
+    def test_citas_por_estado_desde_una_fecha(self):
+        plan = Cita.objects.filter(estado='programada', fecha_cita__gte=self.desde).explain()
+        self.assertIn('serv_cita_estado_fecha_idx', plan)
@@ -9,10 +9,14 @@ urlpatterns = [
     path('modificar/<int:pk>/', views.modificar_servicio, name='modificar_servicio'),
     path('baja/<int:pk>/', views.dar_baja_servicio, name='dar_baja_servicio'),
     path('calcular/', views.calcular_servicio, name='calcular_servicio'),
+    path('cotizar/', views.cotizar_lote, name='cotizar_lote'),
     path('registrar/', views.registrar_servicio, name='registrar_servicio'),
     path('registrar-multiple/', views.registrar_servicios_multiple, name='registrar_servicios_multiple'),
     path('eliminar/<int:pk>/', views.eliminar_servicio, name='eliminar_servicio'),
     path('citas/', views.lista_citas, name='lista_citas'),
+    path('citas/calendario/', views.calendario_semanal, name='calendario_semanal'),
+    path('citas/calendario/datos/', views.calendario_semanal_datos, name='calendario_semanal_datos'),
+    path('citas/horarios-libres/', views.horarios_libres, name='horarios_libres'),
     path('citas/<int:pk>/', views.detalle_cita, name='detalle_cita'),
     path('citas/<int:cita_id>/agregar-producto/', views.agregar_producto_consumido, name='agregar_producto_consumido'),
     path('cumpleanos/', views.aviso_cumpleanos, name='aviso_cumpleanos'),
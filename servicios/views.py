@@ -1,17 +1,31 @@
 from django.shortcuts import render, get_object_or_404, redirect
+from django.core.exceptions import ObjectDoesNotExist
+from django.http import JsonResponse
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required, user_passes_test
 from usuarios.helpers import is_admin_user, has_any_role, registrar_accion
-from django.db.models import Q, Sum
+from django.db.models import Count, Q, Sum
 from django.utils import timezone
 from datetime import datetime, timedelta
-from decimal import Decimal
 from clientes.models import Cliente
+from clientes.cumpleanos import cumpleanos_del_dia, cumpleanos_proximos
 from .models import Servicio, Cita, ProductoConsumido
-from .forms import ServicioForm, CitaForm, ProductoConsumidoForm, CalcularServicioForm, BuscarServicioForm
-from inventario.models import MovimientoInventario
+from .forms import ServicioForm, CitaForm, CalcularServicioForm, BuscarServicioForm, ConsumoProductosFormSet
+from .consumo import registrar_consumo
+from .registro import HorarioOcupadoError, registrar_citas
+from .precios import SolicitudPrecio, cotizar
+from .agenda import Agenda, DIAS_BUSQUEDA, INTERVALO_MINUTOS
+from .ocupacion import bloques_fila, horas_bloques, inicio_semana, ocupacion_disponible, ocupacion_semana
+from inventario.models import Producto
+from inventario.stock import StockInsuficienteError
 from .forms import RegistrarServiciosMultipleForm
 from colaboradores.models import Colaborador
+from core.fechas import inicio_del_dia, rango_dia_local
+from core.paginacion import paginar
+import json
+
+# Máximo de cotizaciones por llamada a `cotizar_lote`
+MAX_COTIZACIONES_LOTE = 200
 
 @login_required
 def lista_servicios(request):
@@ -23,8 +37,16 @@ def lista_servicios(request):
     else:
         servicios = Servicio.objects.filter(estado='activo')
     
+    pagina = paginar(request, servicios)
+    resumen = servicios.aggregate(
+        total=Count('id'),
+        activos=Count('id', filter=Q(estado='activo')),
+        categorias=Count('categoria', distinct=True),
+    )
     context = {
-        'servicios': servicios,
+        'servicios': pagina,
+        'pagina': pagina,
+        'resumen': resumen,
     }
     return render(request, 'servicios/listaServicios.html', context)
 
@@ -104,54 +126,76 @@ def eliminar_servicio(request, pk):
 def calcular_servicio(request):
     """Vista para calcular el costo de un servicio"""
     form = CalcularServicioForm(request.POST or None)
-    total = 0
-    descuento = 0
-    es_cumpleanos = False
+    cotizacion = None
     
     if request.method == 'POST' and form.is_valid():
-        cliente = form.cleaned_data['cliente']
-        servicio = form.cleaned_data['servicio']
-        fecha_cita = form.cleaned_data.get('fecha_cita')
-        productos_seleccionados = form.cleaned_data['productos']
-        
-        # Calcular total base
-        total = servicio.precio_base
-        
-        # Verificar si la fecha de la cita coincide con el cumpleaños del cliente
-        # Usar la fecha de la cita si se proporcionó, en caso contrario usar hoy
-        fecha_referencia = fecha_cita or timezone.now().date()
-        # Normalizar si la fecha_referencia viene como datetime
-        if hasattr(fecha_referencia, 'date'):
-            fecha_referencia = fecha_referencia.date()
-
-        if cliente.fecha_nacimiento:
-            try:
-                cumple_mes = cliente.fecha_nacimiento.month
-                cumple_dia = cliente.fecha_nacimiento.day
-                if (fecha_referencia.month == cumple_mes and fecha_referencia.day == cumple_dia):
-                    es_cumpleanos = True
-                    # usar Decimal para evitar mezclar Decimal y float
-                    descuento = (Decimal(total) * Decimal('0.20')) if total is not None else Decimal('0')
-                    total = Decimal(total) - descuento if total is not None else Decimal('0')
-            except Exception:
-                # proteger contra valores inesperados en fecha_nacimiento
-                es_cumpleanos = False
-                descuento = Decimal('0')
-        
-        # Agregar costo de productos
-        for producto in productos_seleccionados:
-            total += producto.precio_venta
+        # Si no se indica la fecha de la cita se cotiza para hoy
+        cotizacion, = cotizar([SolicitudPrecio(
+            cliente=form.cleaned_data['cliente'],
+            servicio=form.cleaned_data['servicio'],
+            productos=list(form.cleaned_data['productos']),
+            fecha=form.cleaned_data.get('fecha_cita'),
+        )])
     
     context = {
         'form': form,
-        'total': total,
-        'descuento': descuento,
-        'es_cumpleanos': es_cumpleanos,
-        'servicio_obj': servicio if request.method == 'POST' and form.is_valid() else None,
-        'productos_objs': list(productos_seleccionados) if request.method == 'POST' and form.is_valid() else [],
+        'cotizacion': cotizacion,
+        'total': cotizacion.total if cotizacion else 0,
+        'descuento': cotizacion.descuento if cotizacion else 0,
+        'es_cumpleanos': cotizacion.es_cumpleanos if cotizacion else False,
+        'servicio_obj': cotizacion.servicio if cotizacion else None,
+        'productos_objs': cotizacion.productos if cotizacion else [],
     }
     return render(request, 'servicios/calcularServicio.html', context)
 
+
+@login_required
+def cotizar_lote(request):
+    """Cotiza varias combinaciones de cliente, servicio, productos y fecha en una llamada.
+
+    Recibe por POST un JSON `{"cotizaciones": [{"cliente": 1, "servicio": 2,
+    "productos": [3, 4], "fecha": "2026-10-18"}, ...]}` y devuelve el precio
+    de cada una en el mismo orden. Las solicitudes de un mismo cliente y día
+    se consideran una sesión para los descuentos por paquete.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Use POST.'}, status=405)
+    try:
+        items = json.loads(request.body)['cotizaciones']
+        if not isinstance(items, list) or len(items) > MAX_COTIZACIONES_LOTE:
+            raise ValueError
+        solicitudes = [
+            SolicitudPrecio(
+                cliente=int(item['cliente']),
+                servicio=int(item['servicio']),
+                productos=[int(pk) for pk in item.get('productos', [])],
+                fecha=datetime.strptime(item['fecha'], '%Y-%m-%d').date() if item.get('fecha') else None,
+            )
+            for item in items
+        ]
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': f'Formato inválido (máximo {MAX_COTIZACIONES_LOTE} cotizaciones).'},
+                            status=400)
+    try:
+        cotizaciones = cotizar(solicitudes)
+    except ObjectDoesNotExist as error:
+        return JsonResponse({'error': str(error)}, status=404)
+
+    return JsonResponse({'cotizaciones': [
+        {
+            'cliente': c.cliente.pk,
+            'servicio': c.servicio.pk,
+            'fecha': c.fecha.isoformat(),
+            'precio_base': c.precio_base,
+            'descuento_servicio': c.descuento_servicio,
+            'total_productos': c.total_productos,
+            'descuento_productos': c.descuento_productos,
+            'descuentos': [{'regla': nombre, 'monto': monto} for nombre, monto in c.descuentos],
+            'total': c.total,
+        }
+        for c in cotizaciones
+    ]})
+
 @login_required
 @login_required
 @user_passes_test(lambda u: has_any_role(u, ['administrador', 'estilista', 'recepcionista']))
@@ -164,10 +208,9 @@ def registrar_servicio(request):
             cita.estado = 'completada'
             cita.duracion_real_minutos = cita.servicio.duracion_minutos
             cita.calcular_precio_final()
-            cita.save()
-            
-            messages.success(request, 'Servicio registrado exitosamente.')
-            return redirect('servicios:lista_citas')
+            if form_cita.guardar(cita):
+                messages.success(request, 'Servicio registrado exitosamente.')
+                return redirect('servicios:lista_citas')
     else:
         form_cita = CitaForm()
     
@@ -182,7 +225,8 @@ def registrar_servicio(request):
 def registrar_servicios_multiple(request):
     """Registrar múltiples servicios para un mismo cliente en una sola acción.
 
-    Crea una `Cita` por cada servicio seleccionado. Asociará el estilista desde
+    Crea una `Cita` por cada servicio seleccionado, una a continuación de
+    la otra y todas en una sola inserción (ver `servicios.registro`). Asociará el estilista desde
     `request.user.colaborador` cuando exista; si no, intentará asignar el primer
     colaborador con cargo 'estilista' (sólo como fallback).
     """
@@ -199,26 +243,14 @@ def registrar_servicios_multiple(request):
             if not colaborador:
                 colaborador = Colaborador.objects.filter(cargo='estilista', estado='activo').first()
 
-            citas_creadas = []
-            for servicio in servicios_sel:
-                cita = Cita(
-                    cliente=cliente,
-                    servicio=servicio,
-                    estilista=colaborador,
-                    fecha_cita=fecha_cita,
-                    observaciones=observaciones,
-                    estado='completada'
-                )
-                # calcular precio y guardar
-                try:
-                    cita.calcular_precio_final()
-                except Exception:
-                    pass
-                cita.save()
-                citas_creadas.append(cita)
-
-            messages.success(request, f'Se registraron {len(citas_creadas)} servicios para el cliente {cliente}.')
-            return render(request, 'servicios/registrarServiciosResumen.html', {'citas': citas_creadas})
+            # Una sola inserción para todos los servicios de la sesión, uno a continuación del otro
+            try:
+                citas_creadas = registrar_citas(cliente, servicios_sel, colaborador, fecha_cita, observaciones)
+            except HorarioOcupadoError as error:
+                form.add_error('fecha_cita', error)
+            else:
+                messages.success(request, f'Se registraron {len(citas_creadas)} servicios para el cliente {cliente}.')
+                return render(request, 'servicios/registrarServiciosResumen.html', {'citas': citas_creadas})
     else:
         form = RegistrarServiciosMultipleForm()
 
@@ -244,9 +276,7 @@ def lista_citas(request):
                 citas = Cita.objects.none()
         # Recepcionistas ven citas próximas (desde hoy)
         elif role == 'recepcionista':
-            from django.utils import timezone
-            hoy = timezone.now().date()
-            citas = citas.filter(fecha_cita__date__gte=hoy)
+            citas = citas.filter(fecha_cita__gte=inicio_del_dia(timezone.localdate()))
         # Nota: el rol 'gerente' fue eliminado; no hay rama especial para gerentes.
     
     # Filtrar por fecha si se proporciona
@@ -254,12 +284,21 @@ def lista_citas(request):
     if fecha_filtro:
         try:
             fecha = datetime.strptime(fecha_filtro, '%Y-%m-%d').date()
-            citas = citas.filter(fecha_cita__date=fecha)
+            desde, hasta = rango_dia_local(fecha)
+            citas = citas.filter(fecha_cita__gte=desde, fecha_cita__lt=hasta)
         except ValueError:
             pass
     
+    pagina = paginar(request, citas)
+    resumen = citas.aggregate(
+        total=Count('id'),
+        completadas=Count('id', filter=Q(estado='completada')),
+        programadas=Count('id', filter=Q(estado='programada')),
+    )
     context = {
-        'citas': citas,
+        'citas': pagina,
+        'pagina': pagina,
+        'resumen': resumen,
         'fecha_filtro': fecha_filtro,
     }
     return render(request, 'servicios/listaCitas.html', context)
@@ -267,51 +306,177 @@ def lista_citas(request):
 @login_required
 @user_passes_test(lambda u: has_any_role(u, ['administrador', 'estilista']))
 def agregar_producto_consumido(request, cita_id):
-    """Vista para agregar productos consumidos a una cita"""
+    """Vista para agregar los productos consumidos en una cita.
+
+    Recibe todas las líneas de una vez y las registra con `registrar_consumo`:
+    el stock se valida y descuenta en bloque y el precio final de la cita se
+    recalcula una sola vez.
+    """
     cita = get_object_or_404(Cita, pk=cita_id)
-    
-    if request.method == 'POST':
-        form = ProductoConsumidoForm(request.POST)
-        if form.is_valid():
-            producto_consumido = form.save(commit=False)
-            producto_consumido.cita = cita
-            producto_consumido.precio_unitario = producto_consumido.producto.precio_venta
+    productos = list(Producto.objects.filter(estado='activo', stock_actual__gt=0))
+    opciones = [(producto.pk, producto.nombre) for producto in productos]
 
-            # Crear movimiento de inventario usando el usuario actual
-            from inventario.models import MovimientoInventario
+    if request.method == 'POST':
+        formset = ConsumoProductosFormSet(request.POST, prefix='lineas', form_kwargs={'productos': opciones})
+        if formset.is_valid():
             try:
-                MovimientoInventario.objects.create(
-                    producto=producto_consumido.producto,
-                    tipo_movimiento='salida',
-                    cantidad=producto_consumido.cantidad,
-                    motivo=f"Consumo en cita #{cita.id}",
-                    usuario=request.user
-                )
-            except Exception:
-                # Si por alguna razón falla el movimiento, no detener la operación.
-                pass
-
-            # Evitar que el save del modelo vuelva a crear el movimiento.
-            producto_consumido.suppress_movimiento = True
-            producto_consumido.save()
-
-            # Actualizar el precio final de la cita
-            cita.precio_final = (cita.precio_final or 0) + producto_consumido.subtotal
-            cita.save()
-
-            messages.success(request, 'Producto agregado al servicio.')
-            registrar_accion(request.user, 'agregar_producto_consumido', modelo='ProductoConsumido', objeto_id=producto_consumido.id,
-                             descripcion=f"Producto {producto_consumido.producto.nombre} x{producto_consumido.cantidad} agregado a cita {cita.id}")
-            return redirect('servicios:detalle_cita', pk=cita.id)
+                consumos = registrar_consumo(cita, formset.lineas(), request.user)
+            except StockInsuficienteError as error:
+                # Otro registro descontó el stock después de mostrar el formulario
+                messages.error(request, error.messages[0])
+            else:
+                unidades = sum(consumo.cantidad for consumo in consumos)
+                nombres = dict(opciones)
+                messages.success(request, f'{len(consumos)} productos agregados al servicio.')
+                # El objeto afectado es la cita (una acción por registro, no por consumo)
+                registrar_accion(request.user, 'agregar_producto_consumido', modelo='Cita', objeto_id=cita.id,
+                                 descripcion=f"{unidades} unidades agregadas a cita {cita.id}: " + ", ".join(
+                                     f"{nombres.get(c.producto_id, c.producto_id)} x{c.cantidad}" for c in consumos))
+                return redirect('servicios:detalle_cita', pk=cita.id)
     else:
-        form = ProductoConsumidoForm()
+        formset = ConsumoProductosFormSet(prefix='lineas', form_kwargs={'productos': opciones})
     
     context = {
-        'form': form,
+        'formset': formset,
         'cita': cita,
+        'productos': productos,
     }
     return render(request, 'servicios/agregarProductoConsumido.html', context)
 
+@login_required
+@user_passes_test(lambda u: has_any_role(u, ['administrador', 'estilista', 'recepcionista']))
+def horarios_libres(request):
+    """Devuelve en JSON los próximos horarios libres para un servicio.
+
+    Parámetros GET: `servicio` (obligatorio), `fecha` (AAAA-MM-DD, por
+    defecto hoy), `estilista` y `cantidad` (opcionales). Si se indica
+    `inicio` (AAAA-MM-DDTHH:MM) la búsqueda parte de ese día y se informa
+    además qué estilistas están libres a esa hora.
+    """
+    servicio = get_object_or_404(Servicio, pk=request.GET.get('servicio') or 0, estado='activo')
+    try:
+        fecha = datetime.strptime(request.GET['fecha'], '%Y-%m-%d').date() if request.GET.get('fecha') else None
+        inicio = timezone.make_aware(datetime.strptime(request.GET['inicio'], '%Y-%m-%dT%H:%M')) \
+            if request.GET.get('inicio') else None
+        estilista_id = int(request.GET['estilista']) if request.GET.get('estilista') else None
+        cantidad = min(int(request.GET.get('cantidad', 5)), 50)
+    except ValueError:
+        return JsonResponse({'error': 'Parámetros inválidos.'}, status=400)
+
+    hoy = timezone.localdate()
+    if inicio:
+        # La agenda cargada debe incluir la hora consultada
+        fecha = timezone.localdate(inicio)
+    fecha = max(fecha or hoy, hoy)
+    agenda = Agenda.cargar(fecha, dias=DIAS_BUSQUEDA)
+    if estilista_id and estilista_id not in agenda.estilistas:
+        return JsonResponse({'error': 'Estilista no encontrado.'}, status=404)
+
+    duracion = servicio.duracion_minutos
+    horarios = agenda.proximos_horarios(duracion, desde=max(timezone.now(), inicio_del_dia(fecha)),
+                                        cantidad=cantidad, estilista_id=estilista_id)
+    datos = {
+        'servicio': servicio.nombre,
+        'duracion_minutos': duracion,
+        'horarios': [
+            {
+                'inicio': timezone.localtime(hora).isoformat(),
+                'estilistas': [{'id': pk, 'nombre': agenda.estilistas[pk]} for pk in libres],
+            }
+            for hora, libres in horarios
+        ],
+    }
+    if inicio:
+        datos['estilistas_libres'] = [
+            {'id': pk, 'nombre': agenda.estilistas[pk]} for pk in agenda.estilistas_libres(inicio, duracion)
+        ]
+    return JsonResponse(datos)
+
+def _semana_solicitada(request):
+    """Lunes de la semana pedida en `?semana=AAAA-MM-DD` (por defecto la actual)."""
+    try:
+        fecha = datetime.strptime(request.GET['semana'], '%Y-%m-%d').date()
+    except (KeyError, ValueError):
+        fecha = timezone.localdate()
+    return inicio_semana(fecha)
+
+
+def _estilistas_calendario(user, dias):
+    """Estilistas que se muestran: activos o con citas en la semana (un estilista sólo se ve a sí mismo)."""
+    estilistas = Colaborador.objects.filter(cargo='estilista')
+    if not is_admin_user(user) and getattr(getattr(user, 'perfilusuario', None), 'rol', None) == 'estilista':
+        colaborador = getattr(user, 'colaborador', None)
+        return estilistas.filter(pk=colaborador.pk) if colaborador else estilistas.none()
+    con_citas = {pk for dia in dias for pk in dia.estilistas}
+    return estilistas.filter(Q(estado='activo') | Q(pk__in=con_citas)).order_by('nombre', 'apellido')
+
+
+@login_required
+def calendario_semanal(request):
+    """Calendario de la semana: estilistas × bloques de 15 minutos por día"""
+    lunes = _semana_solicitada(request)
+    context = {
+        'ocupacion_disponible': ocupacion_disponible(),
+        'lunes': lunes,
+        'semana_anterior': lunes - timedelta(days=7),
+        'semana_siguiente': lunes + timedelta(days=7),
+    }
+    if ocupacion_disponible():
+        dias = ocupacion_semana(lunes)
+        estilistas = list(_estilistas_calendario(request.user, dias))
+        context['horas'] = horas_bloques()[::60 // INTERVALO_MINUTOS]
+        context['bloques_por_hora'] = 60 // INTERVALO_MINUTOS
+        context['dias'] = [
+            {
+                'fecha': dia.fecha,
+                'filas': [
+                    {
+                        'estilista': estilista,
+                        'bloques': [
+                            {'bloques': cantidad, 'cita_id': cita_id, 'cita': dia.detalle.get(cita_id),
+                             'superpuesta': superpuesta}
+                            for cantidad, cita_id, superpuesta in bloques_fila(dia, estilista.pk)
+                        ],
+                    }
+                    for estilista in estilistas
+                ],
+            }
+            for dia in dias
+        ]
+    return render(request, 'servicios/calendarioSemanal.html', context)
+
+
+@login_required
+def calendario_semanal_datos(request):
+    """Devuelve en JSON la ocupación de la semana.
+
+    Por cada día y estilista se entregan dos listas con un valor por bloque:
+    cuántas citas lo ocupan y el id de la cita (0 si está libre).
+    """
+    if not ocupacion_disponible():
+        return JsonResponse({'error': 'La ocupación requiere la librería "numpy".'}, status=500)
+    lunes = _semana_solicitada(request)
+    dias = ocupacion_semana(lunes)
+    estilistas = list(_estilistas_calendario(request.user, dias))
+    datos = {
+        'semana': lunes.isoformat(),
+        'intervalo_minutos': INTERVALO_MINUTOS,
+        'bloques': horas_bloques(),
+        'estilistas': [{'id': e.pk, 'nombre': e.nombre_completo} for e in estilistas],
+        'dias': [],
+    }
+    vacia = [0] * len(datos['bloques'])
+    for dia in dias:
+        ocupacion, citas, detalle = {}, {}, {}
+        for estilista in estilistas:
+            fila = dia.fila(estilista.pk)
+            ocupacion[estilista.pk] = dia.ocupados[fila].tolist() if fila is not None else vacia
+            citas[estilista.pk] = dia.citas[fila].tolist() if fila is not None else vacia
+            detalle.update({pk: dia.detalle[pk] for pk in set(citas[estilista.pk]) if pk})
+        datos['dias'].append({'fecha': dia.fecha.isoformat(), 'ocupacion': ocupacion, 'citas': citas,
+                              'detalle': detalle})
+    return JsonResponse(datos)
+
 @login_required
 def detalle_cita(request, pk):
     """Vista para ver el detalle de una cita"""
@@ -324,18 +489,26 @@ def detalle_cita(request, pk):
     }
     return render(request, 'servicios/detalleCita.html', context)
 
+DIAS_AVISO_CUMPLEANOS = 7
+
+
 @login_required
 def aviso_cumpleanos(request):
-    """Vista para mostrar avisos de cumpleaños"""
-    hoy = timezone.now().date()
-    clientes_cumpleanos = Cliente.objects.filter(
-        fecha_nacimiento__month=hoy.month,
-        fecha_nacimiento__day=hoy.day,
-        estado='activo'
-    )
+    """Vista para mostrar avisos de cumpleaños de hoy y de los próximos días"""
+    hoy = timezone.localdate()
+    try:
+        dias = min(max(int(request.GET.get('dias', DIAS_AVISO_CUMPLEANOS)), 1), 60)
+    except ValueError:
+        dias = DIAS_AVISO_CUMPLEANOS
+    activos = Cliente.objects.filter(estado='activo')
+    clientes_cumpleanos = cumpleanos_del_dia(activos, hoy)
+    # Desde mañana: los de hoy ya se muestran arriba
+    proximos_cumpleanos = cumpleanos_proximos(activos, dias, hoy + timedelta(days=1))
     
     context = {
         'clientes_cumpleanos': clientes_cumpleanos,
+        'proximos_cumpleanos': proximos_cumpleanos,
+        'dias': dias,
         'hoy': hoy,
     }
     return render(request, 'servicios/avisoCumpleanos.html', context)
@@ -5,9 +5,11 @@ from django.contrib.auth.decorators import login_required, user_passes_test
 from django.utils import timezone
 from datetime import timedelta
 from django.contrib.auth.models import User
-from django.db.models import Q
+from django.db.models import Count, Q
 from .models import PerfilUsuario
 from .helpers import registrar_accion
+from core.fechas import inicio_del_dia, rango_dia_local
+from core.paginacion import paginar
 from .forms import (
     RegistroUsuarioForm, PerfilUsuarioForm, EditarUsuarioForm, 
     CambiarPasswordForm, BuscarUsuarioForm
@@ -41,8 +43,18 @@ def lista_usuarios(request):
     """Lista todos los usuarios (solo administradores)"""
     usuarios = User.objects.all().select_related('perfilusuario')
     
+    # User no define Meta.ordering: se ordena por nombre de usuario (único)
+    pagina = paginar(request, usuarios, orden=['username'])
+    resumen = User.objects.aggregate(
+        total=Count('id'),
+        activos=Count('id', filter=Q(is_active=True)),
+        administradores=Count('id', filter=Q(perfilusuario__rol='administrador')),
+        estilistas=Count('id', filter=Q(perfilusuario__rol='estilista')),
+    )
     context = {
-        'usuarios': usuarios,
+        'usuarios': pagina,
+        'pagina': pagina,
+        'resumen': resumen,
     }
     return render(request, 'usuarios/listaUsuarios.html', context)
 
@@ -194,13 +206,12 @@ def mi_perfil(request):
 def dashboard_estilista(request):
     """Dashboard básico para estilistas: servicios del día y alertas"""
     from servicios.models import Cita
-    hoy = timezone.now().date()
+    desde, hasta = rango_dia_local(timezone.localdate())
+    citas_hoy = Cita.objects.filter(fecha_cita__gte=desde, fecha_cita__lt=hasta)
     # Intentar usar la relación OneToOne (User.colaborador) si existe
     colaborador = getattr(request.user, 'colaborador', None)
     if colaborador:
-        citas_hoy = Cita.objects.filter(fecha_cita__date=hoy, estilista=colaborador)
-    else:
-        citas_hoy = Cita.objects.filter(fecha_cita__date=hoy)
+        citas_hoy = citas_hoy.filter(estilista=colaborador)
 
     context = {
         'citas_hoy': citas_hoy,
@@ -230,7 +241,7 @@ def estilista_registrar_servicio(request):
     """
     from servicios.forms import CitaForm
     if request.method == 'POST':
-        form = CitaForm(request.POST)
+        form = CitaForm(request.POST, estilista=getattr(request.user, 'colaborador', None))
         if form.is_valid():
             cita = form.save(commit=False)
             # Asociar el colaborador si la relación User.colaborador existe
@@ -238,9 +249,9 @@ def estilista_registrar_servicio(request):
             if colaborador:
                 cita.estilista = colaborador
             cita.estado = 'completada'
-            cita.save()
-            messages.success(request, 'Servicio registrado.')
-            return redirect('usuarios:dashboard_estilista')
+            if form.guardar(cita):
+                messages.success(request, 'Servicio registrado.')
+                return redirect('usuarios:dashboard_estilista')
     else:
         form = CitaForm()
 
@@ -260,18 +271,18 @@ def estilista_agendar_cita(request):
     cliente_id = request.GET.get('cliente')
 
     if request.method == 'POST':
-        form = CitaForm(request.POST)
+        form = CitaForm(request.POST, estilista=getattr(request.user, 'colaborador', None))
         if form.is_valid():
             cita = form.save(commit=False)
             colaborador = getattr(request.user, 'colaborador', None)
             if colaborador:
                 cita.estilista = colaborador
             cita.estado = 'programada'
-            cita.save()
-            registrar_accion(request.user, 'agendar_cita', modelo='Cita', objeto_id=cita.id,
-                             descripcion=f"Cita programada para cliente {cita.cliente.rut} en {cita.fecha_cita}")
-            messages.success(request, 'Cita agendada correctamente.')
-            return redirect('usuarios:dashboard_estilista')
+            if form.guardar(cita):
+                registrar_accion(request.user, 'agendar_cita', modelo='Cita', objeto_id=cita.id,
+                                 descripcion=f"Cita programada para cliente {cita.cliente.rut} en {cita.fecha_cita}")
+                messages.success(request, 'Cita agendada correctamente.')
+                return redirect('usuarios:dashboard_estilista')
     else:
         initial = {}
         if cliente_id:
@@ -295,9 +306,10 @@ def estilista_ver_inventario(request):
 def dashboard_recepcionista(request):
     """Dashboard para recepcionistas: clientes nuevos y cumpleaños"""
     from clientes.models import Cliente
-    hoy = timezone.now().date()
-    clientes_nuevos = Cliente.objects.filter(fecha_registro__date__gte=(timezone.now() - timedelta(days=7)))[:10]
-    cumpleaños_hoy = Cliente.objects.filter(fecha_nacimiento__month=hoy.month, fecha_nacimiento__day=hoy.day, estado='activo')
+    from clientes.cumpleanos import cumpleanos_del_dia
+    hoy = timezone.localdate()
+    clientes_nuevos = Cliente.objects.filter(fecha_registro__gte=inicio_del_dia(timezone.localdate() - timedelta(days=7)))[:10]
+    cumpleaños_hoy = cumpleanos_del_dia(Cliente.objects.filter(estado='activo'), hoy)
 
     context = {
         'clientes_nuevos': clientes_nuevos,
@@ -314,7 +326,8 @@ def recepcionista_gestion_clientes(request):
     # Aquí se muestra una vista básica que lista y permite crear/editar mediante enlaces.
     from clientes.models import Cliente
     clientes = Cliente.objects.all().order_by('-fecha_registro')
-    return render(request, 'usuarios/recepcionista_gestion_clientes.html', {'clientes': clientes})
+    pagina = paginar(request, clientes)
+    return render(request, 'usuarios/recepcionista_gestion_clientes.html', {'clientes': pagina, 'pagina': pagina})
 
 
 # El dashboard de gerente fue eliminado porque el rol ya no existe.